@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import argparse
+from pathlib import Path
+from typing import Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Only semantic search uses the index, and it needs NumPy anyway
+    np = None
+
+# Vector searches over fewer vectors than this are exact (brute force is
+# faster than probing lists at that size)
+ANN_MIN_VECTORS = int(os.environ.get("MEDIUM_MCP_ANN_MIN_VECTORS", "20000"))
+
+# Lists probed per query: more raise recall towards exact search, fewer
+# lower latency (each probe scans about n / lists vectors)
+ANN_PROBES = int(os.environ.get("MEDIUM_MCP_ANN_PROBES", "8"))
+
+# k-means trains on at most this many vectors per list
+TRAINING_VECTORS_PER_LIST = 64
+
+def default_lists(count: int) -> int:
+    """Number of inverted lists for count vectors, about 2 * sqrt(count)."""
+    return max(1, min(count, int(round(2 * np.sqrt(count)))))
+
+def nearest_centroids(vectors: 'np.ndarray', centroids: 'np.ndarray', batch: int = 65536) -> 'np.ndarray':
+    """Index of the most similar centroid for each vector, in batches to bound memory."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch):
+        assignments[start:start + batch] = np.argmax(vectors[start:start + batch].dot(centroids.T), axis=1)
+    return assignments
+
+def spherical_kmeans(vectors: 'np.ndarray', lists: int, iterations: int = 10, seed: int = 0) -> 'np.ndarray':
+    """Unit-length centroids of lists clusters by cosine similarity, from a sample of vectors."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), lists * TRAINING_VECTORS_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        norms = np.linalg.norm(sums, axis=1)
+        # Empty clusters restart from a random vector
+        empty = norms == 0
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        norms[empty] = np.linalg.norm(sums[empty], axis=1)
+        norms[norms == 0] = 1
+        centroids = (sums / norms[:, None]).astype(np.float32)
+    return centroids
+
+class IVFIndex:
+    """Inverted-file index for approximate nearest neighbours of unit vectors.
+
+    Vectors are clustered around centroids by spherical k-means; a query
+    scans only the lists of its probes nearest centroids, so it touches
+    about probes / lists of the vectors instead of all of them. Recall
+    against exact search rises with probes (at probes == lists the search
+    is exact). The index holds row numbers only; callers keep the vectors
+    and pass them to search().
+    """
+
+    def __init__(self, centroids: 'np.ndarray', assignments: 'np.ndarray'):
+        self.centroids = centroids
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self._group()
+
+    @classmethod
+    def train(cls, vectors: 'np.ndarray', lists: int = 0) -> 'IVFIndex':
+        """Cluster vectors into lists (default_lists() when 0) and index every row."""
+        centroids = spherical_kmeans(vectors, lists or default_lists(len(vectors)))
+        return cls(centroids, nearest_centroids(vectors, centroids))
+
+    def _group(self):
+        """Sort rows by list so each list is one slice of self.order."""
+        self.order = np.argsort(self.assignments, kind='stable').astype(np.int64)
+        self.offsets = np.searchsorted(self.assignments[self.order], np.arange(len(self.centroids) + 1))
+
+    def assign(self, row: int, vector: 'np.ndarray'):
+        """Place a new (row == current size) or changed row in its nearest list."""
+        list_id = np.int32(np.argmax(self.centroids.dot(vector)))
+        if row == len(self.assignments):
+            self.assignments = np.append(self.assignments, list_id)
+        else:
+            self.assignments = self.assignments.copy()
+            self.assignments[row] = list_id
+        self._group()
+
+    def remove(self, row: int):
+        """Forget a row; later rows move down by one, as in the vector array."""
+        self.assignments = np.delete(self.assignments, row)
+        self._group()
+
+    def candidates(self, query: 'np.ndarray', probes: int) -> 'np.ndarray':
+        """Rows in the lists of the probes centroids most similar to query."""
+        similarities = self.centroids.dot(query)
+        probes = min(probes, len(self.centroids))
+        nearest = np.argpartition(-similarities, probes - 1)[:probes]
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in nearest])
+
+    def search(self, vectors: 'np.ndarray', query: 'np.ndarray', limit: int,
+               probes: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """The (rows, similarities) of the limit best candidates, best first."""
+        rows = self.candidates(query, probes)
+        scores = vectors[rows].dot(query)
+        if len(rows) > limit:
+            best = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[best], scores[best]
+        best = np.argsort(-scores, kind='stable')
+        return rows[best], scores[best]
+
+def exact_search(vectors: 'np.ndarray', query: 'np.ndarray', limit: int) -> 'np.ndarray':
+    """Rows of the limit vectors most similar to query, by brute force."""
+    scores = vectors.dot(query)
+    limit = min(limit, len(scores))
+    return np.argpartition(-scores, limit - 1)[:limit]
+
+def passage_vectors(data_dir: Path) -> 'np.ndarray':
+    """Latent vectors of every paragraph in an archive, in the chapters' semantic space."""
+    from ingest import extract_page
+    from term_matrix import TermMatrix
+    from semantic_index import SemanticIndex
+
+    texts = {html_file.parent.name: extract_page(html_file, 'book_server')['content']
+             for html_file in sorted(data_dir.glob("*/*.html"))}
+    semantic = SemanticIndex.build(TermMatrix(texts))
+    passages = [line for text in texts.values() for line in text.split('\n') if len(line.split()) >= 5]
+    vectors = semantic.project(np.vstack([semantic.matrix.vector(passage) for passage in passages]))
+    return vectors[np.linalg.norm(vectors, axis=1) > 0]
+
+def clustered_vectors(count: int, dimensions: int, seed: int = 0) -> 'np.ndarray':
+    """Random unit vectors around one topic per 500 vectors, shaped like LSA passage vectors."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((max(8, count // 500), dimensions)).astype(np.float32)
+    vectors = topics[rng.integers(len(topics), size=count)]
+    vectors += 0.6 * rng.standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark recall@10 and latency of the IVF index against exact search")
+    parser.add_argument('data_dir', nargs='?', default=str(Path(__file__).parent.parent / "data"),
+                        help="Archive whose paragraphs are indexed")
+    parser.add_argument('--synthetic', type=int, default=0, metavar='N',
+                        help="Index N clustered random vectors instead of the archive's paragraphs")
+    parser.add_argument('--dimensions', type=int, default=100, help="Dimensions of synthetic vectors")
+    parser.add_argument('--lists', type=int, default=0, help="Inverted lists (default: about 2 * sqrt(N))")
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = clustered_vectors(args.synthetic, args.dimensions)
+    else:
+        vectors = passage_vectors(Path(args.data_dir))
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    # Perturb the queries so they are not stored vectors themselves
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    index = IVFIndex.train(vectors, args.lists)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dimensions, {len(index.centroids)} lists, "
+          f"trained in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    expected = [set(exact_search(vectors, query, 10).tolist()) for query in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"  exact        {exact_ms:8.3f} ms/query  recall@10 1.000")
+
+    for probes in (1, 2, 4, 8, 16, 32, 64):
+        if probes > len(index.centroids):
+            break
+        start = time.perf_counter()
+        found = [set(index.search(vectors, query, 10, probes)[0].tolist()) for query in queries]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(a & b) / len(b) for a, b in zip(found, expected)])
+        print(f"  probes {probes:<5} {elapsed_ms:8.3f} ms/query  recall@10 {recall:.3f}  "
+              f"speedup {exact_ms / elapsed_ms:5.1f}x")
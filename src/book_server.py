@@ -4,11 +4,25 @@ import os
 import json
 import glob
 from pathlib import Path
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any, Optional, Set
+from typing import List, Dict, Any, Optional, Set, Tuple, Callable
 import re
+import asyncio
 from collections import defaultdict, Counter
 
+from ingest import (get_snapshot_path, get_text_store_path, get_term_matrix_path, get_semantic_index_path,
+                    get_similarity_matrix_path, extract_with_snapshot, extract_page,
+                    IndexBuild, INDEX_WAIT_SECONDS)
+from watcher import DataDirectoryWatcher
+from content_store import ContentLRU, TextStore
+from search_index import (InvertedIndex, top_scores, add_to_field_indexes, remove_from_field_indexes,
+                          word_snippet, FIELD_GAP)
+from query_language import parse_query, positive_terms, QueryEvaluator, MetadataIndex, QuerySyntaxError
+from term_matrix import TermMatrix
+from semantic_index import SemanticIndex
+from similarity_matrix import SimilarityMatrix
+from name_index import NameIndex
+from concept_index import ConceptIndex
+
 from mcp.server.models import InitializationOptions
 import mcp.types as types
 from mcp.server import NotificationOptions, Server
@@ -21,6 +35,42 @@ server = Server("medium-book-mcp-server")
 chapter_cache = {}
 chapter_index = []
 
+# Byte budget for chapter bodies. 0 keeps every body resident; any other
+# value keeps only metadata in chapter_cache and loads bodies on demand
+# through an LRU of at most this many bytes.
+CONTENT_CACHE_BYTES = int(os.environ.get("MEDIUM_MCP_CONTENT_CACHE_BYTES", "0"))
+
+# Length of the body prefix kept resident for theme matching in lazy mode
+CONTENT_PREVIEW_CHARS = 1000
+
+# Pack chapter bodies into one memory-mapped file instead of keeping a str
+# per chapter in chapter_cache
+TEXT_STORE_ENABLED = os.environ.get("MEDIUM_MCP_TEXT_STORE", "0") == "1"
+text_store = None
+
+# Word postings over chapter titles and full bodies, for phrase and
+# proximity theme matching, plus per-field postings for title: and
+# subtitle: queries, and metadata postings for status:, concept: and words:
+chapter_search_index = InvertedIndex()
+field_indexes = {'title': InvertedIndex(), 'subtitle': InvertedIndex()}
+metadata_index = MetadataIndex(['status', 'concept', 'words'])
+
+# TF-IDF term-document matrix over chapter bodies for corpus analyses, its
+# latent semantic space for semantic matching, and the cosine similarity
+# of every pair of chapters; None when SciPy is unavailable
+term_matrix = None
+semantic_index = None
+chapter_similarities = None
+
+# Lookup tables for resolving loosely typed chapter names to IDs
+chapter_names = NameIndex({})
+
+# Design concept postings and per-chapter concept bitsets
+concept_index = ConceptIndex()
+
+# Words of each chapter get_chapters returns unless asked for another cap
+DEFAULT_BATCH_MAX_WORDS = 3000
+
 # List of finished chapter titles (as provided by user)
 FINISHED_CHAPTERS = {
     "Tim-s-Theory-of-Trails-7f9c33b1cf7d",
@@ -50,73 +100,33 @@ def get_data_directory() -> Path:
 def extract_chapter_content(html_path: Path) -> Dict[str, Any]:
     """Extract content and metadata from a Medium article HTML file."""
     try:
-        with open(html_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        # Extract title (try multiple selectors)
-        title = None
-        for selector in ['h1.p-name', 'h1', 'title', '.p-name', '[data-testid="storyTitle"]']:
-            title_elem = soup.select_one(selector)
-            if title_elem:
-                title = title_elem.get_text().strip()
-                break
-        
-        if not title:
-            title = html_path.stem.replace('-', ' ').title()
-        
-        # Extract subtitle/description
-        subtitle_elem = soup.select_one('.p-summary, .graf--subtitle')
-        subtitle = subtitle_elem.get_text().strip() if subtitle_elem else ""
-        
-        # Extract main content
-        content_elem = soup.select_one('.e-content, article, .postArticle-content, main')
-        if content_elem:
-            # Remove script and style elements
-            for script in content_elem(["script", "style"]):
-                script.decompose()
-            text_content = content_elem.get_text()
-        else:
-            # Fallback: get all text
-            for script in soup(["script", "style"]):
-                script.decompose()
-            text_content = soup.get_text()
-        
-        # Clean up text
-        text_content = re.sub(r'\n\s*\n', '\n\n', text_content.strip())
-        
-        # Extract any meta description
-        meta_desc = soup.select_one('meta[name="description"]')
-        description = meta_desc.get('content') if meta_desc else subtitle
-        
-        # Determine chapter status
-        directory_name = html_path.parent.name
-        is_finished = directory_name in FINISHED_CHAPTERS
+        page = extract_page(html_path, 'book_server')
+        title = page['title']
+        text_content = page['content']
         
         # Detect if this is a comment/response (very short, starts with person's name)
         is_comment = (
-            len(text_content.split()) < 200 and 
+            page['word_count'] < 200 and 
             (title.count('--') > 0 or len(title.split()) < 4)
         )
         
         # Extract design concepts from title and content
         design_concepts = extract_design_concepts(title, text_content)
         
-        return {
+        chapter_data = {
             'title': title,
-            'subtitle': subtitle,
+            'subtitle': page['subtitle'],
             'content': text_content,
-            'description': description,
-            'path': str(html_path),
-            'directory': directory_name,
-            'word_count': len(text_content.split()),
-            'has_images': len(list((html_path.parent / 'img').glob('*'))) > 0 if (html_path.parent / 'img').exists() else False,
-            'is_finished': is_finished,
+            'description': page['description'] if page['has_description'] else page['subtitle'],
+            'path': page['path'],
+            'directory': page['directory'],
+            'word_count': page['word_count'],
+            'has_images': page['has_images'],
             'is_comment': is_comment,
-            'status': 'finished' if is_finished else ('comment' if is_comment else 'draft'),
             'design_concepts': design_concepts
         }
+        apply_chapter_status(chapter_data)
+        return chapter_data
     except Exception as e:
         return {
             'title': html_path.stem.replace('-', ' ').title(),
@@ -134,6 +144,16 @@ def extract_chapter_content(html_path: Path) -> Dict[str, Any]:
             'error': str(e)
         }
 
+def apply_chapter_status(chapter_data: Dict[str, Any]):
+    """Set is_finished/status from FINISHED_CHAPTERS.
+
+    Kept separate from extraction so chapters restored from the index snapshot
+    pick up edits to FINISHED_CHAPTERS without being re-parsed.
+    """
+    is_finished = chapter_data['directory'] in FINISHED_CHAPTERS
+    chapter_data['is_finished'] = is_finished
+    chapter_data['status'] = 'finished' if is_finished else ('comment' if chapter_data['is_comment'] else 'draft')
+
 def extract_design_concepts(title: str, content: str) -> List[str]:
     """Extract key design concepts from title and content."""
     concepts = []
@@ -164,165 +184,384 @@ def extract_design_concepts(title: str, content: str) -> List[str]:
     
     return concepts[:10]  # Limit to top 10 concepts
 
-def build_chapter_index():
-    """Build an index of all chapters in the data directory."""
+def load_chapter_body(chapter_id: str) -> str:
+    """Load a non-resident chapter body from the text store or its source HTML."""
+    if text_store is not None and chapter_id in text_store:
+        return text_store.get(chapter_id)
+    return extract_chapter_content(Path(chapter_cache[chapter_id]['path']))['content']
+
+content_lru = ContentLRU(load_chapter_body, CONTENT_CACHE_BYTES)
+
+def drop_chapter_body(chapter_data: Dict[str, Any], stored: bool = False):
+    """Replace a chapter's body with a preview when the body can be loaded on demand.
+
+    stored means the body is in the text store.
+    """
+    if (CONTENT_CACHE_BYTES or stored) and 'error' not in chapter_data:
+        chapter_data['content_preview'] = chapter_data['content'][:CONTENT_PREVIEW_CHARS]
+        del chapter_data['content']
+
+def cache_chapter(chapter_id: str, chapter_data: Dict[str, Any], stored: bool = False):
+    """Store a chapter in chapter_cache, dropping its body when it can be loaded on demand.
+
+    stored means the body was just written to the text store; otherwise any
+    text store copy is stale and is discarded.
+    """
+    drop_chapter_body(chapter_data, stored)
+    content_lru.invalidate(chapter_id)
+    if text_store is not None and not stored:
+        text_store.discard(chapter_id)
+    chapter_cache[chapter_id] = chapter_data
+
+def build_text_store(data_dir: Path, texts: Dict[str, str]) -> Optional[TextStore]:
+    """Write the memory-mapped text store for the given chapter bodies."""
+    import sys
+    try:
+        return TextStore.build(get_text_store_path(data_dir, "book_server"), texts)
+    except (OSError, ValueError) as e:
+        print(f"Could not build text store, keeping bodies in memory: {e}", file=sys.stderr)
+        return None
+
+def get_chapter_text(chapter_id: str, preview: bool = False) -> str:
+    """Get a chapter body (or just its first CONTENT_PREVIEW_CHARS characters)."""
+    chapter_data = chapter_cache[chapter_id]
+    if 'content' in chapter_data:
+        content = chapter_data['content']
+        return content[:CONTENT_PREVIEW_CHARS] if preview else content
+    if preview:
+        return chapter_data['content_preview']
+    if CONTENT_CACHE_BYTES:
+        return content_lru.get(chapter_id)
+    return load_chapter_body(chapter_id)
+
+def get_chapter_document(chapter_id: str) -> Tuple[str, str]:
+    """Get the (title, body) a chapter was indexed with, for phrase and proximity matching."""
+    return chapter_cache[chapter_id]['title'], get_chapter_text(chapter_id)
+
+def make_chapter_index_entry(chapter_id: str, chapter_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the metadata-only chapter_index entry for a chapter."""
+    return {
+        'id': chapter_id,
+        'title': chapter_data['title'],
+        'subtitle': chapter_data['subtitle'],
+        'description': chapter_data['description'],
+        'word_count': chapter_data['word_count'],
+        'has_images': chapter_data['has_images'],
+        'status': chapter_data['status'],
+        'design_concepts': chapter_data['design_concepts']
+    }
+
+def load_chapter_index(progress: Optional[Callable[[int, int], None]] = None) -> Optional[Tuple[Any, ...]]:
+    """Extract every chapter into a new (cache, index, text store, search index,
+    field indexes, term matrix, semantic index, name index, concept index,
+    similarity matrix), or None on failure.
+
+    Touches no globals, so it can run on a worker thread.
+    """
     import sys
-    global chapter_cache, chapter_index
-    
     try:
         data_dir = get_data_directory()
         print(f"Looking for data directory at: {data_dir}", file=sys.stderr)
         
         if not data_dir.exists():
             print(f"Data directory does not exist: {data_dir}", file=sys.stderr)
-            return
-        
-        chapter_index = []
-        chapter_cache = {}
+            return None
         
         # Find all HTML files in article directories
         html_files = list(data_dir.glob("*/*.html"))
         print(f"Found {len(html_files)} HTML files", file=sys.stderr)
         
-        for html_file in html_files:
+        # Reuse the on-disk snapshot for files unchanged since the last run
+        snapshot_path = get_snapshot_path(data_dir, "book_server")
+        extracted, reused = extract_with_snapshot(html_files, extract_chapter_content, snapshot_path, progress)
+        print(f"Reused {reused} chapters from index snapshot", file=sys.stderr)
+        
+        store = None
+        if TEXT_STORE_ENABLED:
+            store = build_text_store(data_dir, {html_file.parent.name: chapter_data['content']
+                                                for html_file, chapter_data in zip(html_files, extracted)
+                                                if 'error' not in chapter_data})
+        
+        cache = {}
+        index = []
+        postings = InvertedIndex()
+        fields = {field: InvertedIndex() for field in field_indexes}
+        metadata = MetadataIndex(metadata_index.fields)
+        bodies = {}
+        for html_file, chapter_data in zip(html_files, extracted):
             try:
-                chapter_data = extract_chapter_content(html_file)
+                if 'error' not in chapter_data:
+                    apply_chapter_status(chapter_data)
                 chapter_id = html_file.parent.name
+                postings.add(chapter_id, chapter_data['title'], chapter_data['content'])
+                add_to_field_indexes(fields, chapter_id, chapter_data)
+                metadata.add(chapter_id, chapter_data)
+                bodies[chapter_id] = chapter_data['content']
                 
-                chapter_cache[chapter_id] = chapter_data
-                chapter_index.append({
-                    'id': chapter_id,
-                    'title': chapter_data['title'],
-                    'subtitle': chapter_data['subtitle'],
-                    'description': chapter_data['description'],
-                    'word_count': chapter_data['word_count'],
-                    'has_images': chapter_data['has_images'],
-                    'status': chapter_data['status'],
-                    'design_concepts': chapter_data['design_concepts']
-                })
+                drop_chapter_body(chapter_data, store is not None and chapter_id in store)
+                cache[chapter_id] = chapter_data
+                index.append(make_chapter_index_entry(chapter_id, chapter_data))
             except Exception as e:
                 print(f"Error processing {html_file}: {e}", file=sys.stderr)
         
-        print(f"Successfully indexed {len(chapter_index)} chapters", file=sys.stderr)
+        matrix = TermMatrix.build(bodies, get_term_matrix_path(data_dir, "book_server"))
+        semantic = SemanticIndex.build(matrix, get_semantic_index_path(data_dir, "book_server"))
+        similarities = SimilarityMatrix.build(matrix, get_similarity_matrix_path(data_dir, "book_server"))
+        names = NameIndex({chapter_id: chapter_data['title'] for chapter_id, chapter_data in cache.items()})
+        concepts = ConceptIndex()
+        for chapter_id, chapter_data in cache.items():
+            concepts.add(chapter_id, chapter_data['design_concepts'])
+        
+        print(f"Successfully indexed {len(index)} chapters", file=sys.stderr)
+        return cache, index, store, postings, fields, metadata, matrix, semantic, names, concepts, similarities
         
     except Exception as e:
         print(f"Error in build_chapter_index: {e}", file=sys.stderr)
         import traceback
         traceback.print_exc(file=sys.stderr)
+        return None
+
+def install_chapter_index(loaded):
+    """Swap in an index produced by load_chapter_index (on the event loop thread)."""
+    global chapter_cache, chapter_index, text_store, chapter_search_index, field_indexes, term_matrix, semantic_index
+    global metadata_index, chapter_names, concept_index, chapter_similarities
+    if loaded is None:
+        return
+    if text_store is not None and text_store is not loaded[2]:
+        text_store.close()
+    (chapter_cache, chapter_index, text_store, chapter_search_index, field_indexes, metadata_index,
+     term_matrix, semantic_index, chapter_names, concept_index, chapter_similarities) = loaded
+    content_lru.invalidate()
+
+def build_chapter_index():
+    """Build an index of all chapters in the data directory."""
+    install_chapter_index(load_chapter_index())
+
+# Startup build, run in the background so the MCP handshake is not delayed
+index_build = IndexBuild(load_chapter_index, install_chapter_index,
+                         lambda: not chapter_index, lambda: get_data_directory())
+
+def extract_chapter_updates(article_dirs: List[Path]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """Re-extract changed article directories; returns (updated chapters, removed IDs)."""
+    updates = {}
+    removed = []
+    for article_dir in article_dirs:
+        html_files = sorted(article_dir.glob("*.html")) if article_dir.is_dir() else []
+        if not html_files:
+            removed.append(article_dir.name)
+        for html_file in html_files:
+            updates[article_dir.name] = extract_chapter_content(html_file)
+    return updates, removed
 
-def find_related_chapters_by_concepts(target_concepts: List[str], exclude_id: str = None) -> List[Dict]:
-    """Find chapters with overlapping design concepts."""
+def apply_chapter_updates(updates: Dict[str, Dict[str, Any]], removed: List[str]):
+    """Patch chapter_cache and chapter_index in place.
+
+    Must run on the event loop thread so tool calls never observe a
+    half-applied update.
+    """
+    import sys
+    removed_ids = set(removed)
+    for chapter_id in removed_ids:
+        chapter_cache.pop(chapter_id, None)
+        chapter_search_index.remove(chapter_id)
+        remove_from_field_indexes(field_indexes, chapter_id)
+        metadata_index.remove(chapter_id)
+        if term_matrix is not None:
+            term_matrix.remove(chapter_id)
+        if semantic_index is not None:
+            semantic_index.remove(chapter_id)
+        if chapter_similarities is not None:
+            chapter_similarities.remove(chapter_id)
+        concept_index.remove(chapter_id)
+        chapter_names.remove(chapter_id)
+        content_lru.invalidate(chapter_id)
+        if text_store is not None:
+            text_store.discard(chapter_id)
+    if removed_ids:
+        chapter_index[:] = [entry for entry in chapter_index if entry['id'] not in removed_ids]
+    
+    positions = {entry['id']: i for i, entry in enumerate(chapter_index)}
+    for chapter_id, chapter_data in updates.items():
+        chapter_search_index.add(chapter_id, chapter_data['title'], chapter_data['content'])
+        add_to_field_indexes(field_indexes, chapter_id, chapter_data)
+        metadata_index.add(chapter_id, chapter_data)
+        if term_matrix is not None:
+            term_matrix.update(chapter_id, chapter_data['content'])
+        if semantic_index is not None:
+            semantic_index.update(chapter_id)
+        if chapter_similarities is not None:
+            chapter_similarities.update(chapter_id)
+        concept_index.add(chapter_id, chapter_data['design_concepts'])
+        chapter_names.add(chapter_id, chapter_data['title'])
+        cache_chapter(chapter_id, chapter_data)
+        entry = make_chapter_index_entry(chapter_id, chapter_data)
+        if chapter_id in positions:
+            chapter_index[positions[chapter_id]] = entry
+        else:
+            chapter_index.append(entry)
+    
+    print(f"Re-indexed {len(updates)} chapters, removed {len(removed_ids)}", file=sys.stderr)
+
+def start_data_watcher(loop: asyncio.AbstractEventLoop) -> Optional[DataDirectoryWatcher]:
+    """Watch the data directory and keep the chapter index up to date."""
+    def on_change(article_dirs: List[Path]):
+        # Parse on the watcher thread, mutate the caches on the event loop
+        updates, removed = extract_chapter_updates(article_dirs)
+        # Changes seen during the startup build are applied on top of its result
+        loop.call_soon_threadsafe(index_build.call_when_done, apply_chapter_updates, updates, removed)
+    
+    watcher = DataDirectoryWatcher(get_data_directory(), on_change)
+    return watcher if watcher.start() else None
+
+def find_related_chapters_by_concepts(target_concepts: List[str], exclude_id: str = None,
+                                      limit: Optional[int] = None, allowed: Optional[Set[str]] = None) -> List[Dict]:
+    """Find chapters with overlapping design concepts.
+
+    Only the chapters sharing a concept are visited; allowed restricts
+    them and limit keeps the best (all by default).
+    """
     if not target_concepts:
         return []
     
     related = []
+    for chapter_id, overlap_score, shared_concepts in concept_index.related(target_concepts, exclude_id,
+                                                                            limit, allowed):
+        chapter_data = chapter_cache[chapter_id]
+        related.append({
+            'id': chapter_id,
+            'title': chapter_data['title'],
+            'status': chapter_data['status'],
+            'overlap_score': overlap_score,
+            'shared_concepts': shared_concepts,
+            'word_count': chapter_data['word_count']
+        })
+    return related
+
+def semantic_related_chapters(results: List[Tuple[str, float]], target_concepts: List[str],
+                              match_label: str = "semantic match") -> List[Dict]:
+    """Result entries for (chapter ID, similarity) pairs from the semantic index or similarity matrix."""
     target_set = set(concept.lower() for concept in target_concepts)
-    
-    for chapter_id, chapter_data in chapter_cache.items():
-        if exclude_id and chapter_id == exclude_id:
-            continue
-            
-        chapter_concepts = set(concept.lower() for concept in chapter_data['design_concepts'])
-        overlap = target_set.intersection(chapter_concepts)
-        
-        if overlap:
-            related.append({
-                'id': chapter_id,
-                'title': chapter_data['title'],
-                'status': chapter_data['status'],
-                'overlap_score': len(overlap),
-                'shared_concepts': list(overlap),
-                'word_count': chapter_data['word_count']
-            })
-    
-    return sorted(related, key=lambda x: x['overlap_score'], reverse=True)
+    related = []
+    for chapter_id, similarity in results:
+        chapter_data = chapter_cache[chapter_id]
+        shared_concepts = [concept for concept in chapter_data['design_concepts'] if concept.lower() in target_set]
+        related.append({
+            'id': chapter_id,
+            'title': chapter_data['title'],
+            'status': chapter_data['status'],
+            'overlap_score': round(similarity, 2),
+            'shared_concepts': shared_concepts or [match_label],
+            'word_count': chapter_data['word_count']
+        })
+    return related
 
 def find_chapter_by_fuzzy_name(search_name: str) -> Optional[str]:
     """Find a chapter ID using fuzzy matching on titles and IDs."""
-    if not search_name:
-        return None
-    
-    search_lower = search_name.lower().strip()
-    
-    # 1. Exact ID match
-    if search_name in chapter_cache:
-        return search_name
-    
-    # 2. Exact title match (case insensitive)
-    for chapter_id, chapter_data in chapter_cache.items():
-        if chapter_data['title'].lower() == search_lower:
-            return chapter_id
-    
-    # 3. Title contains search term
-    for chapter_id, chapter_data in chapter_cache.items():
-        if search_lower in chapter_data['title'].lower():
-            return chapter_id
-    
-    # 4. Search term contains title (for partial matches)
-    for chapter_id, chapter_data in chapter_cache.items():
-        title_lower = chapter_data['title'].lower()
-        if title_lower in search_lower:
-            return chapter_id
-    
-    # 5. ID contains search term (remove spaces and dashes for matching)
-    search_normalized = search_lower.replace(' ', '-').replace('_', '-')
-    for chapter_id in chapter_cache.keys():
-        if search_normalized in chapter_id.lower():
-            return chapter_id
-    
-    # 6. Reverse: chapter ID contains normalized search
-    for chapter_id in chapter_cache.keys():
-        id_normalized = chapter_id.lower().replace('-', ' ').replace('_', ' ')
-        if search_lower in id_normalized:
-            return chapter_id
-    
-    return None
+    return chapter_names.resolve(search_name)
 
 def get_similar_chapter_suggestions(search_name: str, limit: int = 5) -> List[Dict[str, str]]:
     """Get suggestions for similar chapter names when exact match fails."""
-    search_lower = search_name.lower().strip()
-    suggestions = []
-    
-    for chapter_id, chapter_data in chapter_cache.items():
-        title = chapter_data['title']
-        
-        # Calculate simple similarity based on common words
-        search_words = set(search_lower.split())
-        title_words = set(title.lower().split())
-        common_words = search_words.intersection(title_words)
-        
-        if common_words:
-            similarity_score = len(common_words) / max(len(search_words), len(title_words))
-            suggestions.append({
-                'id': chapter_id,
-                'title': title,
-                'score': similarity_score,
-                'status': chapter_data['status']
-            })
+    return [{
+        'id': chapter_id,
+        'title': chapter_cache[chapter_id]['title'],
+        'score': similarity_score,
+        'status': chapter_cache[chapter_id]['status']
+    } for chapter_id, similarity_score in chapter_names.suggest(search_name, limit)]
+
+def resolve_chapter_names(names: List[str]) -> Tuple[List[str], List[str], List[str]]:
+    """Resolve several chapter names in one pass.
+
+    Returns (matched IDs in order without repeats, "'name' → 'id'" notes
+    for fuzzy matches, names that matched nothing).
+    """
+    matched_ids = []
+    fuzzy_matches = []
+    not_found = []
+    for name, matched_id in {name: find_chapter_by_fuzzy_name(name) for name in names}.items():
+        if matched_id is None:
+            not_found.append(name)
+            continue
+        if matched_id not in matched_ids:
+            matched_ids.append(matched_id)
+        if matched_id != name:
+            fuzzy_matches.append(f"'{name}' → '{matched_id}'")
+    return matched_ids, fuzzy_matches, not_found
+
+def truncate_text(text: str, max_words: int = 0, max_bytes: int = 0) -> Tuple[str, bool]:
+    """Cut text after its first max_words words and to at most max_bytes UTF-8 bytes
+    (0 means no limit), at a word boundary; returns (text, whether it was cut)."""
+    cut = len(text)
+    if max_words:
+        for count, word in enumerate(re.finditer(r'\S+', text), 1):
+            if count == max_words:
+                cut = word.end()
+                break
+    if max_bytes and len(text[:cut].encode('utf-8')) > max_bytes:
+        cut = len(text.encode('utf-8')[:max_bytes].decode('utf-8', errors='ignore'))
+        # Back up to the last whitespace so no word is split
+        boundary = max(text.rfind(' ', 0, cut + 1), text.rfind('\n', 0, cut + 1))
+        if boundary > 0:
+            cut = boundary
+    if cut >= len(text.rstrip()):
+        return text, False
+    return text[:cut].rstrip(), True
+
+def format_chapter_details(chapter: Dict[str, Any]) -> str:
+    """The subtitle and metadata lines shown above a chapter's content."""
+    details = ""
+    if chapter['subtitle']:
+        details += f"**Subtitle:** {chapter['subtitle']}\n\n"
     
-    # Sort by similarity score
-    suggestions.sort(key=lambda x: x['score'], reverse=True)
-    return suggestions[:limit]
+    details += f"**Status:** {chapter['status'].title()}\n"
+    details += f"**Word Count:** {chapter['word_count']}\n"
+    details += f"**Has Images:** {'Yes' if chapter['has_images'] else 'No'}\n"
+    details += f"**Design Concepts:** {', '.join(chapter['design_concepts'])}\n"
+    details += f"**File Path:** {chapter['path']}\n\n"
+    return details
+
+def format_missing_chapters(not_found: List[str], limit: int = 3) -> str:
+    """Suggestions for each name that matched no chapter."""
+    text = ""
+    for missing in not_found:
+        suggestions = get_similar_chapter_suggestions(missing, limit)
+        if suggestions:
+            text += f"Suggestions for '{missing}':\n"
+            for suggestion in suggestions:
+                text += f"- **{suggestion['title']}** (ID: `{suggestion['id']}`)\n"
+            text += "\n"
+    return text
 
 def analyze_content_overlaps(chapter_ids: List[str]) -> Dict:
     """Analyze content overlaps between specific chapters."""
     if len(chapter_ids) < 2:
         return {"error": "Need at least 2 chapters to analyze overlaps"}
     
-    chapters = []
-    for chapter_id in chapter_ids:
-        if chapter_id in chapter_cache:
-            chapters.append(chapter_cache[chapter_id])
+    valid_ids = [chapter_id for chapter_id in chapter_ids if chapter_id in chapter_cache]
+    chapters = [chapter_cache[chapter_id] for chapter_id in valid_ids]
     
     if len(chapters) < 2:
         return {"error": "Not enough valid chapters found"}
     
+    if term_matrix is not None:
+        # Shared terms come from the TF-IDF matrix, most characteristic first
+        common_words, pairs = term_matrix.overlaps(valid_ids)
+        return {
+            'chapters_analyzed': [ch['title'] for ch in chapters],
+            'common_concepts': common_words[:20],
+            'pairwise_overlaps': [{
+                'chapter1': chapters[i]['title'],
+                'chapter2': chapters[j]['title'],
+                'overlap_words': shared,
+                'common_themes': themes
+            } for i, j, shared, themes in pairs]
+        }
+    
     # Simple word overlap analysis
     all_words = []
     chapter_words = []
     
-    for chapter in chapters:
-        words = set(re.findall(r'\b[a-zA-Z]{4,}\b', chapter['content'].lower()))
+    for chapter_id in valid_ids:
+        words = set(re.findall(r'\b[a-zA-Z]{4,}\b', get_chapter_text(chapter_id).lower()))
         chapter_words.append(words)
         all_words.extend(words)
     
@@ -370,6 +609,28 @@ async def handle_list_tools() -> List[types.Tool]:
                         "type": "boolean",
                         "description": "Include draft chapters in results (default: true)",
                         "default": True
+                    },
+                    "match": {
+                        "type": "string",
+                        "enum": ["words", "phrase", "near", "semantic"],
+                        "description": "How a multi-word theme matches chapter text: 'words' (default) scores each word found in the opening of the chapter, 'phrase' requires the exact phrase and 'near' all words within 'window' words of each other, anywhere in the chapter. 'semantic' ranks chapters (for a theme or a chapter_id) by similarity in a latent semantic space, so chapters about the same topic match even when they use different words",
+                        "default": "words"
+                    },
+                    "window": {
+                        "type": "integer",
+                        "description": f"Span in words for match='near' (default: 10, at most {FIELD_GAP})",
+                        "default": 10
+                    },
+                    "syntax": {
+                        "type": "string",
+                        "enum": ["plain", "boolean"],
+                        "description": "'boolean' parses the theme as a boolean expression: AND/OR/NOT (or -word), parentheses, \"quoted phrases\", title:, subtitle:, status:finished, concept:analytics and words:>2000 / words:1000..2000; matches are ranked by BM25 (default: 'plain')",
+                        "default": "plain"
+                    },
+                    "snippets": {
+                        "type": "boolean",
+                        "description": "For theme searches, show the best-matching passage of each chapter with matches in **bold** (default: true)",
+                        "default": True
                     }
                 }
             }
@@ -403,6 +664,32 @@ async def handle_list_tools() -> List[types.Tool]:
                 "required": ["chapter_id"]
             }
         ),
+        types.Tool(
+            name="get_chapters",
+            description="Get several chapters in one call (e.g. to merge them), with fuzzy name matching and per-chapter length caps",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "chapter_ids": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "IDs, titles or approximate names of the chapters to fetch",
+                        "minItems": 1
+                    },
+                    "max_words": {
+                        "type": "integer",
+                        "description": f"Words of each chapter to include, 0 for all (default: {DEFAULT_BATCH_MAX_WORDS})",
+                        "default": DEFAULT_BATCH_MAX_WORDS
+                    },
+                    "max_bytes": {
+                        "type": "integer",
+                        "description": "UTF-8 bytes of each chapter to include, 0 for no limit (default: 0)",
+                        "default": 0
+                    }
+                },
+                "required": ["chapter_ids"]
+            }
+        ),
         types.Tool(
             name="extract_design_philosophy",
             description="Extract core design concepts and philosophy themes across chapters",
@@ -465,14 +752,26 @@ async def handle_list_tools() -> List[types.Tool]:
 async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextContent]:
     """Handle MCP tool calls for book writing workflow."""
     
-    # Ensure chapter index is built
-    if not chapter_index:
-        build_chapter_index()
+    # Wait for the background build (starting one if the index is empty and
+    # the corpus changed since it was last found empty); if it is still
+    # running, say so rather than answering from a partial index
+    if not await index_build.ensure(INDEX_WAIT_SECONDS):
+        return [types.TextContent(type="text", text=index_build.status("chapters"))]
     
     if name == "find_related_chapters":
         theme = arguments.get("theme", "")
         chapter_id = arguments.get("chapter_id")
         include_drafts = arguments.get("include_drafts", True)
+        # Words to highlight in snippets; chapter similarity has none
+        snippet_query = None
+        
+        semantic = arguments.get("match") == "semantic"
+        if semantic and semantic_index is None:
+            return [types.TextContent(type="text", text="Error: Semantic matching needs numpy and scipy "
+                                                          "and MEDIUM_MCP_LSA_DIMENSIONS above 0")]
+        # Semantic candidates are filtered before the top-k selection
+        allowed = None if include_drafts else [cid for cid, data in chapter_cache.items()
+                                               if data['status'] == 'finished']
         
         if chapter_id:
             # Try fuzzy matching on chapter_id
@@ -480,8 +779,23 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
             if matched_id:
                 # Find chapters similar to the specified chapter
                 target_concepts = chapter_cache[matched_id]['design_concepts']
-                related = find_related_chapters_by_concepts(target_concepts, exclude_id=matched_id)
+                if semantic and matched_id in semantic_index:
+                    related = semantic_related_chapters(semantic_index.similar(matched_id, 10, allowed),
+                                                        target_concepts)
+                    method = None
+                elif chapter_similarities is not None and matched_id in chapter_similarities:
+                    # One row of the precomputed TF-IDF cosine matrix, then top-k
+                    related = semantic_related_chapters(chapter_similarities.similar(matched_id, 10, allowed),
+                                                        target_concepts, "similar wording")
+                    method = "similar wording"
+                else:
+                    related = find_related_chapters_by_concepts(target_concepts, exclude_id=matched_id, limit=10,
+                                                                allowed=None if allowed is None else set(allowed))
+                    method = "shared design concepts"
                 result_text = f"Chapters related to '{chapter_cache[matched_id]['title']}':\n\n"
+                if semantic and method:
+                    result_text += f"*Note: This chapter is not in the semantic index yet, so these results are " \
+                                   f"ranked by {method} instead.*\n\n"
                 if matched_id != chapter_id:
                     result_text += f"*Note: Found using fuzzy matching. Searched for '{chapter_id}', found '{matched_id}'*\n\n"
             else:
@@ -493,11 +807,57 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
                     for suggestion in suggestions:
                         error_text += f"- **{suggestion['title']}** (ID: `{suggestion['id']}`, {suggestion['status']})\n"
                 return [types.TextContent(type="text", text=error_text)]
+        elif theme and arguments.get("syntax") == "boolean":
+            try:
+                tree = parse_query(theme)
+                matched = QueryEvaluator(chapter_search_index, field_indexes, metadata_index, chapter_cache,
+                                         get_chapter_document).evaluate(tree)
+            except QuerySyntaxError as e:
+                return [types.TextContent(type="text", text=f"Error: {e}")]
+            
+            # Filter before scoring, so only surviving chapters are ranked
+            if not include_drafts:
+                matched = {cid for cid in matched if chapter_cache[cid]['status'] == 'finished'}
+            terms = positive_terms(tree)
+            scores = chapter_search_index.score(' '.join(terms), matched)
+            snippet_query = ' '.join(terms)
+            
+            related = []
+            for cid, score in top_scores({cid: scores.get(cid, 0.0) for cid in matched}, len(matched)):
+                chapter_data = chapter_cache[cid]
+                shared_concepts = [concept for concept in chapter_data['design_concepts']
+                                   if any(term.lower() in concept.lower() for term in terms)]
+                related.append({
+                    'id': cid,
+                    'title': chapter_data['title'],
+                    'status': chapter_data['status'],
+                    'overlap_score': round(score, 2),
+                    'shared_concepts': shared_concepts or ["query match"],
+                    'word_count': chapter_data['word_count']
+                })
+            result_text = f"Chapters matching '{theme}':\n\n"
+        elif theme and semantic:
+            # One matrix-vector product in the latent space, then top-k
+            related = semantic_related_chapters(semantic_index.search(theme, 10, allowed=allowed), [])
+            result_text = f"Chapters semantically related to theme '{theme}':\n\n"
+            snippet_query = theme
         elif theme:
             # Enhanced theme search - also search in titles and content
             theme_lower = theme.lower()
+            theme_words = theme_lower.split()
             related = []
             
+            # Phrase and proximity matches come from the word index and
+            # cover the full chapter rather than its opening
+            match = arguments.get("match", "words")
+            if match == "phrase":
+                content_matches = chapter_search_index.phrase_counts(theme, get_chapter_document)
+            elif match == "near":
+                content_matches = chapter_search_index.near_counts(theme, arguments.get("window", 10),
+                                                                 get_chapter_document)
+            else:
+                content_matches = None
+            
             for chapter_id, chapter_data in chapter_cache.items():
                 score = 0
                 shared_concepts = []
@@ -513,14 +873,19 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
                     score += 3
                     shared_concepts.append("title match")
                 
-                # Check content (sample first 1000 chars to avoid performance issues)
-                content_sample = chapter_data['content'][:1000].lower()
-                theme_words = theme_lower.split()
-                for word in theme_words:
-                    if len(word) > 3 and word in content_sample:  # Only meaningful words
-                        score += 1
-                        if f"content:{word}" not in shared_concepts:
-                            shared_concepts.append(f"content:{word}")
+                if content_matches is not None:
+                    # Worth as much as every word matching separately
+                    if chapter_id in content_matches:
+                        score += len(theme_words)
+                        shared_concepts.append(f"{match}:{theme_lower} ({content_matches[chapter_id]}x)")
+                else:
+                    # Check content (sample first 1000 chars to avoid performance issues)
+                    content_sample = get_chapter_text(chapter_id, preview=True).lower()
+                    for word in theme_words:
+                        if len(word) > 3 and word in content_sample:  # Only meaningful words
+                            score += 1
+                            if f"content:{word}" not in shared_concepts:
+                                shared_concepts.append(f"content:{word}")
                 
                 if score > 0:
                     related.append({
@@ -534,16 +899,24 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
             
             related = sorted(related, key=lambda x: x['overlap_score'], reverse=True)
             result_text = f"Chapters related to theme '{theme}':\n\n"
+            snippet_query = theme
         else:
             return [types.TextContent(type="text", text="Error: Must provide either 'theme' or 'chapter_id'")]
         
         if not include_drafts:
             related = [r for r in related if chapter_cache[r['id']]['status'] == 'finished']
+        if not arguments.get("snippets", True):
+            snippet_query = None
         
         for chapter in related[:10]:  # Top 10 results
             result_text += f"**{chapter['title']}** ({chapter['status']})\n"
             result_text += f"ID: {chapter['id']}\n"
             result_text += f"Shared concepts: {', '.join(chapter['shared_concepts'][:5])}\n"  # Limit display
+            if snippet_query:
+                # Only the shown chapters' bodies are read
+                snippet = word_snippet(get_chapter_text(chapter['id']), snippet_query)
+                if snippet:
+                    result_text += f"Snippet: {snippet}\n"
             result_text += f"Words: {chapter['word_count']}, Relevance score: {chapter['overlap_score']}\n\n"
         
         if not related:
@@ -612,16 +985,44 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
         if matched_id != chapter_id:
             result_text += f"*Note: Found using fuzzy matching. Searched for '{chapter_id}', found '{matched_id}'*\n\n"
         
-        if chapter['subtitle']:
-            result_text += f"**Subtitle:** {chapter['subtitle']}\n\n"
-        
-        result_text += f"**Status:** {chapter['status'].title()}\n"
-        result_text += f"**Word Count:** {chapter['word_count']}\n"
-        result_text += f"**Has Images:** {'Yes' if chapter['has_images'] else 'No'}\n"
-        result_text += f"**Design Concepts:** {', '.join(chapter['design_concepts'])}\n"
-        result_text += f"**File Path:** {chapter['path']}\n\n"
+        result_text += format_chapter_details(chapter)
         result_text += "## Content\n\n"
-        result_text += chapter['content']
+        result_text += get_chapter_text(matched_id)
+        
+        return [types.TextContent(type="text", text=result_text)]
+    
+    elif name == "get_chapters":
+        chapter_ids = arguments.get("chapter_ids", [])
+        if not chapter_ids:
+            return [types.TextContent(type="text", text="Error: chapter_ids is required")]
+        max_words = max(0, int(arguments.get("max_words", DEFAULT_BATCH_MAX_WORDS)))
+        max_bytes = max(0, int(arguments.get("max_bytes", 0)))
+        
+        matched_ids, fuzzy_matches, not_found = resolve_chapter_names(chapter_ids)
+        if not matched_ids:
+            error_text = f"Error: Could not find chapters: {', '.join(not_found)}\n\n"
+            error_text += format_missing_chapters(not_found) or \
+                "Use `analyze_chapter_completeness` to see all available chapters."
+            return [types.TextContent(type="text", text=error_text)]
+        
+        result_text = f"Fetched {len(matched_ids)} chapter{'s' if len(matched_ids) != 1 else ''}:\n\n"
+        if fuzzy_matches:
+            result_text += f"*Note: Used fuzzy matching for: {', '.join(fuzzy_matches)}*\n\n"
+        if not_found:
+            result_text += f"**Not found:** {', '.join(not_found)}\n\n"
+            result_text += format_missing_chapters(not_found)
+        
+        for matched_id in matched_ids:
+            chapter = chapter_cache[matched_id]
+            content, truncated = truncate_text(get_chapter_text(matched_id), max_words, max_bytes)
+            result_text += f"---\n\n# {chapter['title']}\n\n"
+            result_text += f"**ID:** `{matched_id}`\n"
+            result_text += format_chapter_details(chapter)
+            result_text += "## Content\n\n"
+            result_text += content + "\n\n"
+            if truncated:
+                result_text += f"*Truncated at {len(content.split())} of {chapter['word_count']} words; " \
+                               f"use `get_chapter_content` for the full text.*\n\n"
         
         return [types.TextContent(type="text", text=result_text)]
     
@@ -665,28 +1066,11 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
             return [types.TextContent(type="text", text="Error: Need at least 2 chapter IDs")]
         
         # Use fuzzy matching for all chapter IDs
-        matched_ids = []
-        fuzzy_matches = []
-        not_found = []
-        
-        for chapter_id in chapter_ids:
-            matched_id = find_chapter_by_fuzzy_name(chapter_id)
-            if matched_id:
-                matched_ids.append(matched_id)
-                if matched_id != chapter_id:
-                    fuzzy_matches.append(f"'{chapter_id}' → '{matched_id}'")
-            else:
-                not_found.append(chapter_id)
+        matched_ids, fuzzy_matches, not_found = resolve_chapter_names(chapter_ids)
         
         if not_found:
             error_text = f"Error: Could not find chapters: {', '.join(not_found)}\n\n"
-            for missing in not_found:
-                suggestions = get_similar_chapter_suggestions(missing, 3)
-                if suggestions:
-                    error_text += f"Suggestions for '{missing}':\n"
-                    for suggestion in suggestions:
-                        error_text += f"- **{suggestion['title']}** (ID: `{suggestion['id']}`)\n"
-                    error_text += "\n"
+            error_text += format_missing_chapters(not_found)
             return [types.TextContent(type="text", text=error_text)]
         
         if len(matched_ids) < 2:
@@ -756,9 +1140,16 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
 
 async def main():
     """Main entry point for the MCP server."""
+    watcher = None
     try:
-        # Build the initial chapter index
-        build_chapter_index()
+        loop = asyncio.get_running_loop()
+        
+        # Build the initial chapter index in the background; the server
+        # answers the handshake and list_tools meanwhile
+        index_build.start(loop)
+        
+        # Pick up new, edited and deleted articles without a restart
+        watcher = start_data_watcher(loop)
         
         # Run the server
         async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
@@ -781,7 +1172,9 @@ async def main():
         import traceback
         traceback.print_exc(file=sys.stderr)
         raise
+    finally:
+        if watcher:
+            watcher.stop()
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
\ No newline at end of file
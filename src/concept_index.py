@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+import sys
+import heapq
+import time
+from pathlib import Path
+from typing import List, Dict, Optional, Set, Tuple
+
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:  # Python < 3.10
+    def popcount(mask: int) -> int:
+        """Number of set bits in mask."""
+        return bin(mask).count('1')
+
+class ConceptIndex:
+    """Concept -> chapter postings with per-chapter concept bitsets.
+
+    Concepts (lowercased) are interned to integer IDs the first time they
+    are seen; a chapter's concepts are the bits of one int, so the overlap
+    of two concept sets is the popcount of their AND. Lookups only visit
+    the chapters posted under the target concepts. Chapters keep the
+    position they were first added at, like a dict, so ties are ordered as
+    in chapter_cache.
+    """
+
+    def __init__(self):
+        self._concept_ids: Dict[str, int] = {}
+        self._concepts: List[str] = []
+        self.postings: Dict[int, Set[str]] = {}
+        self.masks: Dict[str, int] = {}
+        self._positions: Dict[str, int] = {}
+        self._next_position = 0
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+    def _intern(self, concept: str) -> int:
+        concept_id = self._concept_ids.get(concept)
+        if concept_id is None:
+            concept_id = self._concept_ids[concept] = len(self._concepts)
+            self._concepts.append(concept)
+        return concept_id
+
+    def mask(self, concepts: List[str], intern: bool = False) -> int:
+        """Bitset of concepts; unknown concepts are interned or, by default, left out."""
+        mask = 0
+        for concept in concepts:
+            concept = concept.lower()
+            concept_id = self._intern(concept) if intern else self._concept_ids.get(concept)
+            if concept_id is not None:
+                mask |= 1 << concept_id
+        return mask
+
+    def add(self, chapter_id: str, concepts: List[str]):
+        """Index a chapter's concepts, replacing any it had."""
+        self.remove(chapter_id, keep_position=True)
+        mask = self.mask(concepts, intern=True)
+        self.masks[chapter_id] = mask
+        for concept_id in self.concept_ids(mask):
+            self.postings.setdefault(concept_id, set()).add(chapter_id)
+        if chapter_id not in self._positions:
+            self._positions[chapter_id] = self._next_position
+            self._next_position += 1
+
+    def remove(self, chapter_id: str, keep_position: bool = False):
+        """Drop a chapter (a no-op if it is not indexed)."""
+        mask = self.masks.pop(chapter_id, None)
+        if mask is None:
+            return
+        for concept_id in self.concept_ids(mask):
+            chapters = self.postings[concept_id]
+            chapters.discard(chapter_id)
+            if not chapters:
+                del self.postings[concept_id]
+        if not keep_position:
+            del self._positions[chapter_id]
+
+    @staticmethod
+    def concept_ids(mask: int) -> List[int]:
+        """IDs of the set bits of mask, lowest first."""
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(low.bit_length() - 1)
+            mask ^= low
+        return ids
+
+    def concepts(self, mask: int) -> List[str]:
+        """Names of the concepts in mask, in the order they were first seen."""
+        return [self._concepts[concept_id] for concept_id in self.concept_ids(mask)]
+
+    def related(self, target_concepts: List[str], exclude_id: Optional[str] = None, limit: Optional[int] = None,
+                allowed: Optional[Set[str]] = None) -> List[Tuple[str, int, List[str]]]:
+        """Chapters sharing any of target_concepts, as (chapter ID, shared count, shared
+        concepts), most shared first and ties in chapter order.
+
+        allowed restricts the candidates, and only the best limit are
+        returned (all when None).
+        """
+        target = self.mask(target_concepts)
+        candidates: Set[str] = set()
+        for concept_id in self.concept_ids(target):
+            candidates.update(self.postings.get(concept_id, ()))
+        candidates.discard(exclude_id)
+        if allowed is not None:
+            candidates &= allowed
+        masks, positions = self.masks, self._positions
+        keyed = [(-popcount(masks[chapter_id] & target), positions[chapter_id], chapter_id)
+                 for chapter_id in candidates]
+        ranked = sorted(keyed) if limit is None else heapq.nsmallest(limit, keyed)
+        return [(chapter_id, -negative_count, self.concepts(masks[chapter_id] & target))
+                for negative_count, _, chapter_id in ranked]
+
+def related_by_scanning(chapters: Dict[str, List[str]], target_concepts: List[str],
+                        exclude_id: Optional[str] = None) -> List[Tuple[str, int]]:
+    """The (chapter ID, shared count) ranking of ConceptIndex.related, intersecting every chapter's set."""
+    target_set = set(concept.lower() for concept in target_concepts)
+    related = []
+    for chapter_id, concepts in chapters.items():
+        if chapter_id != exclude_id:
+            overlap = target_set.intersection(concept.lower() for concept in concepts)
+            if overlap:
+                related.append((chapter_id, len(overlap), list(overlap)))
+    return [(chapter_id, count) for chapter_id, count, _ in sorted(related, key=lambda item: item[1], reverse=True)]
+
+if __name__ == "__main__":
+    # Check against scanning and time both: python src/concept_index.py [data_dir]
+    from ingest import extract_page
+    from book_server import extract_design_concepts
+
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent / "data"
+    chapters = {}
+    for html_file in sorted(data_dir.glob("*/*.html")):
+        page = extract_page(html_file, 'book_server')
+        chapters[html_file.parent.name] = extract_design_concepts(page['title'], page['content'])
+
+    start = time.perf_counter()
+    index = ConceptIndex()
+    for chapter_id, concepts in chapters.items():
+        index.add(chapter_id, concepts)
+    print(f"Indexed {len(index)} chapters, {len(index.postings)} concepts in "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+    queries = [(concepts, chapter_id) for chapter_id, concepts in chapters.items()]
+    queries += [(['Analytics', 'no such concept'], None), ([], None)]
+
+    def timed(related) -> Tuple[List[List[Tuple[str, int]]], float]:
+        start = time.perf_counter()
+        results = [related(concepts, exclude_id) for concepts, exclude_id in queries]
+        return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+    indexed, indexed_ms = timed(lambda concepts, exclude_id: [(chapter_id, count) for chapter_id, count, _
+                                                               in index.related(concepts, exclude_id)])
+    top, top_ms = timed(lambda concepts, exclude_id: [(chapter_id, count) for chapter_id, count, _
+                                                       in index.related(concepts, exclude_id, 10)])
+    scanned, scanned_ms = timed(lambda concepts, exclude_id: related_by_scanning(chapters, concepts, exclude_id))
+    mismatches = sum(1 for a, b, c in zip(indexed, top, scanned) if a != c or b != c[:10])
+    print(f"{len(queries)} lookups: index {indexed_ms:.3f} ms (top 10: {top_ms:.3f} ms), "
+          f"scan {scanned_ms:.3f} ms, {'ok' if not mismatches else f'{mismatches} mismatches'}")
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import mmap
+import bisect
+import struct
+from pathlib import Path
+from collections import OrderedDict
+from typing import Callable, Optional, Dict
+
+# Bump whenever the text store file layout changes
+TEXT_STORE_VERSION = 1
+
+class ContentLRU:
+    """Least-recently-used cache of article bodies bounded by a byte budget.
+
+    Bodies are fetched through loader on a miss and the least recently used
+    ones are evicted once the total size exceeds max_bytes. A single body
+    larger than the whole budget is returned but never kept.
+    """
+
+    def __init__(self, loader: Callable[[str], str], max_bytes: int):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key: str) -> str:
+        """Return the body for key, loading it on a miss."""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        text = self.loader(key)
+        size = sys.getsizeof(text)
+        if size <= self.max_bytes:
+            self._entries[key] = text
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= sys.getsizeof(evicted)
+        return text
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drop one cached body (or all of them when key is None)."""
+        if key is None:
+            self._entries.clear()
+            self.current_bytes = 0
+        elif key in self._entries:
+            self.current_bytes -= sys.getsizeof(self._entries.pop(key))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class TextStore:
+    """Article bodies packed into one memory-mapped file.
+
+    Layout: every original body followed by its lowercased copy (each entry
+    terminated by a NUL byte so no match can span two articles), then a JSON
+    offsets table, then an 8-byte little-endian offset of that table. Bodies
+    are decoded from the mapping on demand and substring counts run directly
+    over the mapped lowercase bytes, so neither needs a resident str per
+    article.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        table_offset = struct.unpack('<Q', self._map[-8:])[0]
+        table = json.loads(self._map[table_offset:-8].decode('utf-8'))
+        if table.get('version') != TEXT_STORE_VERSION:
+            self.close()
+            raise ValueError(f"Unsupported text store version in {path}")
+
+        # spans[key] = (start, end, lower_start, lower_end)
+        self._spans = {key: tuple(span) for key, span in table['spans'].items()}
+        # Lowercase regions sorted by start, for mapping a match back to its key
+        ordered = sorted((span[2], span[3], key) for key, span in self._spans.items())
+        self._lower_starts = [start for start, _, _ in ordered]
+        self._lower_ends = [end for _, end, _ in ordered]
+        self._lower_keys = [key for _, _, key in ordered]
+        self._lower_end = self._lower_ends[-1] if ordered else 0
+        self._lower_begin = self._lower_starts[0] if ordered else 0
+
+    @classmethod
+    def build(cls, path: Path, texts: Dict[str, str]) -> 'TextStore':
+        """Write texts to a new store file (atomically) and open it."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        spans = {}
+        with open(tmp_path, 'wb') as f:
+            offset = 0
+            originals = {}
+            for key, text in texts.items():
+                data = text.encode('utf-8')
+                f.write(data + b'\0')
+                originals[key] = (offset, offset + len(data))
+                offset += len(data) + 1
+            for key, text in texts.items():
+                data = text.lower().encode('utf-8')
+                f.write(data + b'\0')
+                spans[key] = originals[key] + (offset, offset + len(data))
+                offset += len(data) + 1
+            table = json.dumps({'version': TEXT_STORE_VERSION, 'spans': spans}).encode('utf-8')
+            f.write(table)
+            f.write(struct.pack('<Q', offset))
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._spans
+
+    def get(self, key: str) -> str:
+        """Decode one original body from the mapping."""
+        start, end, _, _ = self._spans[key]
+        return self._map[start:end].decode('utf-8')
+
+    def get_lower(self, key: str) -> str:
+        """Decode one lowercased body from the mapping."""
+        _, _, start, end = self._spans[key]
+        return self._map[start:end].decode('utf-8')
+
+    def discard(self, key: str):
+        """Forget a key whose text changed since the store was built."""
+        self._spans.pop(key, None)
+
+    def count_occurrences(self, needle: str) -> Dict[str, int]:
+        """Count non-overlapping occurrences of needle in each lowercased body.
+
+        Scans the mapped file once with mmap.find; byte counts equal str.count
+        because UTF-8 matches always fall on character boundaries.
+        """
+        pattern = needle.encode('utf-8')
+        counts = {}
+        if not pattern:
+            return counts
+
+        position = self._map.find(pattern, self._lower_begin, self._lower_end)
+        while position != -1:
+            i = bisect.bisect_right(self._lower_starts, position) - 1
+            key = self._lower_keys[i]
+            if key in self._spans:
+                counts[key] = counts.get(key, 0) + 1
+            position = self._map.find(pattern, position + len(pattern), self._lower_end)
+        return counts
+
+    def close(self):
+        """Unmap the file."""
+        self._map.close()
+        self._file.close()
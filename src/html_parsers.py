@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import time
+import argparse
+import tracemalloc
+from functools import lru_cache
+from pathlib import Path
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+# Parser backend used by the extractors: "html.parser" (bs4, default) or
+# "lxml" (native lxml tree queried with XPath, several times faster)
+PARSER_BACKEND = os.environ.get("MEDIUM_MCP_PARSER", "html.parser")
+
+# "full" builds the whole DOM; "targeted" (html.parser backend only) drops
+# script/style while building the tree and only materializes the elements
+# the extractors read: title candidates, subtitle, body container and meta
+PARSE_MODE = os.environ.get("MEDIUM_MCP_PARSE_MODE", "full")
+
+SUBTITLE_SELECTOR = '.p-summary, .graf--subtitle'
+DESCRIPTION_SELECTOR = 'meta[name="description"]'
+
+# A profile is (title selectors tried in order, body selector group)
+Profile = Tuple[List[str], str]
+
+_SIMPLE_SELECTOR = re.compile(r'^([a-zA-Z][a-zA-Z0-9]*)?((?:\.[\w-]+)*)((?:\[[\w-]+="[^"]*"\])*)$')
+
+@lru_cache(maxsize=None)
+def parse_selector(selector: str) -> Tuple[Tuple[Optional[str], Tuple[str, ...], Tuple[Tuple[str, str], ...]], ...]:
+    """Split a selector group into (tag, classes, attributes) simple selectors.
+
+    Supports comma groups of `tag`, `.class`, `tag.class` and `[attr="value"]`,
+    which is everything the Medium export selectors need.
+    """
+    parsed = []
+    for part in selector.split(','):
+        match = _SIMPLE_SELECTOR.match(part.strip())
+        if not match or not part.strip():
+            raise ValueError(f"Unsupported selector: {part.strip()!r}")
+        tag, classes, attributes = match.groups()
+        parsed.append((tag.lower() if tag else None,
+                       tuple(classes.split('.')[1:]),
+                       tuple(re.findall(r'\[([\w-]+)="([^"]*)"\]', attributes))))
+    return tuple(parsed)
+
+def needed_selectors(profiles: Dict[str, Profile]) -> List[str]:
+    """Every selector whose element the extractors read for these profiles."""
+    selectors = [SUBTITLE_SELECTOR, DESCRIPTION_SELECTOR]
+    for title_selectors, content_selector in profiles.values():
+        selectors.extend(title_selectors)
+        selectors.append(content_selector)
+    return selectors
+
+def make_strainer(profiles: Dict[str, Profile]) -> SoupStrainer:
+    """Build a SoupStrainer keeping only elements matched by the profiles' selectors."""
+    simple_selectors = [simple for selector in needed_selectors(profiles) for simple in parse_selector(selector)]
+
+    def keep(name, attrs):
+        classes = attrs.get('class') or []
+        if isinstance(classes, str):
+            classes = classes.split()
+        for tag, required_classes, required_attrs in simple_selectors:
+            if tag and tag != name:
+                continue
+            if any(class_name not in classes for class_name in required_classes):
+                continue
+            if any(attrs.get(attr) != value for attr, value in required_attrs):
+                continue
+            return True
+        return False
+
+    return SoupStrainer(keep)
+
+class TargetedSoup(BeautifulSoup):
+    """BeautifulSoup that never materializes script or style elements.
+
+    get_text() ignores script/style strings anyway, so skipping them while
+    the tree is built gives the same text without allocating their nodes
+    or decomposing them afterwards.
+    """
+
+    SKIPPED_TAGS = {'script', 'style'}
+
+    def reset(self):
+        super().reset()
+        self._skipping = None
+
+    def handle_starttag(self, name, namespace, nsprefix, attrs, **kwargs):
+        if name in self.SKIPPED_TAGS:
+            # Flush pending text so the strings around the element stay separate
+            self.endData()
+            self._skipping = name
+            return None
+        return super().handle_starttag(name, namespace, nsprefix, attrs, **kwargs)
+
+    def handle_endtag(self, name, nsprefix=None):
+        if self._skipping == name:
+            self._skipping = None
+            return
+        super().handle_endtag(name, nsprefix)
+
+    def handle_data(self, data):
+        if not self._skipping:
+            super().handle_data(data)
+
+def parse_with_bs4(content: str, profiles: Dict[str, Profile], mode: str = 'full') -> Dict[str, Dict[str, Any]]:
+    """Parse an export page once with BeautifulSoup's html.parser backend.
+
+    Every profile is evaluated against the same tree; titles are read before
+    any script/style element is removed, as the original extractors did.
+    """
+    if mode == 'targeted':
+        soup = TargetedSoup(content, 'html.parser', parse_only=make_strainer(profiles))
+        if any(soup.select_one(content_selector) is None for _, content_selector in profiles.values()):
+            # The whole-page text fallback needs the full tree
+            return parse_with_bs4(content, profiles)
+    else:
+        soup = BeautifulSoup(content, 'html.parser')
+
+    subtitle_elem = soup.select_one(SUBTITLE_SELECTOR)
+    subtitle = subtitle_elem.get_text().strip() if subtitle_elem else ""
+    meta_desc = soup.select_one(DESCRIPTION_SELECTOR)
+
+    results = {}
+    for name, (title_selectors, _) in profiles.items():
+        # First selector that matches wins, even if its text is empty
+        title = None
+        for selector in title_selectors:
+            title_elem = soup.select_one(selector)
+            if title_elem:
+                title = title_elem.get_text().strip()
+                break
+        results[name] = {
+            'title': title,
+            'subtitle': subtitle,
+            'has_description': meta_desc is not None,
+            'description': meta_desc.get('content') if meta_desc else None
+        }
+
+    for name, (_, content_selector) in profiles.items():
+        content_elem = soup.select_one(content_selector)
+        if content_elem:
+            # Remove script and style elements
+            for script in content_elem(["script", "style"]):
+                script.decompose()
+            results[name]['text'] = content_elem.get_text()
+        else:
+            # Fallback: get all text
+            for script in soup(["script", "style"]):
+                script.decompose()
+            results[name]['text'] = soup.get_text()
+    return results
+
+@lru_cache(maxsize=None)
+def css_to_xpath(selector: str) -> str:
+    """Translate a selector group (see parse_selector) into XPath.
+
+    Like select_one, indexing the result with [1] yields the first match in
+    document order.
+    """
+    conditions = []
+    for tag, classes, attributes in parse_selector(selector):
+        tests = [f"self::{tag}"] if tag else []
+        for class_name in classes:
+            tests.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')")
+        for name, value in attributes:
+            tests.append(f"@{name}=\"{value}\"")
+        conditions.append('(' + ' and '.join(tests or ['true()']) + ')')
+
+    return f"(//*[{' or '.join(conditions)}])[1]"
+
+# Elements inside which bs4 keeps whitespace-only strings verbatim
+PRESERVE_WHITESPACE_TAGS = {'pre', 'textarea'}
+
+def collapse_whitespace_like_bs4(root):
+    """Collapse whitespace-only text nodes the way bs4's tree builder does.
+
+    bs4 replaces every all-whitespace string outside pre/textarea with a
+    single newline (if it contained one) or a single space; lxml keeps them
+    verbatim, which would otherwise leak indentation into extracted text.
+    """
+    for node in root.xpath('//text()[normalize-space(.) = ""]'):
+        owner = node.getparent()
+        container = owner if node.is_text else owner.getparent()
+        if container is not None and (container.tag in PRESERVE_WHITESPACE_TAGS or
+                                      any(ancestor.tag in PRESERVE_WHITESPACE_TAGS
+                                          for ancestor in container.iterancestors())):
+            continue
+        collapsed = '\n' if '\n' in node else ' '
+        if node.is_text:
+            owner.text = collapsed
+        else:
+            owner.tail = collapsed
+
+def parse_with_lxml(content: str, profiles: Dict[str, Profile], mode: str = 'full') -> Dict[str, Dict[str, Any]]:
+    """Parse an export page once with lxml, producing the same fields as parse_with_bs4.
+
+    lxml builds its tree in C with no per-node Python objects, so there is
+    nothing for the targeted mode to prune and mode is ignored.
+    """
+    import lxml.html
+    from lxml import etree
+
+    if not content.strip():
+        # lxml refuses empty documents; bs4 happily returns empty fields
+        return parse_with_bs4(content, profiles)
+
+    root = lxml.html.document_fromstring(content)
+    collapse_whitespace_like_bs4(root)
+    # bs4's get_text() never includes script/style strings, wherever they are;
+    # with_tail=False keeps the text after each removed element
+    etree.strip_elements(root, 'script', 'style', with_tail=False)
+
+    def select_one(selector):
+        found = root.xpath(css_to_xpath(selector))
+        return found[0] if found else None
+
+    subtitle_elem = select_one(SUBTITLE_SELECTOR)
+    subtitle = subtitle_elem.text_content().strip() if subtitle_elem is not None else ""
+    meta_desc = select_one(DESCRIPTION_SELECTOR)
+
+    results = {}
+    for name, (title_selectors, _) in profiles.items():
+        title = None
+        for selector in title_selectors:
+            title_elem = select_one(selector)
+            if title_elem is not None:
+                title = title_elem.text_content().strip()
+                break
+        results[name] = {
+            'title': title,
+            'subtitle': subtitle,
+            'has_description': meta_desc is not None,
+            'description': meta_desc.get('content') if meta_desc is not None else None
+        }
+
+    for name, (_, content_selector) in profiles.items():
+        content_elem = select_one(content_selector)
+        target = content_elem if content_elem is not None else root
+        results[name]['text'] = target.text_content()
+    return results
+
+PARSER_BACKENDS: Dict[str, Callable[[str, Dict[str, Profile], str], Dict[str, Dict[str, Any]]]] = {
+    'html.parser': parse_with_bs4,
+    'lxml': parse_with_lxml
+}
+
+PARSE_MODES = ('full', 'targeted')
+
+# Checked once here: a bad value raising inside extraction would turn every
+# article into an error record and the archive would look empty
+if PARSER_BACKEND not in PARSER_BACKENDS:
+    print(f"Unknown MEDIUM_MCP_PARSER '{PARSER_BACKEND}' (expected one of {sorted(PARSER_BACKENDS)}), "
+          f"using html.parser", file=sys.stderr)
+    PARSER_BACKEND = 'html.parser'
+if PARSE_MODE not in PARSE_MODES:
+    print(f"Unknown MEDIUM_MCP_PARSE_MODE '{PARSE_MODE}' (expected one of {list(PARSE_MODES)}), using full",
+          file=sys.stderr)
+    PARSE_MODE = 'full'
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """Resolve the configured backend name, falling back to html.parser without lxml."""
+    backend = backend or PARSER_BACKEND
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend '{backend}', expected one of {sorted(PARSER_BACKENDS)}")
+    if backend == 'lxml':
+        try:
+            import lxml.html  # noqa: F401
+        except ImportError:
+            return 'html.parser'
+    return backend
+
+def parse_article_html(content: str, profiles: Dict[str, Profile],
+                       backend: Optional[str] = None, mode: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Parse an export page with the configured backend and parse mode.
+
+    Returns, per profile, the raw title (None if no selector matched),
+    subtitle, body text and meta description; callers apply their own
+    fallbacks and cleanup.
+    """
+    return PARSER_BACKENDS[resolve_backend(backend)](content, profiles, mode or PARSE_MODE)
+
+def compare_backends(html_files: List[Path], profiles: Dict[str, Profile],
+                     backend: str = 'lxml', mode: str = 'full') -> List[Dict[str, Any]]:
+    """Return every field where backend/mode output differs from full html.parser output."""
+    mismatches = []
+    for html_file in html_files:
+        with open(html_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        expected = parse_with_bs4(content, profiles)
+        actual = PARSER_BACKENDS[backend](content, profiles, mode)
+        for name, fields in expected.items():
+            for field, value in fields.items():
+                if actual[name][field] != value:
+                    mismatches.append({'path': str(html_file), 'profile': name, 'field': field,
+                                       'expected': value, 'actual': actual[name][field]})
+    return mismatches
+
+def benchmark_parse(html_files: List[Path], profiles: Dict[str, Profile],
+                    backend: str, mode: str) -> Dict[str, float]:
+    """Measure mean per-file parse time and mean per-file peak allocation."""
+    contents = []
+    for html_file in html_files:
+        with open(html_file, 'r', encoding='utf-8') as f:
+            contents.append(f.read())
+    parse = PARSER_BACKENDS[backend]
+
+    # Time and memory are measured in separate passes because tracemalloc
+    # slows allocation-heavy code down considerably
+    start = time.perf_counter()
+    for content in contents:
+        parse(content, profiles, mode)
+    elapsed = time.perf_counter() - start
+
+    peaks = []
+    tracemalloc.start()
+    for content in contents:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        parse(content, profiles, mode)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    count = max(len(contents), 1)
+    return {'ms_per_file': elapsed * 1000 / count, 'peak_kib_per_file': sum(peaks) / 1024 / count}
+
+if __name__ == "__main__":
+    from ingest import PARSE_PROFILES
+
+    parser = argparse.ArgumentParser(description="Check parser parity or benchmark parse modes")
+    parser.add_argument('data_dir', nargs='?', default=str(Path(__file__).parent.parent / "data"))
+    parser.add_argument('--backend', default='lxml', choices=sorted(PARSER_BACKENDS))
+    parser.add_argument('--mode', default='full', choices=PARSE_MODES)
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Compare full and targeted parsing instead of checking parity")
+    args = parser.parse_args()
+    html_files = sorted(Path(args.data_dir).glob("*/*.html"))
+
+    if args.benchmark:
+        full = benchmark_parse(html_files, PARSE_PROFILES, args.backend, 'full')
+        targeted = benchmark_parse(html_files, PARSE_PROFILES, args.backend, 'targeted')
+        print(f"{len(html_files)} files, {args.backend} backend")
+        for label, result in (('full', full), ('targeted', targeted)):
+            print(f"  {label:<9} {result['ms_per_file']:7.2f} ms/file  {result['peak_kib_per_file']:9.1f} KiB peak/file")
+        print(f"  reduction {1 - targeted['ms_per_file'] / max(full['ms_per_file'], 1e-9):7.1%} time   "
+              f"{1 - targeted['peak_kib_per_file'] / max(full['peak_kib_per_file'], 1e-9):7.1%} peak memory")
+        sys.exit(0)
+
+    # Parity check against full html.parser output
+    mismatches = compare_backends(html_files, PARSE_PROFILES, args.backend, args.mode)
+    for mismatch in mismatches[:20]:
+        print(f"{mismatch['path']}: {mismatch['field']} differs ({mismatch['profile']} profile)\n"
+              f"  html.parser: {mismatch['expected']!r:.200}\n  {args.backend}/{args.mode}: {mismatch['actual']!r:.200}")
+    print(f"Compared {len(html_files)} files: {len(mismatches)} mismatched fields")
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import asyncio
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from html_parsers import parse_article_html, resolve_backend, PARSE_MODE, PARSE_MODES, PARSER_BACKENDS
+from watcher import is_article_directory_name
+
+# Bump whenever the extracted fields or their meaning change so that stale
+# snapshots written by an older version are ignored instead of trusted.
+SNAPSHOT_VERSION = 1
+
+# Number of worker processes used to parse HTML (1 disables the pool)
+INDEX_WORKERS = int(os.environ.get("MEDIUM_MCP_INDEX_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# Below this many pages to parse (parse cache hits are not counted) the
+# cost of starting workers outweighs the speedup: each spawned worker
+# re-imports the server script that started it, with mcp, numpy and scipy
+PARALLEL_MIN_FILES = 128
+
+# Selector profiles of the two servers: (title selectors tried in order,
+# body selector group). Every page is parsed once for all profiles so
+# whichever server parses a file first caches the result for both.
+PARSE_PROFILES = {
+    'server': (['h1', 'title', '.p-name', '[data-testid="storyTitle"]'],
+               'article, .postArticle-content, .e-content, main'),
+    'book_server': (['h1.p-name', 'h1', 'title', '.p-name', '[data-testid="storyTitle"]'],
+                    '.e-content, article, .postArticle-content, main')
+}
+
+# Seconds a tool call waits for the startup index build before answering
+# with an "indexing N/M" status instead
+INDEX_WAIT_SECONDS = float(os.environ.get("MEDIUM_MCP_INDEX_WAIT", "10"))
+
+# Bump whenever parse output changes so cached parses are not reused
+PARSE_CACHE_VERSION = 2
+
+_parse_cache = None
+_parse_cache_lock = threading.Lock()
+
+# Pages a pool worker parsed, waiting for parse_export_page in this process
+_preparsed: Dict[Path, Dict[str, Dict[str, Any]]] = {}
+
+def get_cache_directory(data_dir: Path) -> Path:
+    """Get the directory holding snapshots and other derived index files."""
+    cache_dir = os.environ.get("MEDIUM_MCP_CACHE_DIR")
+    return Path(cache_dir) if cache_dir else data_dir / ".index_cache"
+
+def get_snapshot_path(data_dir: Path, name: str) -> Path:
+    """Get the path of the on-disk index snapshot for one server."""
+    return get_cache_directory(data_dir) / f"{name}.json"
+
+def get_text_store_path(data_dir: Path, name: str) -> Path:
+    """Get the path of the memory-mapped text store for one server."""
+    return get_cache_directory(data_dir) / f"{name}.text"
+
+def get_suffix_array_path(data_dir: Path, name: str) -> Path:
+    """Get the path of the saved suffix array for one server."""
+    return get_cache_directory(data_dir) / f"{name}.suffixes.npz"
+
+def get_term_matrix_path(data_dir: Path, name: str) -> Path:
+    """Get the path of the saved TF-IDF term matrix for one server."""
+    return get_cache_directory(data_dir) / f"{name}.terms.npz"
+
+def get_semantic_index_path(data_dir: Path, name: str) -> Path:
+    """Get the path of the saved latent semantic vectors for one server."""
+    return get_cache_directory(data_dir) / f"{name}.lsa.npz"
+
+def get_similarity_matrix_path(data_dir: Path, name: str) -> Path:
+    """Get the path of the saved document similarity matrix for one server."""
+    return get_cache_directory(data_dir) / f"{name}.similarity.npz"
+
+def get_parse_cache_path(data_dir: Path) -> Path:
+    """Get the path of the parse cache shared by both servers."""
+    return get_cache_directory(data_dir) / "parse_cache.sqlite"
+
+def get_parse_cache(data_dir: Path) -> Optional[sqlite3.Connection]:
+    """Open (once per process) the shared content-addressed parse cache."""
+    global _parse_cache
+    path = get_parse_cache_path(data_dir)
+    if _parse_cache is not None and _parse_cache[0] == path:
+        return _parse_cache[1]
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        # WAL lets both servers (and their worker processes) read while one writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS parsed (key TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        connection.commit()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Parse cache unavailable ({e}), parsing without it", file=sys.stderr)
+        connection = None
+    _parse_cache = (path, connection)
+    return connection
+
+def parse_cache_key(raw: bytes, backend: str, mode: str) -> str:
+    """Content-address a page by its bytes plus everything that affects parsing."""
+    return parse_cache_keys(raw, [(backend, mode)])[0]
+
+def parse_cache_keys(raw: bytes, configurations: List[Tuple[str, str]]) -> List[str]:
+    """parse_cache_key of a page for several (backend, mode) pairs, hashing its bytes once."""
+    content = hashlib.sha256(raw)
+    keys = []
+    for backend, mode in configurations:
+        digest = content.copy()
+        digest.update(json.dumps([PARSE_CACHE_VERSION, backend, mode, PARSE_PROFILES], sort_keys=True).encode('utf-8'))
+        keys.append(digest.hexdigest())
+    return keys
+
+def prune_parse_cache(data_dir: Path, html_files: List[Path]):
+    """Delete cached parses no page of html_files has any more.
+
+    That is every earlier version of an edited page, deleted pages and
+    parses by an older PARSE_CACHE_VERSION. Parses of the current pages
+    with every backend and mode are kept, since the other server may be
+    configured differently.
+    """
+    cache = get_parse_cache(data_dir)
+    if cache is None:
+        return
+    configurations = [(backend, mode) for backend in PARSER_BACKENDS for mode in PARSE_MODES]
+    keys = set()
+    for html_file in html_files:
+        try:
+            with open(html_file, 'rb') as f:
+                raw = f.read()
+        except OSError:
+            continue
+        keys.update(parse_cache_keys(raw, configurations))
+    try:
+        with _parse_cache_lock:
+            stale = [key for (key,) in cache.execute("SELECT key FROM parsed") if key not in keys]
+            cache.executemany("DELETE FROM parsed WHERE key = ?", ((key,) for key in stale))
+            cache.commit()
+    except sqlite3.Error:
+        pass  # Pruned on a later build instead
+
+def read_export_page(html_path: Path) -> Tuple[bytes, str, Optional[Dict[str, Dict[str, Any]]]]:
+    """Read a page and look it up in the shared parse cache: (raw bytes, cache key, cached parse or None)."""
+    with open(html_path, 'rb') as f:
+        raw = f.read()
+    key = parse_cache_key(raw, resolve_backend(), PARSE_MODE)
+    cache = get_parse_cache(html_path.parent.parent)
+
+    if cache is not None:
+        try:
+            with _parse_cache_lock:
+                row = cache.execute("SELECT data FROM parsed WHERE key = ?", (key,)).fetchone()
+            if row:
+                return raw, key, json.loads(row[0])
+        except sqlite3.Error:
+            pass
+    return raw, key, None
+
+def parse_export_page(html_path: Path) -> Dict[str, Dict[str, Any]]:
+    """Parse a page for every profile, reusing the shared parse cache."""
+    parsed = _preparsed.pop(html_path, None)
+    if parsed is not None:
+        return parsed
+    raw, key, parsed = read_export_page(html_path)
+    if parsed is not None:
+        return parsed
+
+    # Decode like open(..., 'r') would, including universal newlines
+    content = raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    parsed = parse_article_html(content, PARSE_PROFILES, resolve_backend(), PARSE_MODE)
+    cache = get_parse_cache(html_path.parent.parent)
+    if cache is not None:
+        try:
+            with _parse_cache_lock:
+                cache.execute("INSERT OR REPLACE INTO parsed (key, data) VALUES (?, ?)", (key, json.dumps(parsed)))
+                cache.commit()
+        except sqlite3.Error:
+            pass  # Another process holding the lock just means no caching this time
+    return parsed
+
+def parse_in_worker(html_path: Path) -> Optional[Dict[str, Dict[str, Any]]]:
+    """parse_export_page for a pool worker; None on failure, so extraction reports the error itself."""
+    try:
+        return parse_export_page(html_path)
+    except Exception:
+        return None
+
+def corpus_signature(data_dir: Path) -> Tuple:
+    """Cheap fingerprint of the data directory: each article directory's name and mtime.
+
+    Adding or removing an article directory changes the set of names,
+    adding or removing a file inside one changes its mtime. Hidden
+    directories (such as .index_cache, which every build writes to) and
+    the data directory's own mtime are left out, so a build never
+    invalidates the signature it records. A missing directory yields an
+    empty tuple.
+    """
+    try:
+        signature = [(entry.name, entry.stat().st_mtime_ns) for entry in os.scandir(data_dir)
+                     if entry.is_dir() and is_article_directory_name(entry.name)]
+    except OSError:
+        return ()
+    return tuple(sorted(signature))
+
+def extract_page(html_path: Path, profile: str) -> Dict[str, Any]:
+    """Extract the fields common to both servers from a Medium export page.
+
+    Raises on unreadable files; callers turn that into their error records.
+    """
+    parsed = parse_export_page(html_path)[profile]
+
+    title = parsed['title']
+    if not title:
+        title = html_path.stem.replace('-', ' ').title()
+
+    # Clean up text
+    text_content = re.sub(r'\n\s*\n', '\n\n', parsed['text'].strip())
+
+    img_dir = html_path.parent / 'img'
+    return {
+        'title': title,
+        'subtitle': parsed['subtitle'],
+        'content': text_content,
+        'description': parsed['description'],
+        'has_description': parsed['has_description'],
+        'path': str(html_path),
+        'directory': html_path.parent.name,
+        'word_count': len(text_content.split()),
+        'has_images': len(list(img_dir.glob('*'))) > 0 if img_dir.exists() else False
+    }
+
+def file_signature(html_path: Path) -> List[Optional[int]]:
+    """Get the (size, mtime, img mtime) signature used to detect changed articles."""
+    stat = html_path.stat()
+    img_dir = html_path.parent / 'img'
+    img_mtime = img_dir.stat().st_mtime_ns if img_dir.exists() else None
+    return [stat.st_size, stat.st_mtime_ns, img_mtime]
+
+def load_snapshot(snapshot_path: Path) -> Dict[str, Dict[str, Any]]:
+    """Load a snapshot, returning an empty one if it is missing, corrupt or outdated."""
+    try:
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION:
+        return {}
+    return snapshot.get('files', {})
+
+def save_snapshot(snapshot_path: Path, files: Dict[str, Dict[str, Any]]):
+    """Atomically write a snapshot so a crash never leaves a half-written file."""
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = snapshot_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': SNAPSHOT_VERSION, 'files': files}, f)
+    os.replace(tmp_path, snapshot_path)
+
+def collect_results(results, total: int, progress: Optional[Callable[[int, int], None]]) -> List[Dict[str, Any]]:
+    """Drain an iterator of extraction results, reporting (done, total) as it goes."""
+    collected = []
+    for data in results:
+        collected.append(data)
+        if progress:
+            progress(len(collected), total)
+    return collected
+
+def extract_many(html_files: List[Path],
+                 extract: Callable[[Path], Dict[str, Any]],
+                 workers: Optional[int] = None,
+                 progress: Optional[Callable[[int, int], None]] = None) -> List[Dict[str, Any]]:
+    """Run extract over html_files, parsing pages in a process pool when many are not in the parse cache.
+
+    Results are always returned in the same order as html_files. Workers
+    only run parse_export_page, so they need nothing but this module; the
+    parsed pages are handed back and extract runs in this process.
+    """
+    total = len(html_files)
+    workers = min(INDEX_WORKERS if workers is None else workers, total)
+    unparsed = []
+    if workers >= 2 and total >= PARALLEL_MIN_FILES:
+        unparsed = [html_file for html_file in html_files if not is_parse_cached(html_file)]
+    if len(unparsed) < PARALLEL_MIN_FILES:
+        return collect_results((extract(html_file) for html_file in html_files), total, progress)
+
+    # A few chunks per worker keeps IPC overhead low while still balancing
+    # uneven article sizes across the pool
+    chunksize = max(1, len(unparsed) // (workers * 4))
+    try:
+        # spawn behaves the same on every platform and is safe to use from
+        # a process that already has threads running
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            parsed = zip(unparsed, executor.map(parse_in_worker, unparsed, chunksize=chunksize))
+            return collect_results(extract_parsed(html_files, parsed, extract), total, progress)
+    except (BrokenProcessPool, OSError) as e:
+        print(f"Parallel extraction failed ({e}), falling back to serial", file=sys.stderr)
+        return collect_results((extract(html_file) for html_file in html_files), total, progress)
+
+def is_parse_cached(html_path: Path) -> bool:
+    """Whether the shared parse cache holds the current contents of a page."""
+    try:
+        return read_export_page(html_path)[2] is not None
+    except (OSError, ValueError):
+        return False
+
+def extract_parsed(html_files: List[Path], parsed, extract: Callable[[Path], Dict[str, Any]]):
+    """Yield extract(html_file) for each file, handing it the pages the pool parsed.
+
+    parsed yields (html_file, parsed pages) for a subsequence of html_files, in order.
+    """
+    pending = next(parsed, None)
+    for html_file in html_files:
+        if pending is not None and pending[0] == html_file:
+            if pending[1] is not None:
+                _preparsed[html_file] = pending[1]
+            pending = next(parsed, None)
+        try:
+            yield extract(html_file)
+        finally:
+            _preparsed.pop(html_file, None)
+
+def extract_with_snapshot(html_files: List[Path],
+                          extract: Callable[[Path], Dict[str, Any]],
+                          snapshot_path: Path,
+                          progress: Optional[Callable[[int, int], None]] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """Extract every file, reusing snapshot entries whose signature is unchanged.
+
+    Returns the extracted data in the same order as html_files together with
+    the number of entries that were served from the snapshot. progress, if
+    given, is called with (files done, total files) as extraction advances.
+    """
+    snapshot = load_snapshot(snapshot_path)
+    signatures = []
+    results = []
+    stale = []
+
+    for position, html_file in enumerate(html_files):
+        try:
+            signature = file_signature(html_file)
+        except OSError:
+            signature = None
+        signatures.append(signature)
+
+        cached = snapshot.get(str(html_file))
+        if signature is not None and cached and cached.get('signature') == signature:
+            results.append(cached['data'])
+        else:
+            results.append(None)
+            stale.append(position)
+
+    reused = len(html_files) - len(stale)
+    if progress:
+        progress(reused, len(html_files))
+        stale_progress = lambda done, _: progress(reused + done, len(html_files))
+    else:
+        stale_progress = None
+    for position, data in zip(stale, extract_many([html_files[i] for i in stale], extract,
+                                                  progress=stale_progress)):
+        results[position] = data
+
+    files = {}
+    for html_file, signature, data in zip(html_files, signatures, results):
+        # Failed extractions are retried on the next start rather than cached
+        if signature is not None and 'error' not in data:
+            files[str(html_file)] = {'signature': signature, 'data': data}
+
+    if reused != len(files) or len(files) != len(snapshot):
+        try:
+            save_snapshot(snapshot_path, files)
+        except OSError:
+            pass  # A read-only data directory just means no snapshot
+        # Pages were added, edited or deleted, so some cached parses may be unreferenced now
+        if html_files:
+            prune_parse_cache(html_files[0].parent.parent, html_files)
+
+    return results, reused
+
+class IndexBuild:
+    """An index build running on a worker thread while the server answers requests.
+
+    load(progress) runs off the event loop and returns the new index, which
+    install then swaps in on the loop thread, so tool calls only ever see the
+    previous index or the complete new one. At most one build runs at a time.
+    A build that leaves the index empty records the corpus signature, and no
+    lazy rebuild happens until the data directory changes.
+    """
+
+    def __init__(self, load: Callable[[Callable[[int, int], None]], Any], install: Callable[[Any], None],
+                 is_empty: Callable[[], bool], data_dir: Callable[[], Path]):
+        self.load = load
+        self.install = install
+        self.is_empty = is_empty
+        self.data_dir = data_dir
+        self.done = 0
+        self.total = None
+        self.task = None
+        # corpus_signature() as of the last build that found nothing to index
+        self.empty_as_of = None
+
+    def progress(self, done: int, total: int):
+        """Record build progress (called from the worker thread)."""
+        self.done, self.total = done, total
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> asyncio.Task:
+        """Start building in the background and return the task installing the result."""
+        async def run():
+            # Taken before loading so a change during the build forces another one
+            signature = corpus_signature(self.data_dir())
+            try:
+                self.install(await loop.run_in_executor(None, self.load, self.progress))
+                self.empty_as_of = signature if self.is_empty() else None
+            except Exception as e:
+                print(f"Background index build failed: {e}", file=sys.stderr)
+                import traceback
+                traceback.print_exc(file=sys.stderr)
+
+        self.done, self.total = 0, None
+        self.task = loop.create_task(run())
+        return self.task
+
+    async def ensure(self, timeout: float) -> bool:
+        """Rebuild an empty index unless the corpus is known to be empty, then wait for it.
+
+        Concurrent callers share the build in flight. Returns False if the
+        build is still running after timeout seconds.
+        """
+        if (not self.running and self.is_empty() and
+                (self.empty_as_of is None or corpus_signature(self.data_dir()) != self.empty_as_of)):
+            self.start(asyncio.get_running_loop())
+        return await self.wait(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to timeout seconds for a running build; returns False if it is still running."""
+        if not self.running:
+            return True
+        try:
+            # shield keeps a timed-out caller from cancelling the build itself
+            await asyncio.wait_for(asyncio.shield(self.task), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def call_when_done(self, callback: Callable[..., None], *args):
+        """Run callback now, or after the running build has been installed (on the loop thread)."""
+        if self.running:
+            self.task.add_done_callback(lambda _: callback(*args))
+        else:
+            callback(*args)
+
+    def status(self, noun: str) -> str:
+        """Describe an unfinished build for a tool response."""
+        if self.total is None:
+            progress = "scanning the data directory"
+        else:
+            progress = f"indexing {self.done}/{self.total} {noun}"
+        return f"The index is still being built ({progress}). Try again in a moment."
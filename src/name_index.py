@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import itertools
+from array import array
+from pathlib import Path
+from typing import List, Dict, Optional, Set, Tuple
+
+from search_index import TrigramVocabulary, tokenize, max_edit_distance, edit_distance_within
+
+# Titles are found inside a name by their first this many characters
+TITLE_HEAD_CHARS = 3
+
+# Suffixes are first sorted by this many leading characters
+SORT_PREFIX_CHARS = 16
+
+def normalize_id(chapter_id: str) -> str:
+    """Lowercase an ID and turn its dashes and underscores into spaces."""
+    return chapter_id.lower().replace('-', ' ').replace('_', ' ')
+
+class SuffixList:
+    """Every suffix of a set of strings, sorted, to find the strings containing a substring.
+
+    A substring of a string is a prefix of one of its suffixes, so the
+    strings containing needle own the contiguous run of suffixes starting
+    with needle, found by binary search. Suffixes are stored as (string
+    rank, start offset) pairs in two int arrays and only sliced out of
+    their string while being compared, so a string of length L costs 2L
+    ints rather than L strings.
+    """
+
+    def __init__(self, strings: Dict[int, str]):
+        self._strings = dict(strings)
+        entries = [(rank, start) for rank, string in self._strings.items() for start in range(len(string))]
+        # Sort by a bounded prefix, then only the runs tied on it by their full
+        # suffixes, so no more than a run's suffixes are ever copied at once
+        entries.sort(key=lambda entry: self._strings[entry[0]][entry[1]:entry[1] + SORT_PREFIX_CHARS])
+        self._ranks = array('I')
+        self._starts = array('I')
+        for _, run in itertools.groupby(
+                entries, key=lambda entry: self._strings[entry[0]][entry[1]:entry[1] + SORT_PREFIX_CHARS]):
+            run = list(run)
+            if len(run) > 1:
+                run.sort(key=lambda entry: self._strings[entry[0]][entry[1]:])
+            for rank, start in run:
+                self._ranks.append(rank)
+                self._starts.append(start)
+
+    def _bound(self, needle: str, upper: bool) -> int:
+        """First suffix whose first len(needle) characters are >= needle (> needle if upper)."""
+        lo, hi = 0, len(self._ranks)
+        while lo < hi:
+            middle = (lo + hi) // 2
+            start = self._starts[middle]
+            prefix = self._strings[self._ranks[middle]][start:start + len(needle)]
+            if prefix < needle or (upper and prefix == needle):
+                lo = middle + 1
+            else:
+                hi = middle
+        return lo
+
+    def first_containing(self, needle: str) -> Optional[int]:
+        """Rank of the first (lowest-ranked) string containing needle."""
+        lo = self._bound(needle, False)
+        hi = self._bound(needle, True)
+        return min(self._ranks[lo:hi]) if lo < hi else None
+
+    def add(self, rank: int, string: str):
+        """Merge a string's suffixes in; rank must not be in the list."""
+        self._strings[rank] = string
+        # Sorted, the new suffixes' insertion points never decrease
+        points = [(self._bound(string[start:], False), start)
+                  for start in sorted(range(len(string)), key=lambda start: string[start:])]
+        ranks, starts = array('I'), array('I')
+        previous = 0
+        for point, start in points:
+            ranks.extend(self._ranks[previous:point])
+            starts.extend(self._starts[previous:point])
+            ranks.append(rank)
+            starts.append(start)
+            previous = point
+        ranks.extend(self._ranks[previous:])
+        starts.extend(self._starts[previous:])
+        self._ranks, self._starts = ranks, starts
+
+    def remove(self, rank: int):
+        """Drop a string's suffixes (a no-op if it is not in the list)."""
+        string = self._strings.get(rank)
+        if string is None:
+            return
+        positions = []
+        for start in range(len(string)):
+            # A suffix sorts first among those starting with it, after any equal suffixes of other strings
+            position = self._bound(string[start:], False)
+            while self._ranks[position] != rank or self._starts[position] != start:
+                position += 1
+            positions.append(position)
+        for position in sorted(positions, reverse=True):
+            del self._ranks[position]
+            del self._starts[position]
+        del self._strings[rank]
+
+class NameIndex:
+    """Lookup tables resolving a loosely typed chapter name to a chapter ID.
+
+    Tries, in order, and returns the first chapter (in the order given)
+    matching the first tier that matches any:
+      1. the exact ID
+      2. the title, ignoring case
+      3. a title containing the name
+      4. a title contained in the name
+      5. an ID containing the name with spaces and underscores as dashes
+      6. an ID, with dashes and underscores as spaces, containing the name
+    Tiers 1 and 2 are dictionary lookups, 3, 5 and 6 binary searches in
+    sorted suffixes, and 4 looks up the titles starting with each
+    TITLE_HEAD_CHARS-character slice of the name; no tier scans the chapters.
+
+    suggest() ranks "did you mean" candidates for names that resolve to
+    nothing. Each word of the name is corrected against the words of
+    titles and IDs through a character-trigram index, so only chapters
+    sharing a word within max_edit_distance() edits are scored at all.
+
+    Chapters can be added and removed one at a time. Like chapter_cache, a
+    replaced chapter keeps its place in the order and an added one goes last.
+    """
+
+    def __init__(self, titles: Dict[str, str]):
+        self._ids: Dict[int, str] = dict(enumerate(titles))
+        self._ranks = {chapter_id: rank for rank, chapter_id in self._ids.items()}
+        self._next_rank = len(self._ids)
+        self._lowered = {rank: title.lower() for rank, title in enumerate(titles.values())}
+        # Ranks of the chapters with each title, and the distinct titles grouped
+        # by their first characters, for finding titles inside a name
+        self._titles: Dict[str, Set[int]] = {}
+        self._titles_by_head: Dict[str, Set[str]] = {}
+        self._short_titles: Set[str] = set()
+        # Words of each title and ID, and the chapters using each word
+        self._fields: List[Dict[int, Set[str]]] = [{}, {}]
+        self._word_ranks: List[Dict[str, Set[int]]] = [{}, {}]
+        self._vocabulary = TrigramVocabulary()
+        for rank in self._ids:
+            self._add_words(rank)
+        self._title_suffixes = SuffixList(self._lowered)
+        self._id_suffixes = SuffixList({rank: chapter_id.lower() for rank, chapter_id in self._ids.items()})
+        self._normalized_id_suffixes = SuffixList({rank: normalize_id(chapter_id)
+                                                   for rank, chapter_id in self._ids.items()})
+
+    def _add_words(self, rank: int):
+        """Index a chapter's lowercased title and the words of it and its ID under rank."""
+        title = self._lowered[rank]
+        ranks = self._titles.setdefault(title, set())
+        if not ranks:
+            if len(title) < TITLE_HEAD_CHARS:
+                self._short_titles.add(title)
+            else:
+                self._titles_by_head.setdefault(title[:TITLE_HEAD_CHARS], set()).add(title)
+        ranks.add(rank)
+        for field, word_ranks, words in zip(self._fields, self._word_ranks,
+                                            (name_words(title), name_words(self._ids[rank]))):
+            field[rank] = words
+            for word in words:
+                if not any(word in other for other in self._word_ranks):
+                    self._vocabulary.add(word)
+                word_ranks.setdefault(word, set()).add(rank)
+
+    def add(self, chapter_id: str, title: str):
+        """Index a chapter, replacing the title it had."""
+        rank = self._ranks.get(chapter_id)
+        if rank is None:
+            rank = self._ranks[chapter_id] = self._next_rank
+            self._next_rank += 1
+            self._ids[rank] = chapter_id
+            self._id_suffixes.add(rank, chapter_id.lower())
+            self._normalized_id_suffixes.add(rank, normalize_id(chapter_id))
+        else:
+            self._remove_title(rank)
+        self._lowered[rank] = title.lower()
+        self._add_words(rank)
+        self._title_suffixes.add(rank, self._lowered[rank])
+
+    def remove(self, chapter_id: str):
+        """Drop a chapter (a no-op if it is not indexed)."""
+        rank = self._ranks.pop(chapter_id, None)
+        if rank is None:
+            return
+        self._remove_title(rank)
+        del self._ids[rank]
+        self._id_suffixes.remove(rank)
+        self._normalized_id_suffixes.remove(rank)
+
+    def _remove_title(self, rank: int):
+        """Undo _add_words and drop the title's suffixes."""
+        title = self._lowered.pop(rank)
+        ranks = self._titles[title]
+        ranks.discard(rank)
+        if not ranks:
+            del self._titles[title]
+            if len(title) < TITLE_HEAD_CHARS:
+                self._short_titles.discard(title)
+            else:
+                titles = self._titles_by_head[title[:TITLE_HEAD_CHARS]]
+                titles.discard(title)
+                if not titles:
+                    del self._titles_by_head[title[:TITLE_HEAD_CHARS]]
+        for field, word_ranks in zip(self._fields, self._word_ranks):
+            for word in field.pop(rank):
+                ranks = word_ranks[word]
+                ranks.discard(rank)
+                if not ranks:
+                    del word_ranks[word]
+                    if not any(word in other for other in self._word_ranks):
+                        self._vocabulary.remove(word)
+        self._title_suffixes.remove(rank)
+
+    def resolve(self, search_name: str) -> Optional[str]:
+        """The chapter ID search_name most likely means, or None."""
+        if not search_name:
+            return None
+        if search_name in self._ranks:
+            return search_name
+
+        search_lower = search_name.lower().strip()
+        tiers = (lambda: min(self._titles.get(search_lower, ()), default=None),
+                 lambda: self._title_suffixes.first_containing(search_lower),
+                 lambda: self._title_within(search_lower),
+                 lambda: self._id_suffixes.first_containing(search_lower.replace(' ', '-').replace('_', '-')),
+                 lambda: self._normalized_id_suffixes.first_containing(search_lower))
+        for tier in tiers:
+            rank = tier()
+            if rank is not None:
+                return self._ids[rank]
+        return None
+
+    def suggest(self, search_name: str, limit: int) -> List[Tuple[str, float]]:
+        """Up to limit (chapter ID, score) pairs for a name, best first.
+
+        A chapter's score is the better of its title's and its ID's: the
+        summed word_similarity() of each name word to its closest word
+        there, over the larger of the two word counts (for exact words,
+        the shared fraction of words). Ties keep chapter order.
+        """
+        search_words = name_words(search_name)
+        if not search_words:
+            return []
+        # Per field, the best similarity of each chapter's words to each search word
+        matched: List[Dict[int, Dict[str, float]]] = [{} for _ in self._fields]
+        for search_word in search_words:
+            for word, distance in self._vocabulary.similar(search_word, max_edit_distance(search_word)):
+                similarity = word_similarity(search_word, word, distance)
+                for field_matches, word_ranks in zip(matched, self._word_ranks):
+                    for rank in word_ranks.get(word, ()):
+                        best = field_matches.setdefault(rank, {})
+                        best[search_word] = max(best.get(search_word, 0.0), similarity)
+        scores: Dict[int, float] = {}
+        for field, field_matches in zip(self._fields, matched):
+            for rank, best in field_matches.items():
+                score = sum(best.values()) / max(len(search_words), len(field[rank]))
+                scores[rank] = max(scores.get(rank, 0.0), score)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(self._ids[rank], score) for rank, score in ranked]
+
+    def _title_within(self, search_lower: str) -> Optional[int]:
+        """Rank of the first title that is a substring of search_lower."""
+        ranks = [min(self._titles[title]) for title in self._short_titles if title in search_lower]
+        for start in range(len(search_lower) - TITLE_HEAD_CHARS + 1):
+            for title in self._titles_by_head.get(search_lower[start:start + TITLE_HEAD_CHARS], ()):
+                if search_lower.startswith(title, start):
+                    ranks.append(min(self._titles[title]))
+        return min(ranks, default=None)
+
+def name_words(name: str) -> Set[str]:
+    """Distinct lowercase words of a title, ID or typed name."""
+    return set(tokenize(normalize_id(name)))
+
+def word_similarity(a: str, b: str, distance: int) -> float:
+    """1 for identical words, falling with the edits between them relative to their length."""
+    return 1.0 - distance / max(len(a), len(b))
+
+def suggest_by_scanning(titles: Dict[str, str], search_name: str, limit: int) -> List[Tuple[str, float]]:
+    """The same suggestions as NameIndex.suggest, comparing every word of every chapter."""
+    search_words = name_words(search_name)
+    scores = []
+    for chapter_id, title in titles.items():
+        score = 0.0
+        for words in (name_words(title), name_words(chapter_id)):
+            total = 0.0
+            for search_word in search_words:
+                limit_edits = max_edit_distance(search_word)
+                distances = [edit_distance_within(search_word, word, limit_edits) for word in words]
+                total += max((word_similarity(search_word, word, distance)
+                              for word, distance in zip(words, distances) if distance is not None), default=0.0)
+            if total:
+                score = max(score, total / max(len(search_words), len(words)))
+        if score:
+            scores.append((chapter_id, score))
+    scores.sort(key=lambda item: -item[1])
+    return scores[:limit]
+
+def resolve_by_scanning(titles: Dict[str, str], search_name: str) -> Optional[str]:
+    """The same resolution as NameIndex.resolve, by scanning every chapter on each tier."""
+    if not search_name:
+        return None
+    search_lower = search_name.lower().strip()
+    if search_name in titles:
+        return search_name
+    search_normalized = search_lower.replace(' ', '-').replace('_', '-')
+    tiers = [lambda chapter_id, title: title.lower() == search_lower,
+             lambda chapter_id, title: search_lower in title.lower(),
+             lambda chapter_id, title: title.lower() in search_lower,
+             lambda chapter_id, title: search_normalized in chapter_id.lower(),
+             lambda chapter_id, title: search_lower in normalize_id(chapter_id)]
+    for matches in tiers:
+        for chapter_id, title in titles.items():
+            if matches(chapter_id, title):
+                return chapter_id
+    return None
+
+if __name__ == "__main__":
+    # Check resolution and suggestions against scanning and time both: python src/name_index.py [data_dir]
+    from ingest import extract_page
+
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent / "data"
+    titles = {html_file.parent.name: extract_page(html_file, 'book_server')['title']
+              for html_file in sorted(data_dir.glob("*/*.html"))}
+
+    start = time.perf_counter()
+    index = NameIndex(titles)
+    print(f"Indexed {len(titles)} titles in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # IDs, titles, their fragments in other cases and spellings, longer names, and misses
+    names: List[str] = []
+    for chapter_id, title in list(titles.items())[::max(1, len(titles) // 50)]:
+        words = title.split()
+        names += [chapter_id, title.upper(), ' '.join(words[1:3]), title[2:9].lower(),
+                  f"the {title} chapter", chapter_id[3:20].replace('-', ' '),
+                  chapter_id[:12].replace('-', '_'), title + 'x']
+    names += ['', '  ', 'zzzz', 'design', 'a']
+
+    def timed(resolve) -> Tuple[List[Optional[str]], float]:
+        start = time.perf_counter()
+        results = [resolve(name) for name in names]
+        return results, (time.perf_counter() - start) * 1000 / len(names)
+
+    indexed, indexed_ms = timed(index.resolve)
+    scanned, scanned_ms = timed(lambda name: resolve_by_scanning(titles, name))
+    mismatches = [(name, a, b) for name, a, b in zip(names, indexed, scanned) if a != b]
+    for name, a, b in mismatches[:10]:
+        print(f"MISMATCH {name!r}: index {a}, scan {b}")
+    print(f"{len(names)} names: index {indexed_ms:.3f} ms/name, scan {scanned_ms:.3f} ms/name, "
+          f"{'ok' if not mismatches else f'{len(mismatches)} mismatches'}")
+
+    # Misspell names by swapping two letters of each longer word
+    names = [' '.join(word[:2] + word[3] + word[2] + word[4:] if len(word) > 4 else word for word in name.split())
+             for name in names]
+    suggested, suggested_ms = timed(lambda name: index.suggest(name, 5))
+    scanned, scanned_ms = timed(lambda name: suggest_by_scanning(titles, name, 5))
+    # Rounding differs between the two sums, so compare scores approximately
+    suggestion_mismatches = [(name, a, b) for name, a, b in zip(names, suggested, scanned)
+                             if [key for key, _ in a] != [key for key, _ in b]
+                             or any(abs(x - y) > 1e-9 for (_, x), (_, y) in zip(a, b))]
+    for name, a, b in suggestion_mismatches[:10]:
+        print(f"MISMATCH {name!r}: index {a}, scan {b}")
+    print(f"{len(names)} misspelled names, {sum(1 for found in suggested if found)} with suggestions: "
+          f"index {suggested_ms:.3f} ms/name, scan {scanned_ms:.3f} ms/name, "
+          f"{'ok' if not suggestion_mismatches else f'{len(suggestion_mismatches)} mismatches'}")
+    sys.exit(1 if mismatches or suggestion_mismatches else 0)
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+import re
+import bisect
+from typing import List, Dict, Any, Set, Tuple, Optional, Callable
+
+from search_index import InvertedIndex, tokenize
+
+# Query syntax (operators are case-sensitive so "and"/"or" stay ordinary words):
+#   design system           both words (implicit AND)
+#   "design system"         exact phrase
+#   ux OR usability         either word
+#   NOT draft, -draft       exclusion
+#   (a OR b) c              grouping
+#   title:metrics           word or "phrase" in one text field
+#   status:finished         metadata equality
+#   concept:analytics       design concept containing the value
+#   words:>2000             word count >, >=, <, <=, = or a range 1000..2000
+
+# Metadata fields, mapped to the record key holding their value and how a
+# query value matches it: the whole value, part of any value of a list, or
+# a numeric range
+METADATA_FIELDS = {
+    'status': ('status', 'equals'),
+    'concept': ('design_concepts', 'contains'),
+    'words': ('word_count', 'range')
+}
+
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<open>\()|(?P<close>\))|
+        (?P<minus>-)(?=[^\s)-])|
+        (?P<field>[A-Za-z_]+):|
+        "(?P<phrase>[^"]*)"|
+        (?P<word>[^\s()"]+)
+    )''', re.VERBOSE)
+
+_RANGE = re.compile(r'^(?:(?P<op>>=|<=|>|<|=)?(?P<value>\d+)|(?P<low>\d+)\.\.(?P<high>\d+))$')
+
+class QuerySyntaxError(ValueError):
+    """A query could not be parsed or uses a field the server does not have."""
+
+def lex_query(query: str) -> List[Tuple[str, str]]:
+    """Split a query into (kind, text) tokens."""
+    tokens = []
+    position = 0
+    query = query.rstrip()
+    while position < len(query):
+        match = _TOKEN.match(query, position)
+        if not match or match.end() == position:
+            raise QuerySyntaxError(f"Unbalanced quote in query: {query!r}")
+        position = match.end()
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'word' and text in ('AND', 'OR', 'NOT'):
+            kind = text
+        elif kind == 'minus':
+            # -term is shorthand for NOT term (including -field:value, -"phrase" and -(group))
+            kind = 'NOT'
+        tokens.append((kind, text))
+    return tokens
+
+def parse_query(query: str):
+    """Parse a query into a tree of tuples.
+
+    Nodes are ('and', [nodes]), ('or', [nodes]), ('not', node),
+    ('match', field or None, text, is_phrase) and ('range', field, low, high).
+    """
+    tokens = lex_query(query)
+    position = 0
+
+    def peek() -> Optional[str]:
+        return tokens[position][0] if position < len(tokens) else None
+
+    def take() -> Tuple[str, str]:
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or():
+        children = [parse_and()]
+        while peek() == 'OR':
+            take()
+            children.append(parse_and())
+        return children[0] if len(children) == 1 else ('or', children)
+
+    def parse_and():
+        children = [parse_not()]
+        while peek() not in (None, 'OR', 'close'):
+            if peek() == 'AND':
+                take()
+            children.append(parse_not())
+        return children[0] if len(children) == 1 else ('and', children)
+
+    def parse_not():
+        if peek() == 'NOT':
+            take()
+            return ('not', parse_not())
+        return parse_primary()
+
+    def parse_primary():
+        if peek() is None:
+            raise QuerySyntaxError("Query ended where a term was expected")
+        kind, text = take()
+        if kind == 'open':
+            node = parse_or()
+            if peek() != 'close':
+                raise QuerySyntaxError("Missing closing parenthesis")
+            take()
+            return node
+        if kind == 'field':
+            field = text.lower()
+            if peek() not in ('word', 'phrase'):
+                raise QuerySyntaxError(f"Field '{field}:' needs a value")
+            value_kind, value = take()
+            if field == 'words':
+                return parse_range(field, value)
+            return ('match', field, value, value_kind == 'phrase')
+        if kind in ('word', 'phrase', 'AND', 'OR'):
+            return ('match', None, text, kind == 'phrase')
+        raise QuerySyntaxError(f"Unexpected '{text}' in query")
+
+    if not tokens:
+        raise QuerySyntaxError("Empty query")
+    tree = parse_or()
+    if position < len(tokens):
+        raise QuerySyntaxError(f"Unexpected '{tokens[position][1]}' in query")
+    return tree
+
+def parse_range(field: str, value: str) -> Tuple[str, str, float, float]:
+    """Turn '>2000', '<=500', '1000..2000' or '1500' into an inclusive range node."""
+    match = _RANGE.match(value)
+    if not match:
+        raise QuerySyntaxError(f"Invalid range for '{field}': {value!r}")
+    if match.group('low') is not None:
+        return ('range', field, float(match.group('low')), float(match.group('high')))
+    number = float(match.group('value'))
+    op = match.group('op') or '='
+    low, high = {
+        '>': (number + 1, float('inf')),
+        '>=': (number, float('inf')),
+        '<': (float('-inf'), number - 1),
+        '<=': (float('-inf'), number),
+        '=': (number, number)
+    }[op]
+    return ('range', field, low, high)
+
+def positive_terms(tree) -> List[str]:
+    """Text of every default-field or title match that is not negated, for ranking."""
+    kind = tree[0]
+    if kind in ('and', 'or'):
+        return [text for child in tree[1] for text in positive_terms(child)]
+    if kind == 'match' and tree[1] in (None, 'title'):
+        return [tree[2]]
+    return []
+
+class MetadataIndex:
+    """Postings for the METADATA_FIELDS of records, so metadata filters never scan them.
+
+    Equality and containment fields map each distinct lowercased value to
+    its documents; a containment query only checks the distinct values.
+    Range fields keep the values sorted (with their documents alongside)
+    for bisection. Documents can be added and removed one at a time.
+    """
+
+    def __init__(self, fields: List[str]):
+        self.fields = list(fields)
+        self._postings: Dict[str, Dict[str, Set[str]]] = {}
+        self._numbers: Dict[str, Tuple[List[float], List[str]]] = {}
+        for field in self.fields:
+            if METADATA_FIELDS[field][1] == 'range':
+                self._numbers[field] = ([], [])
+            else:
+                self._postings[field] = {}
+        # Indexed values of each document, so remove() can find its entries
+        self._values: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, doc_id: str, record: Dict[str, Any]):
+        """Index a record's metadata, replacing any previous version of it."""
+        self.remove(doc_id)
+        values = {}
+        for field in self.fields:
+            key, kind = METADATA_FIELDS[field]
+            if kind == 'range':
+                value = record.get(key, 0)
+                numbers, doc_ids = self._numbers[field]
+                position = bisect.bisect_right(numbers, value)
+                numbers.insert(position, value)
+                doc_ids.insert(position, doc_id)
+            else:
+                if kind == 'contains':
+                    value = {str(item).lower() for item in record.get(key, ())}
+                else:
+                    value = {str(record.get(key, '')).lower()}
+                for item in value:
+                    self._postings[field].setdefault(item, set()).add(doc_id)
+            values[field] = value
+        self._values[doc_id] = values
+
+    def remove(self, doc_id: str):
+        """Drop a record (a no-op if it is not indexed)."""
+        values = self._values.pop(doc_id, None)
+        if values is None:
+            return
+        for field, value in values.items():
+            if field in self._numbers:
+                numbers, doc_ids = self._numbers[field]
+                position = bisect.bisect_left(numbers, value)
+                while doc_ids[position] != doc_id:
+                    position += 1
+                del numbers[position]
+                del doc_ids[position]
+            else:
+                postings = self._postings[field]
+                for item in value:
+                    postings[item].discard(doc_id)
+                    if not postings[item]:
+                        del postings[item]
+
+    def matching(self, field: str, value: str) -> Set[str]:
+        """Documents whose field equals value or, for containment fields, has a value containing it."""
+        value = value.lower()
+        postings = self._postings[field]
+        if METADATA_FIELDS[field][1] == 'contains':
+            return set().union(*(doc_ids for item, doc_ids in postings.items() if value in item))
+        return set(postings.get(value, ()))
+
+    def between(self, field: str, low: float, high: float) -> Set[str]:
+        """Documents whose field is in the inclusive range low..high."""
+        numbers, doc_ids = self._numbers[field]
+        return set(doc_ids[bisect.bisect_left(numbers, low):bisect.bisect_right(numbers, high)])
+
+class QueryEvaluator:
+    """Evaluate parsed queries to sets of document IDs.
+
+    Text matches use word postings: text_index for unqualified terms and
+    field_indexes for title:, subtitle: and the like. Phrases are checked
+    against the text of the documents holding every word: document(doc_id)
+    gives the (title, body) text_index was built from, and a field's text
+    is read from records (document ID -> record dict). Metadata fields are
+    looked up in metadata_index, and only the fields it indexes are
+    accepted. NOT is taken relative to every record.
+    """
+
+    def __init__(self, text_index: InvertedIndex, field_indexes: Dict[str, InvertedIndex],
+                 metadata_index: MetadataIndex, records: Dict[str, Dict[str, Any]],
+                 document: Callable[[str], Tuple[str, str]]):
+        self.text_index = text_index
+        self.field_indexes = field_indexes
+        self.metadata_index = metadata_index
+        self.records = records
+        self.document = document
+
+    def fields(self) -> List[str]:
+        return sorted(self.field_indexes) + sorted(self.metadata_index.fields)
+
+    def evaluate(self, tree) -> Set[str]:
+        kind = tree[0]
+        if kind == 'and':
+            # Cheapest (smallest) sets first so the intersection shrinks quickly
+            results = sorted((self.evaluate(child) for child in tree[1]), key=len)
+            matched = results[0]
+            for other in results[1:]:
+                matched = matched & other
+            return matched
+        if kind == 'or':
+            matched = set()
+            for child in tree[1]:
+                matched |= self.evaluate(child)
+            return matched
+        if kind == 'not':
+            return set(self.records) - self.evaluate(tree[1])
+        if kind == 'range':
+            return self._range(tree[1], tree[2], tree[3])
+        return self._match(tree[1], tree[2], tree[3])
+
+    def _check_field(self, field: str):
+        if field not in self.field_indexes and field not in self.metadata_index.fields:
+            raise QuerySyntaxError(f"Unknown field '{field}:' (available: {', '.join(self.fields())})")
+
+    def _match(self, field: Optional[str], text: str, is_phrase: bool) -> Set[str]:
+        if field is None or field in self.field_indexes:
+            index = self.text_index if field is None else self.field_indexes[field]
+            terms = tokenize(text)
+            if not terms:
+                return set()
+            if len(terms) == 1:
+                return set(index.postings.get(terms[0], ()))
+            # Hyphenated words and quoted phrases must appear as consecutive words
+            if field is None:
+                return set(index.phrase_counts(text, self.document))
+            return set(index.phrase_counts(text, lambda doc_id: ('', self.records[doc_id].get(field) or '')))
+
+        self._check_field(field)
+        return self.metadata_index.matching(field, text)
+
+    def _range(self, field: str, low: float, high: float) -> Set[str]:
+        self._check_field(field)
+        return self.metadata_index.between(field, low, high)
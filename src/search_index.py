@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+
+import re
+import json
+import math
+import heapq
+import base64
+import hashlib
+from typing import List, Dict, Any, Tuple, Optional, Set, Callable
+
+# Words are runs of letters/digits; everything is matched case-insensitively
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# A title occurrence counts this many times, matching the weight titles
+# have in the substring relevance score
+TITLE_WEIGHT = 2
+
+# Body positions start this many words after the title's, so no phrase or
+# proximity match can span the two; also the largest proximity window
+FIELD_GAP = 100
+
+# Snippets show this many words, starting a few words before the first match
+SNIPPET_WORDS = 30
+SNIPPET_LEAD_WORDS = 6
+# Length of snippets around substring matches, which have no word positions
+SNIPPET_CHARS = 200
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercased word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def max_edit_distance(term: str) -> int:
+    """Edits tolerated when correcting a word: none below 4 letters, 2 from 8."""
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+def trigrams(term: str) -> Set[str]:
+    """Character trigrams of a word padded with '$', so each edit changes at most three."""
+    padded = f"${term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance_within(a: str, b: str, limit: int) -> Optional[int]:
+    """Levenshtein distance between a and b, or None if it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+class TrigramVocabulary:
+    """Character-trigram index over a vocabulary, for typo-tolerant lookups.
+
+    Candidates for a misspelled word are the words sharing enough trigrams
+    with it to be within the edit bound (each edit removes at most three),
+    so only those few are compared with the full edit distance.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Set[str]] = {}
+
+    def add(self, term: str):
+        for gram in trigrams(term):
+            self.postings.setdefault(gram, set()).add(term)
+
+    def remove(self, term: str):
+        for gram in trigrams(term):
+            terms = self.postings.get(gram)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self.postings[gram]
+
+    def similar(self, term: str, limit: int) -> List[Tuple[str, int]]:
+        """Vocabulary words within limit edits of term, as (word, distance), closest first."""
+        grams = trigrams(term)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self.postings.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        needed = len(grams) - 3 * limit
+        matches = []
+        for candidate, count in shared.items():
+            if count >= needed:
+                distance = edit_distance_within(term, candidate, limit)
+                if distance is not None:
+                    matches.append((candidate, distance))
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches
+
+class InvertedIndex:
+    """Word postings (term -> {document: weighted frequency}) ranked with BM25.
+
+    A title occurrence counts TITLE_WEIGHT times. Only frequencies are
+    kept, one int per distinct term of a document, so the index grows with
+    the vocabulary of each document rather than its length. Phrase and
+    proximity queries find the documents holding every word through the
+    postings, then read just those documents' text (through a document
+    callable returning (title, body)) to compare word positions.
+    Documents can be added and removed one at a time, so the index follows
+    watcher updates without a rebuild. A query only touches the postings of
+    its own terms.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        # Distinct terms of each document, so remove() need not scan the vocabulary
+        self._doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self.vocabulary = TrigramVocabulary()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: str, title: str, content: str):
+        """Index a document, replacing any previous version of it."""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+
+        title_terms = tokenize(title)
+        body_terms = tokenize(content)
+        frequencies: Dict[str, int] = {}
+        for term in title_terms:
+            frequencies[term] = frequencies.get(term, 0) + TITLE_WEIGHT
+        for term in body_terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                self.vocabulary.add(term)
+            self.postings[term][doc_id] = frequency
+
+        length = len(body_terms) + TITLE_WEIGHT * len(title_terms)
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        self._doc_terms[doc_id] = tuple(frequencies)
+
+    def remove(self, doc_id: str):
+        """Drop a document from the index (a no-op if it is not indexed)."""
+        if doc_id not in self.doc_lengths:
+            return
+        for term in self._doc_terms.pop(doc_id):
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+                self.vocabulary.remove(term)
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def idf(self, term: str) -> float:
+        """BM25 inverse document frequency (always positive)."""
+        document_frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.doc_lengths) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def score(self, query: str, candidates: Optional[Set[str]] = None) -> Dict[str, float]:
+        """BM25 score of every document (among candidates, if given) containing a query term."""
+        scores = {}
+        if not self.doc_lengths:
+            return scores
+        average_length = self.total_length / len(self.doc_lengths)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, frequency in postings.items():
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Return the top (document, score) pairs for query, best first."""
+        return top_scores(self.score(query), limit)
+
+    def correct(self, query: str) -> str:
+        """Replace each word not in the index with the closest indexed word.
+
+        Ties go to the word found in more documents. Words with no close
+        match within max_edit_distance are left as they are.
+        """
+        def replace(match):
+            word = match.group(0)
+            if word in self.postings:
+                return word
+            candidates = self.vocabulary.similar(word, max_edit_distance(word))
+            if not candidates:
+                return word
+            best_distance = candidates[0][1]
+            return max((candidate for candidate, distance in candidates if distance == best_distance),
+                       key=lambda candidate: (len(self.postings[candidate]), candidate))
+        return TOKEN_PATTERN.sub(replace, query.lower())
+
+    def _documents_with_all(self, terms: List[str]) -> List[str]:
+        """Documents containing every term, found by intersecting from the rarest postings."""
+        postings = [self.postings.get(term) for term in set(terms)]
+        if not terms or not all(postings):
+            return []
+        postings.sort(key=len)
+        return [doc_id for doc_id in postings[0] if all(doc_id in other for other in postings[1:])]
+
+    def phrase_counts(self, phrase: str, document: Callable[[str], Tuple[str, str]]) -> Dict[str, int]:
+        """Occurrences of the phrase's words as consecutive words, per document.
+
+        document(doc_id) returns the (title, body) the document was indexed
+        with; it is only called for documents containing every word.
+        """
+        terms = tokenize(phrase)
+        counts = {}
+        for doc_id in self._documents_with_all(terms):
+            positions = word_positions(*document(doc_id), terms)
+            following = [set(positions[term]) for term in terms[1:]]
+            total = sum(1 for start in positions[terms[0]]
+                        if all(start + offset in term_positions for offset, term_positions in enumerate(following, 1)))
+            if total:
+                counts[doc_id] = total
+        return counts
+
+    def near_counts(self, query: str, window: int, document: Callable[[str], Tuple[str, str]]) -> Dict[str, int]:
+        """Per document, how many spans of at most window words contain every query word.
+
+        Spans are the minimal ones (no shorter span inside contains every
+        word), in any word order; window is capped at FIELD_GAP. document is
+        as for phrase_counts.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        window = min(window, FIELD_GAP)
+        counts = {}
+        for doc_id in self._documents_with_all(terms):
+            positions = word_positions(*document(doc_id), terms)
+            merged = heapq.merge(*[[(position, i) for position in positions[term]]
+                                   for i, term in enumerate(terms)])
+            occurrences = list(merged)
+            seen = [0] * len(terms)
+            covered = 0
+            left = 0
+            total = 0
+            for position, i in occurrences:
+                if not seen[i]:
+                    covered += 1
+                seen[i] += 1
+                # Shrink from the left while every word is still covered
+                while seen[occurrences[left][1]] > 1:
+                    seen[occurrences[left][1]] -= 1
+                    left += 1
+                # The span ending here is minimal only if its last word occurs once in it
+                if covered == len(terms) and seen[i] == 1 and position - occurrences[left][0] < window:
+                    total += 1
+            if total:
+                counts[doc_id] = total
+        return counts
+
+def word_positions(title: str, content: str, terms: List[str]) -> Dict[str, List[int]]:
+    """Word positions of terms in a document: title words first, then body words FIELD_GAP later.
+
+    The gap keeps phrase and proximity matches from spanning the two.
+    """
+    positions: Dict[str, List[int]] = {term: [] for term in terms}
+    title_terms = tokenize(title)
+    for position, term in enumerate(title_terms):
+        if term in positions:
+            positions[term].append(position)
+    for position, term in enumerate(tokenize(content), len(title_terms) + FIELD_GAP):
+        if term in positions:
+            positions[term].append(position)
+    return positions
+
+def word_snippet(text: str, query: str) -> str:
+    """The SNIPPET_WORDS-word stretch of a body with the most query words, matches in bold.
+
+    The body is split into words once, so only the bodies of the results
+    being shown are ever scanned. Returns "" when no query word occurs in it.
+    """
+    terms = set(tokenize(query))
+    offsets = []
+    hits = []
+    for word, match in enumerate(TOKEN_PATTERN.finditer(text)):
+        offsets.append(match.start())
+        term = match.group(0).lower()
+        if term in terms:
+            hits.append((word, term))
+    if not hits:
+        return ""
+
+    # Slide a window over the hits and keep the one with the most distinct
+    # query words, then the most matches
+    best_first, best_key, right = 0, (0, 0), 0
+    in_window: Dict[str, int] = {}
+    for left, (first, term) in enumerate(hits):
+        while right < len(hits) and hits[right][0] < first + SNIPPET_WORDS - SNIPPET_LEAD_WORDS:
+            in_window[hits[right][1]] = in_window.get(hits[right][1], 0) + 1
+            right += 1
+        if (len(in_window), right - left) > best_key:
+            best_first, best_key = first, (len(in_window), right - left)
+        in_window[term] -= 1
+        if not in_window[term]:
+            del in_window[term]
+
+    start_word = max(0, best_first - SNIPPET_LEAD_WORDS)
+    end_word = min(len(offsets), start_word + SNIPPET_WORDS) - 1
+    highlighted = [word for word, _ in hits if start_word <= word <= end_word]
+    return highlight_snippet(text, offsets[start_word], word_end(text, offsets[end_word]),
+                             [(offsets[word], word_end(text, offsets[word])) for word in highlighted])
+
+def word_end(text: str, offset: int) -> int:
+    """End offset of the word starting at offset."""
+    match = TOKEN_PATTERN.match(text, offset)
+    return match.end() if match else offset
+
+def highlight_snippet(text: str, start: int, end: int, spans: List[Tuple[int, int]]) -> str:
+    """Cut text[start:end] on one line, wrap spans in ** and mark truncation with ellipses."""
+    pieces = []
+    cursor = start
+    for span_start, span_end in spans:
+        pieces.append(text[cursor:span_start])
+        pieces.append(f"**{text[span_start:span_end]}**")
+        cursor = span_end
+    pieces.append(text[cursor:end])
+    snippet = ' '.join(''.join(pieces).split())
+    return ('...' if start > 0 else '') + snippet + ('...' if end < len(text) else '')
+
+def substring_snippet(text: str, needle: str) -> str:
+    """Snippet around the first case-insensitive occurrence of needle, for substring matches."""
+    position = text.lower().find(needle.lower()) if needle else -1
+    # A few characters change length when lowercased, which would shift the offsets
+    if position < 0 or len(text.lower()) != len(text):
+        return ""
+    start = max(0, position - SNIPPET_CHARS // 4)
+    end = min(len(text), position + len(needle) + SNIPPET_CHARS * 3 // 4)
+    # Widen to word boundaries so words are not cut in half
+    while start > 0 and not text[start - 1].isspace():
+        start -= 1
+    while end < len(text) and not text[end].isspace():
+        end += 1
+    return highlight_snippet(text, start, end, [(position, position + len(needle))])
+
+def top_scores(scores: Dict[str, float], limit: int, after: Optional[Tuple] = None) -> List[Tuple[str, float]]:
+    """The limit best (document, score) pairs; ties broken by document ID so results are stable.
+
+    Given the score_key() of the last result of a previous page, returns
+    the page that follows it.
+    """
+    return top_ranked(scores.items(), limit, score_key, after)
+
+def score_key(item: Tuple[str, float]) -> Tuple[float, str]:
+    """Sort key of a (document, score) pair: best score first, then document ID."""
+    return (-item[1], item[0])
+
+def top_ranked(items, limit: int, key, after: Optional[Tuple] = None) -> List:
+    """The limit smallest items by key that sort after the key 'after', with a bounded heap."""
+    if after is not None:
+        items = (item for item in items if key(item) > after)
+    return heapq.nsmallest(limit, items, key=key)
+
+class CursorError(ValueError):
+    """A pagination cursor is malformed or was issued for a different query or index version."""
+
+def query_fingerprint(*parts: Any) -> str:
+    """Short digest of everything that determines a result list, stored in its cursors."""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+def encode_cursor(version: int, fingerprint: str, key: Tuple, query: str = "") -> str:
+    """Opaque cursor resuming a result list after the result whose sort key is key.
+
+    query is the query actually run, when it differs from the one asked
+    (a spelling correction), so later pages continue with it.
+    """
+    payload = json.dumps([version, fingerprint, list(key), query], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, version: int, fingerprint: str) -> Tuple[Tuple, str]:
+    """The (sort key, query) stored in a cursor, checked against the current index version and query."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_version, cursor_fingerprint, key, query = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        key = tuple(key)
+    except (ValueError, TypeError, UnicodeError):
+        raise CursorError("Invalid cursor")
+    if cursor_fingerprint != fingerprint:
+        raise CursorError("Cursor belongs to a different query; repeat the original query and arguments")
+    if cursor_version != version:
+        # Scores and positions may have shifted, so a resumed page could skip or repeat results
+        raise CursorError("The index changed since this cursor was issued; start again without a cursor")
+    return key, query
+
+def add_to_field_indexes(indexes: Dict[str, InvertedIndex], doc_id: str, record: Dict[str, Any]):
+    """Index each text field of a record (title, subtitle, ...) in its own postings."""
+    for field, index in indexes.items():
+        index.add(doc_id, '', record.get(field) or '')
+
+def remove_from_field_indexes(indexes: Dict[str, InvertedIndex], doc_id: str):
+    """Drop a document from every per-field index."""
+    for index in indexes.values():
+        index.remove(doc_id)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import zipfile
+import bisect
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from term_matrix import TermMatrix, load_npz_mapped, np, sparse
+from ann_index import IVFIndex, ANN_MIN_VECTORS, ANN_PROBES
+
+if sparse is not None:
+    from scipy.sparse.linalg import svds
+
+# Dimensions of the latent semantic space ("0" disables semantic search).
+# More dimensions keep finer distinctions between topics; fewer merge
+# related vocabulary more aggressively.
+LSA_DIMENSIONS = int(os.environ.get("MEDIUM_MCP_LSA_DIMENSIONS", "100"))
+
+# Documents less similar than this to a query are not semantic matches
+SEMANTIC_MIN_SIMILARITY = 0.1
+
+def truncated_svd(weights: 'sparse.csr_matrix', dimensions: int) -> 'np.ndarray':
+    """The right singular vectors (terms x dimensions) of the largest singular values."""
+    smallest_side = min(weights.shape)
+    if dimensions >= smallest_side - 1:
+        # Too few documents or terms for ARPACK; the dense decomposition is small
+        _, _, vt = np.linalg.svd(weights.toarray(), full_matrices=False)
+        return vt[:dimensions].T.astype(np.float32)
+    # A fixed starting vector makes the basis, and so the results, reproducible
+    start = np.random.default_rng(0).uniform(size=smallest_side)
+    _, values, vt = svds(weights.astype(np.float64), k=dimensions, v0=start)
+    return vt[np.argsort(-values)].T.astype(np.float32)
+
+class SemanticIndex:
+    """Latent semantic analysis (truncated SVD) over a TermMatrix.
+
+    The TF-IDF matrix is factored once per build; documents and queries
+    are projected onto the right singular vectors of its largest singular
+    values, where words that occur in similar documents point in similar
+    directions. Documents are then compared by the cosine of their
+    projections, so a chapter can match a query that shares none of its
+    words. A search is one matrix-vector product plus a top-k selection.
+
+    From ANN_MIN_VECTORS documents on, searches score only the candidates
+    an IVFIndex proposes instead of every vector.
+
+    Documents added after the build are folded in: projected onto the
+    existing basis, which is only recomputed by the next full build.
+    Given a cache_path, the basis, vectors and IVF lists are saved there and
+    memory-mapped back while the term matrix is built from the same texts.
+    """
+
+    def __init__(self, matrix: TermMatrix, dimensions: int, cache_path: Optional[Path] = None):
+        self.matrix = matrix
+        self.keys: List[str] = list(matrix.keys)
+        self.ann: Optional[IVFIndex] = None
+        if not (cache_path and self._load(cache_path, dimensions)):
+            self.basis = truncated_svd(matrix.weights, dimensions)
+            self.vectors = self.project(matrix.weights)
+            if len(self.vectors) >= ANN_MIN_VECTORS:
+                self.ann = IVFIndex.train(self.vectors)
+            if cache_path:
+                self._save(cache_path, dimensions)
+        self._reindex()
+
+    @classmethod
+    def build(cls, matrix: Optional[TermMatrix], cache_path: Optional[Path] = None) -> Optional['SemanticIndex']:
+        """Build an index, or return None when disabled, without a term matrix or without any terms."""
+        if matrix is None or LSA_DIMENSIONS <= 0 or matrix.weights.nnz == 0:
+            return None
+        return cls(matrix, min(LSA_DIMENSIONS, *matrix.weights.shape), cache_path)
+
+    def _load(self, cache_path: Path, dimensions: int) -> bool:
+        """Map a saved basis if it was computed from the same documents."""
+        try:
+            saved = load_npz_mapped(cache_path)
+            if not np.array_equal(saved['digest'], self.matrix.digest) or saved['basis'].shape[1] != dimensions \
+                    or saved['vectors'].shape[0] != len(self.keys):
+                return False
+            self.basis, self.vectors = saved['basis'], saved['vectors']
+            if 'centroids' in saved:
+                self.ann = IVFIndex(saved['centroids'], saved['assignments'])
+            elif len(self.vectors) >= ANN_MIN_VECTORS:
+                self.ann = IVFIndex.train(self.vectors)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return False
+        return True
+
+    def _save(self, cache_path: Path, dimensions: int):
+        """Atomically save the basis and document vectors next to the other index files."""
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                lists = {'centroids': self.ann.centroids, 'assignments': self.ann.assignments} if self.ann else {}
+                np.savez(f, digest=self.matrix.digest, basis=self.basis, vectors=self.vectors, **lists)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not save semantic index: {e}", file=sys.stderr)
+
+    def _reindex(self):
+        """Rebuild the key lookups after the document list changed."""
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        # Rank of each key in sorted order, so ties are broken by key without comparing strings
+        self._sorted_keys = sorted(self.keys)
+        ranks = {key: rank for rank, key in enumerate(self._sorted_keys)}
+        self._key_ranks = np.array([ranks[key] for key in self.keys], dtype=np.int64)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def project(self, weights) -> 'np.ndarray':
+        """Unit-length latent vectors of TF-IDF rows (terms added after the build are ignored)."""
+        terms = self.basis.shape[0]
+        if sparse.issparse(weights):
+            vectors = np.asarray(weights[:, :terms].dot(self.basis))
+        else:
+            vectors = np.atleast_2d(weights)[:, :terms].dot(self.basis)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return (vectors / norms).astype(np.float32)
+
+    def update(self, key: str):
+        """Fold in a document after its row in the term matrix was added or replaced."""
+        vector = self.project(self.matrix.weights[self.matrix.rows([key])])
+        row = self._rows.get(key)
+        if row is not None:
+            vectors = np.array(self.vectors)
+            vectors[row] = vector[0]
+            self.vectors = vectors
+        else:
+            row = len(self.keys)
+            self.keys.append(key)
+            self.vectors = np.vstack([self.vectors, vector])
+        if self.ann is not None:
+            self.ann.assign(row, vector[0])
+        self._reindex()
+
+    def remove(self, key: str):
+        """Drop a document (a no-op if it is not indexed)."""
+        row = self._rows.get(key)
+        if row is None:
+            return
+        del self.keys[row]
+        self.vectors = np.delete(self.vectors, row, axis=0)
+        if self.ann is not None:
+            self.ann.remove(row)
+        self._reindex()
+
+    def search(self, query: str, limit: int, after: Optional[Tuple[float, str]] = None,
+               allowed: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """The limit documents most similar to a text, as (key, cosine similarity).
+
+        Ordered like search_index.top_scores, best first and ties by key;
+        after is the (-similarity, key) of the last result of a previous
+        page, and allowed restricts the candidates.
+        """
+        vector = self.project(self.matrix.vector(query))[0]
+        if not vector.any():
+            return []
+        return self._top(*self._score(vector), limit, after, allowed)
+
+    def similar(self, key: str, limit: int, allowed: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """The limit documents most similar to an indexed document, excluding itself."""
+        rows, scores = self._score(self.vectors[self._rows[key]])
+        scores[rows == self._rows[key]] = -np.inf
+        return self._top(rows, scores, limit, None, allowed)
+
+    def _score(self, vector: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
+        """(rows, similarities) of every document, or of the IVF candidates."""
+        if self.ann is None:
+            return np.arange(len(self.keys)), self.vectors.dot(vector).astype(np.float64)
+        rows = self.ann.candidates(vector, ANN_PROBES)
+        return rows, self.vectors[rows].dot(vector).astype(np.float64)
+
+    def _top(self, rows: 'np.ndarray', scores: 'np.ndarray', limit: int, after: Optional[Tuple[float, str]],
+             allowed: Optional[List[str]]) -> List[Tuple[str, float]]:
+        candidates = scores >= SEMANTIC_MIN_SIMILARITY
+        if allowed is not None:
+            mask = np.zeros(len(self.keys), dtype=bool)
+            mask[[self._rows[key] for key in allowed if key in self._rows]] = True
+            candidates &= mask[rows]
+        if after is not None:
+            # Keys sort after after[1] from this rank on
+            rank = bisect.bisect_right(self._sorted_keys, after[1])
+            candidates &= (-scores > after[0]) | ((-scores == after[0]) & (self._key_ranks[rows] >= rank))
+        rows, scores = rows[candidates], scores[candidates]
+        if len(rows) > limit:
+            # Keep every row scoring at least the limit-th best, so ties at the
+            # boundary are broken by key below rather than arbitrarily
+            threshold = np.partition(scores, len(rows) - limit)[len(rows) - limit]
+            rows, scores = rows[scores >= threshold], scores[scores >= threshold]
+        best = np.lexsort((self._key_ranks[rows], -scores))[:limit]
+        return [(self.keys[row], float(score)) for row, score in zip(rows[best], scores[best])]
+
+if __name__ == "__main__":
+    # Show semantic matches next to the shared-word baseline: python src/semantic_index.py [data_dir] [query ...]
+    from ingest import extract_page
+
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent / "data"
+    queries = sys.argv[2:] or ['design', 'measuring product analytics', 'conversation with machines']
+    texts = {html_file.parent.name: extract_page(html_file, 'book_server')['content']
+             for html_file in sorted(data_dir.glob("*/*.html"))}
+
+    matrix = TermMatrix(texts)
+    start = time.perf_counter()
+    index = SemanticIndex.build(matrix)
+    print(f"Factored {matrix.weights.shape[0]} x {matrix.weights.shape[1]} matrix into "
+          f"{index.basis.shape[1]} dimensions in {time.perf_counter() - start:.2f}s")
+
+    for query in queries:
+        start = time.perf_counter()
+        results = index.search(query, 5)
+        elapsed = time.perf_counter() - start
+        query_terms = set(matrix.vector(query).nonzero()[0])
+        print(f"\n{query!r} ({elapsed * 1000:.2f} ms)")
+        for key, similarity in results:
+            shared = len(query_terms & set(matrix.counts[matrix.rows([key])].indices))
+            print(f"  {similarity:.3f}  {shared}/{len(query_terms)} query words  {key}")
@@ -1,12 +1,25 @@
 #!/usr/bin/env python3
 
 import os
+import sys
 import json
 import glob
 from pathlib import Path
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Callable
 import re
+import asyncio
+
+from ingest import (get_snapshot_path, get_text_store_path, get_suffix_array_path, get_term_matrix_path,
+                    get_semantic_index_path, extract_with_snapshot, extract_page, IndexBuild, INDEX_WAIT_SECONDS)
+from watcher import DataDirectoryWatcher
+from content_store import TextStore
+from search_index import (InvertedIndex, top_scores, score_key, top_ranked, add_to_field_indexes,
+                          remove_from_field_indexes, word_snippet, substring_snippet, query_fingerprint, encode_cursor,
+                          decode_cursor, CursorError, FIELD_GAP)
+from query_language import parse_query, positive_terms, QueryEvaluator, MetadataIndex, QuerySyntaxError
+from substring_index import SubstringIndex
+from term_matrix import TermMatrix
+from semantic_index import SemanticIndex
 
 from mcp.server.models import InitializationOptions
 import mcp.types as types
@@ -20,6 +33,40 @@ server = Server("medium-mcp-server")
 article_cache = {}
 article_index = []
 
+# Pack article bodies (original and lowercased) into one memory-mapped file
+# instead of keeping a str per article in article_cache
+TEXT_STORE_ENABLED = os.environ.get("MEDIUM_MCP_TEXT_STORE", "0") == "1"
+text_store = None
+
+# Word postings over titles and bodies, for BM25-ranked search, plus
+# per-field postings for title: queries and metadata postings for words:
+search_index = InvertedIndex()
+field_indexes = {'title': InvertedIndex()}
+metadata_index = MetadataIndex(['words'])
+
+# Suffix arrays over lowercased bodies and titles for substring search (None
+# unless MEDIUM_MCP_SUBSTRING_INDEX=1), the articles changed since they were
+# built (counted by scanning), and each
+# article's position in article_cache, which breaks relevance ties
+substring_indexes = None
+unindexed_articles = set()
+article_order = {}
+
+# Term matrix over article titles for topic counts, or None when SciPy is
+# unavailable
+title_matrix = None
+
+# Latent semantic space over article titles and bodies (which carries its
+# own term matrix), for ranking='semantic'; None when SciPy is unavailable
+semantic_index = None
+
+# Title words too common to be topics
+TOPIC_STOP_WORDS = {'with', 'from', 'your', 'this', 'that', 'will', 'have', 'been', 'they', 'them', 'their'}
+
+# Bumped whenever articles are indexed, added, changed or removed; pagination
+# cursors carry it so a page is never resumed against a different index
+index_version = 0
+
 def get_data_directory() -> Path:
     """Get the path to the data directory containing Medium articles."""
     return Path(__file__).parent.parent / "data"
@@ -27,50 +74,16 @@ def get_data_directory() -> Path:
 def extract_article_content(html_path: Path) -> Dict[str, Any]:
     """Extract content and metadata from a Medium article HTML file."""
     try:
-        with open(html_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        # Extract title (try multiple selectors)
-        title = None
-        for selector in ['h1', 'title', '.p-name', '[data-testid="storyTitle"]']:
-            title_elem = soup.select_one(selector)
-            if title_elem:
-                title = title_elem.get_text().strip()
-                break
-        
-        if not title:
-            title = html_path.stem.replace('-', ' ').title()
-        
-        # Extract main content
-        content_elem = soup.select_one('article, .postArticle-content, .e-content, main')
-        if content_elem:
-            # Remove script and style elements
-            for script in content_elem(["script", "style"]):
-                script.decompose()
-            text_content = content_elem.get_text()
-        else:
-            # Fallback: get all text
-            for script in soup(["script", "style"]):
-                script.decompose()
-            text_content = soup.get_text()
-        
-        # Clean up text
-        text_content = re.sub(r'\n\s*\n', '\n\n', text_content.strip())
-        
-        # Extract any meta description or summary
-        meta_desc = soup.select_one('meta[name="description"]')
-        description = meta_desc.get('content') if meta_desc else ""
+        page = extract_page(html_path, 'server')
         
         return {
-            'title': title,
-            'content': text_content,
-            'description': description,
-            'path': str(html_path),
-            'directory': html_path.parent.name,
-            'word_count': len(text_content.split()),
-            'has_images': len(list((html_path.parent / 'img').glob('*'))) > 0 if (html_path.parent / 'img').exists() else False
+            'title': page['title'],
+            'content': page['content'],
+            'description': page['description'] if page['has_description'] else "",
+            'path': page['path'],
+            'directory': page['directory'],
+            'word_count': page['word_count'],
+            'has_images': page['has_images']
         }
     except Exception as e:
         return {
@@ -84,30 +97,286 @@ def extract_article_content(html_path: Path) -> Dict[str, Any]:
             'error': str(e)
         }
 
-def build_article_index():
-    """Build an index of all articles in the data directory."""
-    global article_cache, article_index
-    
+def make_article_index_entry(article_id: str, article_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the metadata-only article_index entry for an article."""
+    return {
+        'id': article_id,
+        'title': article_data['title'],
+        'description': article_data['description'],
+        'word_count': article_data['word_count'],
+        'has_images': article_data['has_images']
+    }
+
+def build_text_store(data_dir: Path, texts: Dict[str, str]) -> Optional[TextStore]:
+    """Write the memory-mapped text store for the given article bodies."""
+    try:
+        return TextStore.build(get_text_store_path(data_dir, "server"), texts)
+    except (OSError, ValueError) as e:
+        print(f"Could not build text store, keeping bodies in memory: {e}", file=sys.stderr)
+        return None
+
+def get_article_text(article_id: str) -> str:
+    """Get an article body, reading it from the text store if it is not resident."""
+    article_data = article_cache[article_id]
+    if 'content' in article_data:
+        return article_data['content']
+    return text_store.get(article_id)
+
+def get_article_document(article_id: str) -> Tuple[str, str]:
+    """Get the (title, body) an article was indexed with, for phrase and proximity matching."""
+    return article_cache[article_id]['title'], get_article_text(article_id)
+
+def article_text_for_semantics(article_data: Dict[str, Any]) -> str:
+    """Title and body, the text an article is placed in the semantic space by."""
+    return article_data['title'] + '\n' + article_data['content']
+
+def load_article_index(progress: Optional[Callable[[int, int], None]] = None) -> Optional[Tuple[Any, ...]]:
+    """Extract every article into a new (cache, index, text store, search index,
+    field indexes, substring indexes, title matrix, semantic index), or None without
+    a data directory.
+
+    Touches no globals, so it can run on a worker thread.
+    """
     data_dir = get_data_directory()
     if not data_dir.exists():
-        return
+        return None
     
-    article_index = []
-    article_cache = {}
+    # Find all HTML files in article directories, reusing the on-disk
+    # snapshot for files unchanged since the last run
+    html_files = list(data_dir.glob("*/*.html"))
+    snapshot_path = get_snapshot_path(data_dir, "server")
+    extracted, _ = extract_with_snapshot(html_files, extract_article_content, snapshot_path, progress)
     
-    # Find all HTML files in article directories
-    for html_file in data_dir.glob("*/*.html"):
-        article_data = extract_article_content(html_file)
+    store = None
+    if TEXT_STORE_ENABLED:
+        store = build_text_store(data_dir, {html_file.parent.name: article_data['content']
+                                            for html_file, article_data in zip(html_files, extracted)})
+    
+    substrings = None
+    contents = SubstringIndex.build({html_file.parent.name: article_data['content']
+                                     for html_file, article_data in zip(html_files, extracted)},
+                                    get_suffix_array_path(data_dir, "server"))
+    if contents is not None:
+        substrings = (contents, SubstringIndex.build({html_file.parent.name: article_data['title']
+                                                      for html_file, article_data in zip(html_files, extracted)}))
+    titles = TermMatrix.build({html_file.parent.name: article_data['title']
+                               for html_file, article_data in zip(html_files, extracted)})
+    semantic = SemanticIndex.build(
+        TermMatrix.build({html_file.parent.name: article_text_for_semantics(article_data)
+                          for html_file, article_data in zip(html_files, extracted)},
+                         get_term_matrix_path(data_dir, "server")),
+        get_semantic_index_path(data_dir, "server"))
+    
+    cache = {}
+    index = []
+    postings = InvertedIndex()
+    fields = {field: InvertedIndex() for field in field_indexes}
+    metadata = MetadataIndex(metadata_index.fields)
+    for html_file, article_data in zip(html_files, extracted):
         article_id = html_file.parent.name
+        postings.add(article_id, article_data['title'], article_data['content'])
+        add_to_field_indexes(fields, article_id, article_data)
+        metadata.add(article_id, article_data)
         
+        if store is not None and article_id in store:
+            del article_data['content']
+        cache[article_id] = article_data
+        index.append(make_article_index_entry(article_id, article_data))
+    return cache, index, store, postings, fields, metadata, substrings, titles, semantic
+
+def install_article_index(loaded):
+    """Swap in an index produced by load_article_index (on the event loop thread)."""
+    global article_cache, article_index, text_store, search_index, field_indexes, metadata_index, substring_indexes
+    global article_order
+    global title_matrix, semantic_index, index_version
+    if loaded is None:
+        return
+    index_version += 1
+    if text_store is not None and text_store is not loaded[2]:
+        text_store.close()
+    (article_cache, article_index, text_store, search_index, field_indexes, metadata_index,
+     substring_indexes, title_matrix, semantic_index) = loaded
+    article_order = {article_id: position for position, article_id in enumerate(article_cache)}
+    unindexed_articles.clear()
+
+def build_article_index():
+    """Build an index of all articles in the data directory."""
+    install_article_index(load_article_index())
+
+# Startup build, run in the background so the MCP handshake is not delayed
+index_build = IndexBuild(load_article_index, install_article_index,
+                         lambda: not article_index, lambda: get_data_directory())
+
+def extract_article_updates(article_dirs: List[Path]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """Re-extract changed article directories; returns (updated articles, removed IDs)."""
+    updates = {}
+    removed = []
+    for article_dir in article_dirs:
+        html_files = sorted(article_dir.glob("*.html")) if article_dir.is_dir() else []
+        if not html_files:
+            removed.append(article_dir.name)
+        for html_file in html_files:
+            updates[article_dir.name] = extract_article_content(html_file)
+    return updates, removed
+
+def apply_article_updates(updates: Dict[str, Dict[str, Any]], removed: List[str]):
+    """Patch article_cache and article_index in place (on the event loop thread)."""
+    global index_version
+    index_version += 1
+    removed_ids = set(removed)
+    for article_id in removed_ids | updates.keys():
+        # Updated articles keep their new body resident
+        if text_store is not None:
+            text_store.discard(article_id)
+    for article_id in removed_ids | updates.keys():
+        if substring_indexes is not None:
+            for substrings in substring_indexes:
+                substrings.discard(article_id)
+    for article_id in removed_ids:
+        article_cache.pop(article_id, None)
+        article_order.pop(article_id, None)
+        unindexed_articles.discard(article_id)
+        search_index.remove(article_id)
+        remove_from_field_indexes(field_indexes, article_id)
+        metadata_index.remove(article_id)
+        if title_matrix is not None:
+            title_matrix.remove(article_id)
+        if semantic_index is not None:
+            semantic_index.matrix.remove(article_id)
+            semantic_index.remove(article_id)
+    if removed_ids:
+        article_index[:] = [entry for entry in article_index if entry['id'] not in removed_ids]
+    
+    positions = {entry['id']: i for i, entry in enumerate(article_index)}
+    for article_id, article_data in updates.items():
         article_cache[article_id] = article_data
-        article_index.append({
-            'id': article_id,
-            'title': article_data['title'],
-            'description': article_data['description'],
-            'word_count': article_data['word_count'],
-            'has_images': article_data['has_images']
-        })
+        # Same position rule as the dict: new IDs go last, existing ones stay put
+        article_order.setdefault(article_id, max(article_order.values(), default=-1) + 1)
+        unindexed_articles.add(article_id)
+        search_index.add(article_id, article_data['title'], article_data['content'])
+        add_to_field_indexes(field_indexes, article_id, article_data)
+        metadata_index.add(article_id, article_data)
+        if title_matrix is not None:
+            title_matrix.update(article_id, article_data['title'])
+        if semantic_index is not None:
+            semantic_index.matrix.update(article_id, article_text_for_semantics(article_data))
+            semantic_index.update(article_id)
+        entry = make_article_index_entry(article_id, article_data)
+        if article_id in positions:
+            article_index[positions[article_id]] = entry
+        else:
+            article_index.append(entry)
+
+def start_data_watcher(loop: asyncio.AbstractEventLoop) -> Optional[DataDirectoryWatcher]:
+    """Watch the data directory and keep the article index up to date."""
+    def on_change(article_dirs: List[Path]):
+        # Parse on the watcher thread, mutate the caches on the event loop
+        updates, removed = extract_article_updates(article_dirs)
+        # Changes seen during the startup build are applied on top of its result
+        loop.call_soon_threadsafe(index_build.call_when_done, apply_article_updates, updates, removed)
+    
+    watcher = DataDirectoryWatcher(get_data_directory(), on_change)
+    return watcher if watcher.start() else None
+
+def count_substring_matches(query: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """Count occurrences of a lowercased query in article bodies and titles.
+
+    Returns (content counts, title counts); articles missing from both
+    did not match.
+    """
+    if substring_indexes is not None and substring_indexes[0].can_count(query):
+        # Suffix array lookups; only articles changed since the build are scanned
+        content_counts = substring_indexes[0].count(query)
+        title_counts = substring_indexes[1].count(query)
+        for article_id in unindexed_articles:
+            content_counts[article_id] = get_article_text(article_id).lower().count(query)
+            title_counts[article_id] = article_cache[article_id]['title'].lower().count(query)
+        return content_counts, title_counts
+    
+    # Bodies in the text store are counted with one scan of the mapped file
+    store_counts = text_store.count_occurrences(query) if text_store is not None and query else None
+    
+    content_counts = {}
+    title_counts = {}
+    for article_id, article_data in article_cache.items():
+        # Simple text search
+        if store_counts is not None and 'content' not in article_data:
+            content_counts[article_id] = store_counts.get(article_id, 0)
+        else:
+            content_counts[article_id] = get_article_text(article_id).lower().count(query)
+        title_counts[article_id] = article_data['title'].lower().count(query)
+    return content_counts, title_counts
+
+def find_articles(query: str, arguments: Dict[str, Any], limit: int,
+                  after: Optional[Tuple] = None) -> List[Tuple[str, Any]]:
+    """Run search_articles' query in the requested mode; returns the top (article ID, relevance).
+
+    Relevance is a BM25 score (float) for word-based modes and the
+    substring occurrence score (int) otherwise. Results are in a fixed
+    order, given by article_sort_key; after (the key of the last result of
+    the previous page) selects the next page. Raises QuerySyntaxError for
+    malformed boolean queries.
+    """
+    match = arguments.get("match", "words")
+    if arguments.get("syntax") == "boolean":
+        tree = parse_query(query)
+        matched = QueryEvaluator(search_index, field_indexes, metadata_index, article_cache,
+                                 get_article_document).evaluate(tree)
+        # Filters narrow the candidates before anything is scored; pure
+        # filters (no positive words) score 0 and keep ID order
+        scores = search_index.score(' '.join(positive_terms(tree)), matched)
+        return top_scores({article_id: scores.get(article_id, 0.0) for article_id in matched}, limit, after)
+    
+    if arguments.get("ranking") == "semantic":
+        # One matrix-vector product in the latent space, then top-k
+        return semantic_index.search(query, limit, after)
+    
+    if arguments.get("ranking") == "bm25" or match in ("phrase", "near"):
+        # Only the postings of the query's words are touched
+        scores = search_index.score(query)
+        if match == "phrase":
+            matches = search_index.phrase_counts(query, get_article_document)
+            scores = {article_id: score for article_id, score in scores.items() if article_id in matches}
+        elif match == "near":
+            matches = search_index.near_counts(query, arguments.get("window", 10), get_article_document)
+            scores = {article_id: score for article_id, score in scores.items() if article_id in matches}
+        return top_scores(scores, limit, after)
+    
+    content_counts, title_counts = count_substring_matches(query)
+    
+    matching_articles = []
+    for article_id in content_counts.keys() | title_counts.keys():
+        content_count = content_counts.get(article_id, 0)
+        title_count = title_counts.get(article_id, 0)
+        
+        if content_count or title_count:
+            matching_articles.append((article_id, content_count + title_count * 2))
+    
+    # Select by relevance, ties in index order
+    return top_ranked(matching_articles, limit, substring_key, after)
+
+def substring_key(item: Tuple[str, int]) -> Tuple[int, int]:
+    """Sort key of a substring match: most occurrences first, then index order."""
+    return (-item[1], article_order.get(item[0], 0))
+
+def article_sort_key(arguments: Dict[str, Any]) -> Callable:
+    """The sort key find_articles orders results by for these arguments."""
+    if arguments.get("syntax") == "boolean" or arguments.get("ranking") in ("bm25", "semantic") \
+            or arguments.get("match", "words") in ("phrase", "near"):
+        return score_key
+    return substring_key
+
+def article_snippet(article_id: str, query: str, substring: bool) -> str:
+    """Best-matching passage of an article body with the query's words in bold.
+
+    Word matches are found by splitting the body into words; substring
+    queries that match inside words fall back to finding the first occurrence.
+    """
+    text = get_article_text(article_id)
+    snippet = word_snippet(text, query)
+    if not snippet and substring:
+        snippet = substring_snippet(text, query)
+    return snippet
 
 @server.list_tools()
 async def handle_list_tools() -> List[types.Tool]:
@@ -127,6 +396,43 @@ async def handle_list_tools() -> List[types.Tool]:
                         "type": "integer", 
                         "description": "Maximum number of results to return (default: 10)",
                         "default": 10
+                    },
+                    "ranking": {
+                        "type": "string",
+                        "enum": ["substring", "bm25", "semantic"],
+                        "description": "'substring' (default) matches the query anywhere in the title or content and ranks by occurrence count; 'bm25' matches whole words and ranks by BM25 relevance; 'semantic' ranks by similarity in a latent semantic space, so articles on the query's topic match even when they use different words",
+                        "default": "substring"
+                    },
+                    "match": {
+                        "type": "string",
+                        "enum": ["words", "phrase", "near"],
+                        "description": "With 'phrase' or 'near', only articles containing the query words as an exact phrase, or all within 'window' words of each other, are returned, ranked by BM25 (default: 'words')",
+                        "default": "words"
+                    },
+                    "window": {
+                        "type": "integer",
+                        "description": f"Span in words for match='near' (default: 10, at most {FIELD_GAP})",
+                        "default": 10
+                    },
+                    "syntax": {
+                        "type": "string",
+                        "enum": ["plain", "boolean"],
+                        "description": "'boolean' parses the query as a boolean expression: AND/OR/NOT (or -word), parentheses, \"quoted phrases\", title:word and words:>2000 / words:1000..2000; matches are ranked by BM25 (default: 'plain')",
+                        "default": "plain"
+                    },
+                    "fuzzy": {
+                        "type": "boolean",
+                        "description": "If nothing matches, retry with misspelled words corrected to the closest words in the archive (default: true)",
+                        "default": True
+                    },
+                    "snippets": {
+                        "type": "boolean",
+                        "description": "Show the best-matching passage of each article with matches in **bold** (default: true)",
+                        "default": True
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor from a previous page of the same search, to fetch the results that follow it"
                     }
                 },
                 "required": ["query"]
@@ -156,6 +462,10 @@ async def handle_list_tools() -> List[types.Tool]:
                         "type": "integer",
                         "description": "Maximum number of articles to return (default: 20)",
                         "default": 20
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor from a previous page, to list the articles that follow it"
                     }
                 }
             }
@@ -180,38 +490,79 @@ async def handle_list_tools() -> List[types.Tool]:
 async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextContent]:
     """Handle MCP tool calls."""
     
-    # Ensure article index is built
-    if not article_index:
-        build_article_index()
+    # Wait for the background build (starting one if the index is empty and
+    # the corpus changed since it was last found empty); if it is still
+    # running, say so rather than answering from a partial index
+    if not await index_build.ensure(INDEX_WAIT_SECONDS):
+        return [types.TextContent(type="text", text=index_build.status("articles"))]
     
     if name == "search_articles":
         query = arguments.get("query", "").lower()
         limit = arguments.get("limit", 10)
+        boolean = arguments.get("syntax") == "boolean"
+        if arguments.get("ranking") == "semantic" and not boolean and semantic_index is None:
+            return [types.TextContent(type="text", text="Error: Semantic ranking needs numpy and scipy "
+                                                          "and MEDIUM_MCP_LSA_DIMENSIONS above 0")]
+        shown_query = arguments.get("query", "") if boolean else query
         
-        matching_articles = []
-        for article_id, article_data in article_cache.items():
-            # Simple text search
-            content_lower = article_data['content'].lower()
-            title_lower = article_data['title'].lower()
-            
-            if query in content_lower or query in title_lower:
-                matching_articles.append({
-                    'id': article_id,
-                    'title': article_data['title'],
-                    'description': article_data['description'],
-                    'relevance': content_lower.count(query) + title_lower.count(query) * 2
-                })
+        # Cursors hold the sort key of the last result shown, so the next
+        # page is a top-k selection among the results ranked after it
+        fingerprint = query_fingerprint(shown_query, arguments.get("ranking", "substring"),
+                                        arguments.get("match", "words"), arguments.get("window", 10),
+                                        arguments.get("syntax", "plain"), arguments.get("fuzzy", True))
+        after = None
+        result_text = ""
+        if arguments.get("cursor"):
+            try:
+                after, cursor_query = decode_cursor(arguments["cursor"], index_version, fingerprint)
+            except CursorError as e:
+                return [types.TextContent(type="text", text=f"Error: {e}")]
+            if cursor_query:
+                result_text = f"Continuing results for '{cursor_query}'.\n\n"
+                shown_query = cursor_query
         
-        # Sort by relevance
-        matching_articles.sort(key=lambda x: x['relevance'], reverse=True)
-        results = matching_articles[:limit]
+        # One extra result tells whether there is another page
+        try:
+            results = find_articles(shown_query, arguments, limit + 1, after)
+        except QuerySyntaxError as e:
+            return [types.TextContent(type="text", text=f"Error: {e}")]
         
-        result_text = f"Found {len(results)} articles matching '{query}':\n\n"
-        for article in results:
-            result_text += f"**{article['title']}** (ID: {article['id']})\n"
+        if not results and after is None and not boolean and arguments.get("fuzzy", True):
+            # Retry with misspelled words replaced by their closest indexed
+            # words, found through the trigram vocabulary
+            corrected = search_index.correct(query)
+            if corrected != query:
+                corrected_results = find_articles(corrected, arguments, limit + 1)
+                if corrected_results:
+                    result_text = f"No articles matched '{query}'; showing results for '{corrected}'.\n\n"
+                    results, shown_query = corrected_results, corrected
+        has_more = len(results) > limit
+        results = results[:limit]
+        
+        # Boolean queries are highlighted by their positive words only
+        snippet_query = ' '.join(positive_terms(parse_query(shown_query))) if boolean else shown_query
+        substring = not boolean and arguments.get("ranking", "substring") == "substring" \
+            and arguments.get("match", "words") == "words"
+        
+        result_text += f"Found {len(results)} articles matching '{shown_query}':\n\n"
+        for article_id, relevance in results:
+            article = article_cache[article_id]
+            result_text += f"**{article['title']}** (ID: {article_id})\n"
             if article['description']:
                 result_text += f"Description: {article['description']}\n"
-            result_text += f"Relevance score: {article['relevance']}\n\n"
+            if arguments.get("snippets", True):
+                snippet = article_snippet(article_id, snippet_query, substring)
+                if snippet:
+                    result_text += f"Snippet: {snippet}\n"
+            if isinstance(relevance, float):
+                result_text += f"Relevance score: {relevance:.2f}\n\n"
+            else:
+                result_text += f"Relevance score: {relevance}\n\n"
+        
+        if has_more:
+            cursor = encode_cursor(index_version, fingerprint, article_sort_key(arguments)(results[-1]),
+                                   shown_query if shown_query != query and not boolean else "")
+            result_text += f"More results available; pass cursor \"{cursor}\" for the next page.\n"
         
         return [types.TextContent(type="text", text=result_text)]
     
@@ -232,21 +583,40 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
         result_text += f"**Has Images:** {'Yes' if article['has_images'] else 'No'}\n"
         result_text += f"**File Path:** {article['path']}\n\n"
         result_text += "## Content\n\n"
-        result_text += article['content']
+        result_text += get_article_text(article_id)
         
         return [types.TextContent(type="text", text=result_text)]
     
     elif name == "list_articles":
         limit = arguments.get("limit", 20)
-        articles = article_index[:limit]
+        fingerprint = query_fingerprint("list_articles")
+        start = 0
+        if arguments.get("cursor"):
+            # The key is the position of the last article listed
+            try:
+                key, _ = decode_cursor(arguments["cursor"], index_version, fingerprint)
+            except CursorError as e:
+                return [types.TextContent(type="text", text=f"Error: {e}")]
+            if len(key) != 1 or not isinstance(key[0], int):
+                return [types.TextContent(type="text", text="Error: Invalid cursor")]
+            start = key[0] + 1
+        articles = article_index[start:start + limit]
         
-        result_text = f"Available Medium Articles ({len(articles)} of {len(article_index)} total):\n\n"
+        if start:
+            result_text = (f"Available Medium Articles ({start + 1}-{start + len(articles)} "
+                           f"of {len(article_index)} total):\n\n")
+        else:
+            result_text = f"Available Medium Articles ({len(articles)} of {len(article_index)} total):\n\n"
         for article in articles:
             result_text += f"**{article['title']}** (ID: {article['id']})\n"
             if article['description']:
                 result_text += f"Description: {article['description']}\n"
             result_text += f"Words: {article['word_count']}, Images: {'Yes' if article['has_images'] else 'No'}\n\n"
         
+        if start + limit < len(article_index):
+            cursor = encode_cursor(index_version, fingerprint, (start + len(articles) - 1,))
+            result_text += f"More articles available; pass cursor \"{cursor}\" for the next page.\n"
+        
         return [types.TextContent(type="text", text=result_text)]
     
     elif name == "get_article_topics":
@@ -254,16 +624,21 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
         if not article_ids:
             article_ids = list(article_cache.keys())
         
-        # Simple keyword extraction from titles
-        topics = {}
-        for article_id in article_ids:
-            if article_id in article_cache:
-                article = article_cache[article_id]
-                # Extract keywords from title (simple approach)
-                words = re.findall(r'\b[A-Za-z]{4,}\b', article['title'].lower())
-                for word in words:
-                    if word not in ['with', 'from', 'your', 'this', 'that', 'will', 'have', 'been', 'they', 'them', 'their']:
-                        topics[word] = topics.get(word, 0) + 1
+        if title_matrix is not None:
+            # Occurrences of each title word, summed from the term matrix
+            totals = title_matrix.term_totals([article_id for article_id in article_ids if article_id in title_matrix])
+            topics = {word: count for word, count in totals.items() if word not in TOPIC_STOP_WORDS}
+        else:
+            # Simple keyword extraction from titles
+            topics = {}
+            for article_id in article_ids:
+                if article_id in article_cache:
+                    article = article_cache[article_id]
+                    # Extract keywords from title (simple approach)
+                    words = re.findall(r'\b[A-Za-z]{4,}\b', article['title'].lower())
+                    for word in words:
+                        if word not in TOPIC_STOP_WORDS:
+                            topics[word] = topics.get(word, 0) + 1
         
         # Sort topics by frequency
         sorted_topics = sorted(topics.items(), key=lambda x: x[1], reverse=True)[:20]
@@ -279,24 +654,33 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[types.T
 
 async def main():
     """Main entry point for the MCP server."""
-    # Build the initial article index
-    build_article_index()
+    loop = asyncio.get_running_loop()
+    
+    # Build the initial article index in the background; the server answers
+    # the handshake and list_tools meanwhile
+    index_build.start(loop)
+    
+    # Pick up new, edited and deleted articles without a restart
+    watcher = start_data_watcher(loop)
     
     # Run the server
-    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            InitializationOptions(
-                server_name="medium-mcp-server",
-                server_version="1.0.0",
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(),
-                    experimental_capabilities={}
+    try:
+        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+            await server.run(
+                read_stream,
+                write_stream,
+                InitializationOptions(
+                    server_name="medium-mcp-server",
+                    server_version="1.0.0",
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(),
+                        experimental_capabilities={}
+                    )
                 )
             )
-        )
+    finally:
+        if watcher:
+            watcher.stop()
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
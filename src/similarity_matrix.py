@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import zipfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from term_matrix import TermMatrix, load_npz_mapped, np
+
+# Largest archive given an all-pairs similarity matrix (it holds 4 * n^2
+# bytes, 100 MB at 5000 chapters); "0" disables it
+SIMILARITY_MAX_DOCUMENTS = int(os.environ.get("MEDIUM_MCP_SIMILARITY_MAX_CHAPTERS", "5000"))
+
+# Rows multiplied at once while building, to bound the sparse product's memory
+BUILD_BLOCK_ROWS = 1024
+
+# Added documents grow the matrix by this factor (at least MIN_GROWTH
+# rows), so adding one rarely copies it
+GROWTH_FACTOR = 1.25
+MIN_GROWTH = 16
+
+class SimilarityMatrix:
+    """Dense document x document cosine similarities of a TermMatrix's TF-IDF rows.
+
+    Built with blocked sparse products of the unit-length weights against
+    their transpose, so finding the documents most like one is a row
+    lookup plus a top-k selection. The term matrix keeps its build IDF
+    until the next full build, so a changed document only needs its own
+    row and column recomputed.
+
+    Documents occupy slots: added ones take spare slots at the end (the
+    matrix grows by GROWTH_FACTOR when none are left) and removed ones
+    leave a masked-out slot behind, so no update copies the matrix. The
+    next full build compacts it.
+
+    Given a cache_path, the matrix is saved there and memory-mapped back
+    copy-on-write while the term matrix is built from the same texts.
+    """
+
+    def __init__(self, matrix: TermMatrix, cache_path: Optional[Path] = None):
+        self.matrix = matrix
+        self._slot_keys: List[Optional[str]] = list(matrix.keys)
+        self._slots = {key: slot for slot, key in enumerate(self._slot_keys)}
+        self._used = len(self._slot_keys)
+        self._live = np.ones(self._used, dtype=bool)
+        if not (cache_path and self._load(cache_path)):
+            weights = matrix.weights
+            self.values = np.empty((self._used, self._used), dtype=np.float32)
+            for start in range(0, self._used, BUILD_BLOCK_ROWS):
+                self.values[start:start + BUILD_BLOCK_ROWS] = \
+                    weights[start:start + BUILD_BLOCK_ROWS].dot(weights.T).toarray()
+            if cache_path:
+                self._save(cache_path)
+
+    @classmethod
+    def build(cls, matrix: Optional[TermMatrix], cache_path: Optional[Path] = None) -> Optional['SimilarityMatrix']:
+        """Build a matrix, or return None without a term matrix or above SIMILARITY_MAX_DOCUMENTS."""
+        if matrix is None or len(matrix) > SIMILARITY_MAX_DOCUMENTS:
+            return None
+        return cls(matrix, cache_path)
+
+    def _load(self, cache_path: Path) -> bool:
+        """Map a saved matrix if it was computed from the same documents."""
+        try:
+            # Copy-on-write, so updates only copy the pages they touch
+            saved = load_npz_mapped(cache_path, mode='c')
+            if not np.array_equal(saved['digest'], self.matrix.digest) \
+                    or saved['values'].shape != (self._used, self._used):
+                return False
+            self.values = saved['values']
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return False
+        return True
+
+    def _save(self, cache_path: Path):
+        """Atomically save the similarities next to the other index files."""
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, digest=self.matrix.digest, values=self.values)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not save similarity matrix: {e}", file=sys.stderr)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slots
+
+    @property
+    def keys(self) -> List[str]:
+        """Documents in the matrix, in slot order."""
+        return [key for key in self._slot_keys if key is not None]
+
+    def _grow(self):
+        """Make room for more documents, copying the used part of the matrix once."""
+        capacity = max(int(len(self.values) * GROWTH_FACTOR), len(self.values) + MIN_GROWTH)
+        values = np.zeros((capacity, capacity), dtype=np.float32)
+        values[:self._used, :self._used] = self.values[:self._used, :self._used]
+        self.values = values
+        live = np.zeros(capacity, dtype=bool)
+        live[:self._used] = self._live[:self._used]
+        self._live = live
+
+    def update(self, key: str):
+        """Recompute a document's row and column after its term matrix row was added or replaced."""
+        weights = self.matrix.weights
+        similarities = weights.dot(weights[self.matrix.rows([key])[0]].T).toarray().ravel()
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._used == len(self.values):
+                self._grow()
+            slot = self._used
+            self._used += 1
+            self._slots[key] = slot
+            self._slot_keys.append(key)
+            self._live[slot] = True
+        # Similarities come in term matrix order; scatter them to the documents' slots
+        slots = np.array([self._slots[other] for other in self.matrix.keys], dtype=np.int64)
+        self.values[slot, slots] = similarities
+        self.values[slots, slot] = similarities
+
+    def remove(self, key: str):
+        """Mask out a document's slot (a no-op if it is not in the matrix)."""
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        self._slot_keys[slot] = None
+        self._live[slot] = False
+
+    def similar(self, key: str, limit: int, allowed: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """The limit documents most similar to key, excluding itself, as (key, cosine similarity).
+
+        Best first, ties in document order; documents sharing no weighted
+        term are left out and allowed restricts the candidates.
+        """
+        slot = self._slots[key]
+        scores = np.array(self.values[slot, :self._used], dtype=np.float64)
+        scores[slot] = 0
+        scores[~self._live[:self._used]] = 0
+        if allowed is not None:
+            mask = np.zeros(self._used, dtype=bool)
+            mask[[self._slots[other] for other in allowed if other in self._slots]] = True
+            scores[~mask] = 0
+        slots = np.flatnonzero(scores > 0)
+        if len(slots) > limit:
+            # Keep every slot scoring at least the limit-th best, so ties at the
+            # boundary are broken by slot below rather than arbitrarily
+            threshold = np.partition(scores[slots], len(slots) - limit)[len(slots) - limit]
+            slots = slots[scores[slots] >= threshold]
+        best = np.lexsort((slots, -scores[slots]))[:limit]
+        return [(self._slot_keys[other], float(scores[other])) for other in slots[best]]
+
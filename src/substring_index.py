@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Optional
+
+try:
+    import numpy as np
+except ImportError:  # The substring index is optional; searches fall back to scanning
+    np = None
+
+# Build suffix arrays for substring search ("1" enables them). Off by
+# default: they hold about five bytes of memory per byte of indexed text,
+# which undoes the savings of MEDIUM_MCP_TEXT_STORE, and queries with many
+# matches are counted no faster than by a scan.
+SUBSTRING_INDEX_ENABLED = os.environ.get("MEDIUM_MCP_SUBSTRING_INDEX", "0") == "1"
+
+# Suffixes are first sorted by this many leading bytes packed into one
+# integer, 9 bits per byte so the end of the text sorts before byte 0
+PREFIX_BYTES = 7
+
+# Separates documents in the concatenated text so no match spans two of them
+SEPARATOR = b'\0'
+
+def build_suffix_array(data: bytes) -> 'np.ndarray':
+    """Sort every suffix of data by prefix doubling.
+
+    Suffixes are first sorted by their first PREFIX_BYTES bytes; each round
+    then re-sorts only the groups that are still tied, by the rank of the
+    k bytes that follow, doubling k until every suffix is in a group of its
+    own. Ranks are the position of a suffix's group in the array, so
+    suffixes that are already placed never have to be touched again.
+    """
+    n = len(data)
+    if n == 0:
+        return np.zeros(0, dtype=np.int32)
+
+    # Pack the first PREFIX_BYTES bytes of every suffix into one sort key as
+    # byte + 1; positions past the end read as 0, so shorter suffixes sort first
+    padded = np.zeros(n + PREFIX_BYTES, dtype=np.uint64)
+    padded[:n] = np.frombuffer(data, dtype=np.uint8)
+    padded[:n] += np.uint64(1)
+    key = np.zeros(n, dtype=np.uint64)
+    for i in range(PREFIX_BYTES):
+        key = (key << np.uint64(9)) | padded[i:i + n]
+    order = np.argsort(key)
+    sorted_key = key[order]
+    del key, padded
+
+    positions = np.arange(n, dtype=np.int64)
+    boundary = np.empty(n, dtype=bool)
+    boundary[0] = True
+    boundary[1:] = sorted_key[1:] != sorted_key[:-1]
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.maximum.accumulate(np.where(boundary, positions, 0))
+    del sorted_key
+
+    k = PREFIX_BYTES
+    while True:
+        # A slot is settled when it starts a group and the next slot starts another
+        settled = boundary.copy()
+        settled[:-1] &= boundary[1:]
+        slots = np.flatnonzero(~settled)
+        if len(slots) == 0 or k >= n:
+            return order.astype(np.int32)
+
+        suffixes = order[slots]
+        following = suffixes + k
+        second = np.where(following < n, rank[np.minimum(following, n - 1)] + 1, 0)
+        key = rank[suffixes] * (n + 1) + second
+        permutation = np.argsort(key)
+        suffixes, key = suffixes[permutation], key[permutation]
+        order[slots] = suffixes
+
+        # Slots are ascending and old groups are contiguous, so the new groups
+        # are the runs of equal keys
+        new_boundary = np.empty(len(slots), dtype=bool)
+        new_boundary[0] = True
+        new_boundary[1:] = key[1:] != key[:-1]
+        boundary[slots] = new_boundary
+        rank[suffixes] = np.maximum.accumulate(np.where(new_boundary, slots, 0))
+        k *= 2
+
+def has_border(pattern: bytes) -> bool:
+    """Whether occurrences of pattern can overlap (a proper prefix equals a suffix)."""
+    return any(pattern[:length] == pattern[-length:] for length in range(1, len(pattern)))
+
+class SubstringIndex:
+    """Suffix array over lowercased documents for substring occurrence counts.
+
+    Answers "how often does this substring occur in each document" with two
+    binary searches over the suffix array (O(m log n) for an m-byte query)
+    plus work proportional to the number of occurrences, instead of scanning
+    every document. Counts are non-overlapping, exactly like str.count, and
+    UTF-8 byte matches always fall on character boundaries, so the result
+    equals text.lower().count(query).
+
+    Documents cannot be added after the build; discard() a changed document
+    and count it some other way until the next build. Given a cache_path,
+    the suffix array is saved there and reused while the text is unchanged.
+    """
+
+    def __init__(self, texts: Dict[str, str], cache_path: Optional[Path] = None):
+        chunks = []
+        starts = []
+        offset = 0
+        for text in texts.values():
+            data = text.lower().encode('utf-8')
+            starts.append(offset)
+            chunks.append(data)
+            offset += len(data) + len(SEPARATOR)
+        self.keys: List[str] = list(texts)
+        self._live = set(self.keys)
+        self._starts = np.array(starts, dtype=np.int64)
+        self._data = SEPARATOR.join(chunks)
+
+        digest = np.frombuffer(hashlib.sha256(self._data).digest(), dtype=np.uint8)
+        self._suffixes = self._load(cache_path, digest) if cache_path else None
+        if self._suffixes is None:
+            self._suffixes = build_suffix_array(self._data)
+            if cache_path:
+                self._save(cache_path, digest)
+
+    @classmethod
+    def build(cls, texts: Dict[str, str], cache_path: Optional[Path] = None) -> Optional['SubstringIndex']:
+        """Build an index, or return None when disabled or NumPy is not installed."""
+        if not SUBSTRING_INDEX_ENABLED or np is None:
+            return None
+        return cls(texts, cache_path)
+
+    def _load(self, cache_path: Path, digest: 'np.ndarray') -> Optional['np.ndarray']:
+        """Load a saved suffix array if it was built from exactly this text."""
+        try:
+            with np.load(cache_path, allow_pickle=False) as saved:
+                if np.array_equal(saved['digest'], digest) and len(saved['suffixes']) == len(self._data):
+                    return saved['suffixes']
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def _save(self, cache_path: Path, digest: 'np.ndarray'):
+        """Atomically save the suffix array next to the other index files."""
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, digest=digest, suffixes=self._suffixes)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not save suffix array: {e}", file=sys.stderr)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._live
+
+    def discard(self, key: str):
+        """Forget a document whose text changed since the index was built."""
+        self._live.discard(key)
+
+    def can_count(self, query: str) -> bool:
+        """Whether count() answers this query (empty queries and separators cannot)."""
+        return bool(query) and '\0' not in query
+
+    def _bound(self, pattern: bytes, upper: bool) -> int:
+        """First suffix whose prefix is >= pattern (> pattern when upper)."""
+        data, suffixes, m = self._data, self._suffixes, len(pattern)
+        lo, hi = 0, len(suffixes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = int(suffixes[mid])
+            prefix = data[start:start + m]
+            if prefix < pattern or (upper and prefix == pattern):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def count(self, query: str) -> Dict[str, int]:
+        """Non-overlapping occurrences of query (lowercased) per live document that contains it."""
+        pattern = query.lower().encode('utf-8')
+        lo = self._bound(pattern, upper=False)
+        hi = self._bound(pattern, upper=True)
+        if lo == hi:
+            return {}
+
+        positions = np.sort(self._suffixes[lo:hi])
+        documents = np.searchsorted(self._starts, positions, side='right') - 1
+        counts = {}
+        if not has_border(pattern):
+            # Occurrences of a border-free pattern never overlap
+            found, totals = np.unique(documents, return_counts=True)
+            for document, total in zip(found.tolist(), totals.tolist()):
+                counts[self.keys[document]] = total
+        else:
+            # Greedy left-to-right selection, as str.count does
+            last_document, next_free = -1, 0
+            for position, document in zip(positions.tolist(), documents.tolist()):
+                if document != last_document:
+                    last_document, next_free = document, 0
+                if position >= next_free:
+                    key = self.keys[document]
+                    counts[key] = counts.get(key, 0) + 1
+                    next_free = position + len(pattern)
+        return {key: total for key, total in counts.items() if key in self._live}
+
+if __name__ == "__main__":
+    # Check against str.count and time both: python src/substring_index.py [data_dir] [query ...]
+    from ingest import extract_page
+
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent / "data"
+    queries = sys.argv[2:] or ['design', 'the', 'ing ', 'data visualization', 'aa', 'zzzq']
+    texts = {html_file.parent.name: extract_page(html_file, 'server')['content']
+             for html_file in sorted(data_dir.glob("*/*.html"))}
+
+    start = time.perf_counter()
+    index = SubstringIndex(texts)
+    print(f"Indexed {len(texts)} documents ({len(index._data)} bytes) in {time.perf_counter() - start:.2f}s")
+
+    failures = 0
+    for query in queries:
+        start = time.perf_counter()
+        counts = index.count(query)
+        indexed = time.perf_counter() - start
+        start = time.perf_counter()
+        expected = {key: text.lower().count(query) for key, text in texts.items()}
+        scanned = time.perf_counter() - start
+        expected = {key: total for key, total in expected.items() if total}
+        status = "ok" if counts == expected else "MISMATCH"
+        failures += counts != expected
+        print(f"{query!r:24} {sum(counts.values()):8} hits  index {indexed * 1000:8.2f} ms  "
+              f"scan {scanned * 1000:8.2f} ms  {status}")
+    sys.exit(1 if failures else 0)
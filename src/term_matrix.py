@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import time
+import zipfile
+import hashlib
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Iterable
+
+try:
+    import numpy as np
+    import scipy.sparse as sparse
+except ImportError:  # The term matrix is optional; analyses fall back to Python loops
+    np = None
+    sparse = None
+
+# Build TF-IDF term-document matrices for corpus analyses ("0" disables them)
+TERM_MATRIX_ENABLED = os.environ.get("MEDIUM_MCP_TERM_MATRIX", "1") != "0"
+
+# Terms are lowercase words of at least four letters, as the analyses have
+# always counted them (shorter words are mostly stop words)
+WORD_PATTERN = re.compile(r'\b[a-z]{4,}\b')
+
+def document_terms(text: str) -> Dict[str, int]:
+    """Occurrences of each term in a text."""
+    counts = {}
+    for term in WORD_PATTERN.findall(text.lower()):
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+def load_npz_mapped(path: Path, mode: str = 'r') -> Dict[str, 'np.ndarray']:
+    """Open the arrays of an uncompressed .npz as memory maps, read-only by default.
+
+    np.load ignores mmap_mode for .npz archives, but np.savez stores each
+    array uncompressed, so every member is a plain .npy file at a known
+    offset in the archive and can be mapped where it lies. mode='c' maps
+    copy-on-write: writes change private copies of the touched pages only.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED or not info.filename.endswith('.npy'):
+                raise ValueError(f"{path} has a compressed or unexpected member {info.filename}")
+            # The local header's name and extra field lengths may differ from the central directory's
+            f.seek(info.header_offset + 26)
+            name_length = int.from_bytes(f.read(2), 'little')
+            extra_length = int.from_bytes(f.read(2), 'little')
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"{path} holds object arrays")
+            name = info.filename[:-len('.npy')]
+            if 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode=mode, offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+class TermMatrix:
+    """Sparse document x term matrices of term counts and TF-IDF weights.
+
+    Rows are documents (in the order given), columns are terms. Weights
+    are smoothed TF-IDF, tf * (ln((1 + N) / (1 + df)) + 1), with each row
+    scaled to unit length so the dot product of two rows is their cosine
+    similarity. Analyses select rows and combine them with sparse matrix
+    operations instead of building and intersecting word sets per call.
+
+    Given a cache_path, the matrices are saved there as an uncompressed
+    .npz and memory-mapped back while the documents are unchanged.
+    update() and remove() patch single documents in place. The IDF is
+    fixed at build time until the next full build (terms first seen in an
+    update are weighted as occurring in one build document), so patching
+    one row never changes the weights of the others.
+    """
+
+    def __init__(self, texts: Dict[str, str], cache_path: Optional[Path] = None):
+        self.keys: List[str] = list(texts)
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+
+        digest = hashlib.sha256()
+        for key, text in texts.items():
+            digest.update(key.encode('utf-8') + b'\0' + text.encode('utf-8') + b'\0')
+        digest = np.frombuffer(digest.digest(), dtype=np.uint8)
+        # Identifies the documents the matrix was built from, for files derived from it
+        self.digest = digest
+
+        if not (cache_path and self._load(cache_path, digest)):
+            self.vocabulary: List[str] = []
+            self._columns: Dict[str, int] = {}
+            self._set_counts(self._count_rows(texts.values()))
+            if cache_path:
+                self._save(cache_path, digest)
+
+    @classmethod
+    def build(cls, texts: Dict[str, str], cache_path: Optional[Path] = None) -> Optional['TermMatrix']:
+        """Build a matrix, or return None when disabled or NumPy/SciPy are not installed."""
+        if not TERM_MATRIX_ENABLED or sparse is None:
+            return None
+        return cls(texts, cache_path)
+
+    def _count_rows(self, texts: Iterable[str]) -> 'sparse.csr_matrix':
+        """Count matrix of the given texts, adding their new terms to the vocabulary."""
+        indptr = [0]
+        indices = []
+        data = []
+        for text in texts:
+            for term, count in document_terms(text).items():
+                column = self._columns.get(term)
+                if column is None:
+                    column = self._columns[term] = len(self.vocabulary)
+                    self.vocabulary.append(term)
+                indices.append(column)
+                data.append(count)
+            indptr.append(len(indices))
+        rows = sparse.csr_matrix((np.array(data, dtype=np.int32), np.array(indices, dtype=np.int32),
+                                  np.array(indptr, dtype=np.int64)),
+                                 shape=(len(indptr) - 1, len(self.vocabulary)))
+        rows.sort_indices()
+        return rows
+
+    def _set_counts(self, counts: 'sparse.csr_matrix'):
+        """Install a full build's count matrix and derive the IDF and TF-IDF weights from it."""
+        self.counts = counts
+        self._set_idf()
+        self.weights = self._weigh(counts)
+
+    def _weigh(self, counts: 'sparse.csr_matrix') -> 'sparse.csr_matrix':
+        """Unit-length TF-IDF rows of count rows, with the same sparsity structure."""
+        documents = counts.shape[0]
+        data = counts.data.astype(np.float32) * self.idf[counts.indices]
+        row_of_entry = np.repeat(np.arange(documents), np.diff(counts.indptr))
+        norms = np.sqrt(np.bincount(row_of_entry, weights=data * data, minlength=documents))
+        norms[norms == 0] = 1
+        data /= norms[row_of_entry].astype(np.float32)
+        return sparse.csr_matrix((data, counts.indices, counts.indptr), shape=counts.shape)
+
+    def _set_idf(self):
+        """Inverse document frequency of every term, from the counts."""
+        frequencies = np.bincount(self.counts.indices, minlength=self.counts.shape[1])
+        self._idf_documents = self.counts.shape[0]
+        self.idf = (np.log((1 + self._idf_documents) / (1 + frequencies)) + 1).astype(np.float32)
+
+    def _extend_idf(self):
+        """Give terms added to the vocabulary since the build the IDF of a term in one document."""
+        added = len(self.vocabulary) - len(self.idf)
+        if added:
+            weight = np.float32(np.log((1 + self._idf_documents) / 2) + 1)
+            self.idf = np.concatenate([self.idf, np.full(added, weight, dtype=np.float32)])
+
+    def _load(self, cache_path: Path, digest: 'np.ndarray') -> bool:
+        """Map a saved matrix if it was built from exactly these documents."""
+        try:
+            saved = load_npz_mapped(cache_path)
+            if not np.array_equal(saved['digest'], digest):
+                return False
+            self.vocabulary = saved['vocabulary'].tolist()
+            shape = (len(self.keys), len(self.vocabulary))
+            self.counts = sparse.csr_matrix((saved['counts'], saved['indices'], saved['indptr']), shape=shape)
+            self.weights = sparse.csr_matrix((saved['weights'], saved['indices'], saved['indptr']), shape=shape)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return False
+        self._columns = {term: column for column, term in enumerate(self.vocabulary)}
+        self._set_idf()
+        return True
+
+    def _save(self, cache_path: Path, digest: 'np.ndarray'):
+        """Atomically save the matrices next to the other index files."""
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix('.tmp')
+            with open(tmp_path, 'wb') as f:
+                # Counts and weights share the sparsity structure, so it is stored once
+                np.savez(f, digest=digest, vocabulary=np.array(self.vocabulary, dtype=str),
+                         indptr=self.counts.indptr, indices=self.counts.indices,
+                         counts=self.counts.data, weights=self.weights.data)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not save term matrix: {e}", file=sys.stderr)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def update(self, key: str, text: str):
+        """Add a document or replace its row; other rows keep their weights."""
+        row = self._count_rows([text])
+        self._extend_idf()
+        row_weights = self._weigh(row)
+        columns = len(self.vocabulary)
+        matrices = []
+        for matrix, new_row in ((self.counts, row), (self.weights, row_weights)):
+            if matrix.shape[1] < columns:
+                matrix = sparse.csr_matrix((matrix.data, matrix.indices, matrix.indptr),
+                                           shape=(matrix.shape[0], columns))
+            if key in self._rows:
+                position = self._rows[key]
+                matrix = sparse.vstack([matrix[:position], new_row, matrix[position + 1:]], format='csr')
+            else:
+                matrix = sparse.vstack([matrix, new_row], format='csr')
+            matrices.append(matrix)
+        self.counts, self.weights = matrices
+        if key not in self._rows:
+            self._rows[key] = len(self.keys)
+            self.keys.append(key)
+
+    def remove(self, key: str):
+        """Drop a document (a no-op if it is not in the matrix); other rows keep their weights."""
+        position = self._rows.pop(key, None)
+        if position is None:
+            return
+        del self.keys[position]
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self.counts = sparse.vstack([self.counts[:position], self.counts[position + 1:]], format='csr')
+        self.weights = sparse.vstack([self.weights[:position], self.weights[position + 1:]], format='csr')
+
+    def vector(self, text: str) -> 'np.ndarray':
+        """Unit-length TF-IDF weights of a text over the vocabulary (words not in it are ignored)."""
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for term, count in document_terms(text).items():
+            column = self._columns.get(term)
+            if column is not None:
+                vector[column] = count * self.idf[column]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def rows(self, keys: List[str]) -> 'np.ndarray':
+        """Row numbers of documents (repeated keys give repeated rows)."""
+        return np.array([self._rows[key] for key in keys], dtype=np.int64)
+
+    def document_frequencies(self, keys: List[str]) -> Dict[str, int]:
+        """Number of the given documents each term occurs in, for terms in at least one."""
+        present = self.counts[self.rows(keys)]
+        frequencies = np.bincount(present.indices, minlength=present.shape[1])
+        return {self.vocabulary[column]: int(frequencies[column]) for column in np.flatnonzero(frequencies)}
+
+    def term_totals(self, keys: List[str]) -> Dict[str, int]:
+        """Occurrences of each term across the given documents, for terms with any."""
+        totals = np.asarray(self.counts[self.rows(keys)].sum(axis=0)).ravel()
+        return {self.vocabulary[column]: int(totals[column]) for column in np.flatnonzero(totals)}
+
+    def overlaps(self, keys: List[str], limit: int = 10) -> Tuple[List[str], List[Tuple[int, int, int, List[str]]]]:
+        """Terms shared by the given documents.
+
+        Returns (terms in every document, most characteristic first, and
+        for each pair (i, j) of positions in keys (i, j, number of shared
+        terms, the limit terms weighing most in both)).
+        """
+        selected = self.weights[self.rows(keys)]
+        present = selected.copy()
+        present.data[:] = 1
+        frequencies = np.asarray(present.sum(axis=0)).ravel()
+
+        # Terms in every document, by their total weight across them
+        in_all = np.flatnonzero(frequencies >= len(keys))
+        totals = np.asarray(selected[:, in_all].sum(axis=0)).ravel()
+        common = [self.vocabulary[column] for column in in_all[np.argsort(-totals, kind='stable')]]
+
+        # Shared term counts for every pair at once
+        shared = present.dot(present.T).toarray()
+
+        # Only terms in two or more documents can be shared; their weights
+        # are few enough to compare densely
+        columns = np.flatnonzero(frequencies >= 2)
+        dense = selected[:, columns].toarray()
+        pairs = []
+        for i in range(len(keys)):
+            for j in range(i + 1, len(keys)):
+                both = dense[i] * dense[j]
+                best = np.argsort(-both, kind='stable')[:min(limit, int(shared[i, j]))]
+                pairs.append((i, j, int(shared[i, j]), [self.vocabulary[column] for column in columns[best]]))
+        return common, pairs
+
+if __name__ == "__main__":
+    # Check against the word-set loops and time both: python src/term_matrix.py [data_dir]
+    from ingest import extract_page
+
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent.parent / "data"
+    texts = {html_file.parent.name: extract_page(html_file, 'book_server')['content']
+             for html_file in sorted(data_dir.glob("*/*.html"))}
+    keys = list(texts)
+
+    start = time.perf_counter()
+    matrix = TermMatrix(texts)
+    print(f"Built {matrix.weights.shape[0]} x {matrix.weights.shape[1]} matrix "
+          f"({matrix.weights.nnz} entries) in {time.perf_counter() - start:.2f}s")
+
+    # The loops rebuild word sets from the text on every call, so that is timed too
+    start = time.perf_counter()
+    word_sets = {key: set(re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())) for key, text in texts.items()}
+    scanned = time.perf_counter() - start
+    start = time.perf_counter()
+    frequencies = matrix.document_frequencies(keys)
+    indexed = time.perf_counter() - start
+    expected = {}
+    for words in word_sets.values():
+        for word in words:
+            expected[word] = expected.get(word, 0) + 1
+    failures = frequencies != expected
+    print(f"document frequencies: matrix {indexed * 1000:.2f} ms, word sets {scanned * 1000:.2f} ms, "
+          f"{'ok' if frequencies == expected else 'MISMATCH'}")
+
+    group = keys[:20]
+    start = time.perf_counter()
+    common, pairs = matrix.overlaps(group)
+    indexed = time.perf_counter() - start
+    start = time.perf_counter()
+    group_sets = {key: set(re.findall(r'\b[a-zA-Z]{4,}\b', texts[key].lower())) for key in group}
+    expected_pairs = [len(group_sets[a] & group_sets[b]) for i, a in enumerate(group) for b in group[i + 1:]]
+    expected_common = set.intersection(*group_sets.values())
+    scanned = time.perf_counter() - start
+    matches = [count for _, _, count, _ in pairs] == expected_pairs and set(common) == expected_common
+    failures |= not matches
+    print(f"overlaps of {len(group)} documents: matrix {indexed * 1000:.2f} ms, "
+          f"word sets {scanned * 1000:.2f} ms, {'ok' if matches else 'MISMATCH'}")
+
+    # A saved matrix must map back identically
+    cache_path = Path(os.environ.get("TMPDIR", "/tmp")) / "term_matrix_check.npz"
+    TermMatrix(texts, cache_path)
+    start = time.perf_counter()
+    mapped = TermMatrix(texts, cache_path)
+    reloaded = (mapped.weights != matrix.weights).nnz == 0 and mapped.vocabulary == matrix.vocabulary
+    failures |= not reloaded
+    print(f"mapped saved matrix in {(time.perf_counter() - start) * 1000:.2f} ms, "
+          f"{'ok' if reloaded else 'MISMATCH'}")
+    cache_path.unlink()
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from pathlib import Path
+from typing import List, Dict, Callable, Optional, Set, Tuple
+
+# "auto" uses inotify where available and polling elsewhere; "poll" forces
+# polling and "0" disables watching altogether
+WATCH_MODE = os.environ.get("MEDIUM_MCP_WATCH", "auto")
+
+# Seconds between scans in polling mode
+POLL_INTERVAL = float(os.environ.get("MEDIUM_MCP_POLL_INTERVAL", "5"))
+
+# Exports write several files per article; wait this long after the last
+# event so a directory is re-extracted once rather than once per file
+DEBOUNCE_SECONDS = 0.5
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+
+ROOT_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+ARTICLE_MASK = IN_CLOSE_WRITE | IN_MODIFY | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+def is_article_directory_name(name: str) -> bool:
+    """Article directories are the visible subdirectories of the data directory."""
+    return not name.startswith('.')
+
+def scan_article_directories(data_dir: Path) -> Dict[str, Tuple]:
+    """Map each article directory to a signature of its HTML files and img/ folder."""
+    signatures = {}
+    try:
+        entries = list(os.scandir(data_dir))
+    except OSError:
+        return signatures
+
+    for entry in entries:
+        if not entry.is_dir() or not is_article_directory_name(entry.name):
+            continue
+        signature = []
+        try:
+            for child in os.scandir(entry.path):
+                if child.name.endswith('.html') or child.name == 'img':
+                    stat = child.stat()
+                    signature.append((child.name, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            continue
+        signatures[entry.name] = tuple(sorted(signature))
+    return signatures
+
+class DataDirectoryWatcher:
+    """Watch the data directory and report which article directories changed.
+
+    Runs on a daemon thread and calls on_change with a list of article
+    directory paths. A path may no longer exist, meaning the article was
+    deleted. The callback runs on the watcher thread, so it can do the
+    (slow) re-extraction itself but must hand cache updates to the event
+    loop.
+    """
+
+    def __init__(self, data_dir: Path, on_change: Callable[[List[Path]], None],
+                 mode: Optional[str] = None, poll_interval: Optional[float] = None):
+        self.data_dir = data_dir
+        self.on_change = on_change
+        self.mode = mode or WATCH_MODE
+        self.poll_interval = POLL_INTERVAL if poll_interval is None else poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> bool:
+        """Start watching; returns False if watching is disabled or impossible."""
+        if self.mode == "0" or not self.data_dir.exists():
+            return False
+
+        run = None
+        if self.mode != "poll" and sys.platform.startswith('linux'):
+            fd = self._init_inotify()
+            if fd is not None:
+                run = lambda: self._run_inotify(fd)
+        if run is None:
+            # Scan before returning, like the inotify watches, so changes
+            # made right after start() are not missed
+            previous = scan_article_directories(self.data_dir)
+            run = lambda: self._run_polling(previous)
+
+        self._thread = threading.Thread(target=run, name="data-dir-watcher", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Ask the watcher thread to exit and wait for it."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _notify(self, names: Set[str]):
+        if not names:
+            return
+        try:
+            self.on_change([self.data_dir / name for name in sorted(names)])
+        except Exception as e:
+            print(f"Error re-indexing {sorted(names)}: {e}", file=sys.stderr)
+
+    def _run_polling(self, previous: Dict[str, Tuple]):
+        while not self._stop.wait(self.poll_interval):
+            current = scan_article_directories(self.data_dir)
+            changed = {name for name, signature in current.items() if previous.get(name) != signature}
+            changed |= previous.keys() - current.keys()
+            previous = current
+            self._notify(changed)
+
+    def _init_inotify(self) -> Optional[int]:
+        libc_name = ctypes.util.find_library('c')
+        try:
+            self._libc = ctypes.CDLL(libc_name or 'libc.so.6', use_errno=True)
+            fd = self._libc.inotify_init1(IN_NONBLOCK)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+
+        self._fd = fd
+        self._watches = {}
+        if self._add_watch(self.data_dir, ROOT_MASK) is None:
+            os.close(fd)
+            return None
+        self._known = set()
+        for name in scan_article_directories(self.data_dir):
+            self._watch_article(name)
+        return fd
+
+    def _add_watch(self, path: Path, mask: int) -> Optional[int]:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            return None
+        self._watches[wd] = path
+        return wd
+
+    def _watch_article(self, name: str):
+        self._known.add(name)
+        self._add_watch(self.data_dir / name, ARTICLE_MASK)
+
+    def _run_inotify(self, fd: int):
+        pending = set()
+        last_event = 0.0
+        try:
+            while not self._stop.is_set():
+                timeout = DEBOUNCE_SECONDS if pending else 1.0
+                readable, _, _ = select.select([fd], [], [], timeout)
+                if readable:
+                    try:
+                        buffer = os.read(fd, 64 * 1024)
+                    except OSError as e:
+                        if e.errno == errno.EAGAIN:
+                            continue
+                        raise
+                    pending |= self._parse_events(buffer)
+                    last_event = time.monotonic()
+                elif pending and time.monotonic() - last_event >= DEBOUNCE_SECONDS:
+                    changed, pending = pending, set()
+                    self._notify(changed)
+        finally:
+            os.close(fd)
+
+    def _parse_events(self, buffer: bytes) -> Set[str]:
+        changed = set()
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped: fall back to checking every directory
+                current = set(scan_article_directories(self.data_dir))
+                for new_name in current - self._known:
+                    self._watch_article(new_name)
+                changed |= self._known | current
+                continue
+
+            path = self._watches.get(wd)
+            if path is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._watches[wd]
+                continue
+
+            if path == self.data_dir:
+                if not name or not is_article_directory_name(name) or not mask & IN_ISDIR:
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_article(name)
+                else:
+                    self._known.discard(name)
+                changed.add(name)
+            else:
+                changed.add(path.name)
+        return changed
@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The servers import their modules as top-level modules from src/
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+# Pages shaped like a Medium export: a post, a short response, an old-style
+# post without the h-entry markup, and one with a description and code
+EXPORT_PAGES = {
+    "Designing-Dashboards-1a2b3c": """<!DOCTYPE html><html><head><meta http-equiv="Content-Type" content="text/html; charset=utf-8">
+<title>Designing Dashboards</title><style>body{margin:0}</style></head><body><article class="h-entry">
+<header><h1 class="p-name">Designing Dashboards</h1></header>
+<section data-field="subtitle" class="p-summary">What a chart should answer &amp; why</section>
+<section data-field="body" class="e-content"><section name="s" class="section section--body"><div class="section-content">
+<h3 class="graf graf--h3 graf--title">Designing Dashboards</h3>
+<p class="graf graf--p">A dashboard is a <strong>conversation</strong> with   the data, not a <em>wall</em> of charts.</p>
+<p class="graf graf--p">Start with the question; then pick the chart.</p>
+<figure><img src="img/chart.png"><figcaption>Monitoring at a glance</figcaption></figure>
+</div></section></section>
+<footer><p>By Author on <time>March 3, 2021</time>.</p></footer></article></body></html>""",
+    "Short-response-4d5e6f": """<!DOCTYPE html><html><head><title>Agreed -- nice point</title></head><body>
+<article class="h-entry"><section data-field="body" class="e-content"><p class="graf graf--p">Agreed — the café analogy works.</p>
+</section></article></body></html>""",
+    "Old-Style-Post-7a8b9c": """<html><head><title>Old Style Post</title>
+<meta name="description" content="A post exported from the old editor"></head><body>
+<div class="postArticle-content"><h1>Old Style Post</h1><h2 class="graf--subtitle">Older markup</h2>
+<p>Workflow notes</p><ul><li>first</li><li>second</li></ul></div></body></html>""",
+    "Code-Heavy-0d1e2f": """<!DOCTYPE html><html><head><title>Code Heavy</title>
+<meta name="description" content="Snippets"></head><body><article class="h-entry">
+<h1 class="p-name">Code Heavy</h1><section class="e-content"><p>Before the code:</p>
+<pre>def f(x):
+    return   x * 2</pre><p>After   the <a href="https://example.com">link</a>.</p></section></article></body></html>""",
+}
+
+@pytest.fixture
+def export_dir(tmp_path: Path) -> Path:
+    """A data directory holding EXPORT_PAGES, one article directory each."""
+    for name, html in EXPORT_PAGES.items():
+        article_dir = tmp_path / name
+        article_dir.mkdir()
+        (article_dir / f"{name}.html").write_text(html, encoding='utf-8')
+    return tmp_path
+
+# Documents whose terms occur in different numbers of documents, so
+# document frequencies (and IDF weights) vary between terms
+SAMPLE_TEXTS = {
+    "dashboards": "Dashboards answer questions. A dashboard chart shows monitoring data and analytics trends.",
+    "monitoring": "Monitoring systems page people. Good monitoring reduces noise; analytics explain the trends.",
+    "research": "User research interviews reveal workflow problems before any design work starts.",
+    "workflow": "Design workflow and research workflow meet in the studio, where design decisions happen.",
+    "ethics": "Design ethics asks who is harmed by a decision, and whether the data was gathered fairly.",
+    "café": "Naïve café sketches: design thinking with coffee, research notes and dashboard doodles.",
+    "empty": "",
+}
+
+@pytest.fixture
+def sample_texts():
+    return dict(SAMPLE_TEXTS)
@@ -0,0 +1,76 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import semantic_index
+from ann_index import IVFIndex, ANN_PROBES, clustered_vectors, exact_search, nearest_centroids
+from semantic_index import SemanticIndex
+from term_matrix import TermMatrix
+
+def queries_near(vectors, count, seed=1):
+    """Stored vectors perturbed so they are not stored vectors themselves."""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.choice(len(vectors), count, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+@pytest.fixture(scope="module")
+def trained():
+    vectors = clustered_vectors(3000, 32)
+    return vectors, IVFIndex.train(vectors)
+
+def test_every_row_is_in_exactly_one_list(trained):
+    vectors, index = trained
+    assert sorted(index.order.tolist()) == list(range(len(vectors)))
+    assert (index.assignments == nearest_centroids(vectors, index.centroids)).all()
+
+def test_search_is_exact_among_the_probed_lists(trained):
+    vectors, index = trained
+    for query in queries_near(vectors, 50):
+        rows, scores = index.search(vectors, query, 10, ANN_PROBES)
+        candidates = index.candidates(query, ANN_PROBES)
+        expected = candidates[exact_search(vectors[candidates], query, 10)]
+        assert set(rows.tolist()) == set(expected.tolist())
+        assert list(scores) == sorted(scores, reverse=True)
+
+def test_probing_every_list_is_exact_search(trained):
+    vectors, index = trained
+    for query in queries_near(vectors, 20):
+        rows, _ = index.search(vectors, query, 10, len(index.centroids))
+        assert set(rows.tolist()) == set(exact_search(vectors, query, 10).tolist())
+
+def test_recall_within_the_default_probe_budget(trained):
+    vectors, index = trained
+    queries = queries_near(vectors, 100)
+    recall = np.mean([len(set(index.search(vectors, query, 10, ANN_PROBES)[0].tolist()) &
+                          set(exact_search(vectors, query, 10).tolist())) / 10 for query in queries])
+    assert recall >= 0.9
+
+def test_assigned_and_removed_rows_keep_lists_consistent():
+    vectors = clustered_vectors(400, 16)
+    index = IVFIndex.train(vectors)
+    extra = clustered_vectors(2, 16, seed=5)
+    index.assign(len(vectors), extra[0])
+    index.assign(3, extra[1])
+    vectors = np.vstack([vectors, extra[:1]])
+    vectors[3] = extra[1]
+    index.remove(0)
+    vectors = vectors[1:]
+    assert (index.assignments == nearest_centroids(vectors, index.centroids)).all()
+    assert sorted(index.order.tolist()) == list(range(len(vectors)))
+    query = vectors[2]  # Was row 3, moved down by the removal
+    assert index.search(vectors, query, 1, len(index.centroids))[0].tolist() == [2]
+
+def test_semantic_index_uses_the_ivf_lists(sample_texts, monkeypatch):
+    texts = {f"{key}-{i}": f"{text} {i}" for i in range(10) for key, text in sample_texts.items() if text}
+    exact = SemanticIndex.build(TermMatrix(texts))
+    monkeypatch.setattr(semantic_index, "ANN_MIN_VECTORS", 10)
+    approximate = SemanticIndex.build(TermMatrix(texts))
+    assert exact.ann is None and approximate.ann is not None
+    # With every list probed the approximate index returns the exact results
+    monkeypatch.setattr(semantic_index, "ANN_PROBES", len(approximate.ann.centroids))
+    for query in ("dashboard monitoring", "design research", "coffee sketches"):
+        expected = exact.search(query, 5)
+        results = approximate.search(query, 5)
+        assert [key for key, _ in results] == [key for key, _ in expected]
+        assert [score for _, score in results] == pytest.approx([score for _, score in expected])
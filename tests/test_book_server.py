@@ -0,0 +1,71 @@
+import asyncio
+import re
+
+import pytest
+
+import book_server
+from book_server import truncate_text
+
+@pytest.fixture
+def chapters(export_dir, monkeypatch):
+    """book_server indexed over the EXPORT_PAGES archive."""
+    monkeypatch.setattr(book_server, "get_data_directory", lambda: export_dir)
+    book_server.build_chapter_index()
+    return export_dir
+
+def get_chapters(**arguments):
+    return asyncio.run(book_server.handle_call_tool("get_chapters", arguments))[0].text
+
+def fetched_ids(text):
+    return re.findall(r'\*\*ID:\*\* `([^`]+)`', text)
+
+def test_truncate_text_by_words():
+    text = "one two  three\nfour five"
+    assert truncate_text(text) == (text, False)
+    assert truncate_text(text, max_words=3) == ("one two  three", True)
+    assert truncate_text(text, max_words=5) == (text, False)
+    assert truncate_text(text, max_words=9) == (text, False)
+
+def test_truncate_text_by_bytes_at_a_word_boundary():
+    text = "café crème brûlée"
+    # "café crème" is 12 bytes; the limit falls inside "brûlée"
+    assert truncate_text(text, max_bytes=15) == ("café crème", True)
+    # A limit inside a multi-byte character never splits it
+    assert truncate_text(text, max_bytes=4) == ("caf", True)
+    assert truncate_text(text, max_bytes=len(text.encode('utf-8'))) == (text, False)
+    # The tighter of the two limits wins
+    assert truncate_text(text, max_words=1, max_bytes=100) == ("café", True)
+    assert truncate_text(text, max_words=3, max_bytes=13) == ("café crème", True)
+
+def test_ids_and_names_resolve_in_order_without_repeats(chapters):
+    text = get_chapters(chapter_ids=["Old-Style-Post-7a8b9c", "designing dashboards", "Designing-Dashboards-1a2b3c",
+                                     "code heavy"])
+    assert text.startswith("Fetched 3 chapters:")
+    assert fetched_ids(text) == ["Old-Style-Post-7a8b9c", "Designing-Dashboards-1a2b3c", "Code-Heavy-0d1e2f"]
+    assert "*Note: Used fuzzy matching for: 'designing dashboards' → 'Designing-Dashboards-1a2b3c', " \
+           "'code heavy' → 'Code-Heavy-0d1e2f'*" in text
+    assert "Not found" not in text
+
+def test_unknown_names_are_reported(chapters):
+    text = get_chapters(chapter_ids=["code heavy", "nonexistent chapter"])
+    assert text.startswith("Fetched 1 chapter:")
+    assert "**Not found:** nonexistent chapter" in text
+    assert fetched_ids(text) == ["Code-Heavy-0d1e2f"]
+
+    text = get_chapters(chapter_ids=["Dashbords design", "zzzz"])
+    assert text.startswith("Error: Could not find chapters: Dashbords design, zzzz")
+    assert "Suggestions for 'Dashbords design':\n- **Designing Dashboards** (ID: `Designing-Dashboards-1a2b3c`)" in text
+    assert get_chapters(chapter_ids=[]) == "Error: chapter_ids is required"
+
+def test_content_is_truncated_per_chapter(chapters):
+    full = get_chapters(chapter_ids=["Designing-Dashboards-1a2b3c"], max_words=0)
+    assert "Truncated" not in full
+    text = get_chapters(chapter_ids=["Designing-Dashboards-1a2b3c", "Old-Style-Post-7a8b9c"], max_words=5)
+    contents = re.findall(r'## Content\n\n(.*?)\n\n', text, re.DOTALL)
+    assert [len(content.split()) for content in contents] == [5, 5]
+    assert contents[0] == "Designing Dashboards\nWhat a chart"
+    assert "*Truncated at 5 of 42 words; use `get_chapter_content` for the full text.*" in text
+
+    text = get_chapters(chapter_ids=["Code-Heavy-0d1e2f"], max_bytes=20)
+    content = re.search(r'## Content\n\n(.*?)\n\n', text, re.DOTALL).group(1)
+    assert len(content.encode('utf-8')) <= 20 and "*Truncated at" in text
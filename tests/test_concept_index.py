@@ -0,0 +1,41 @@
+from concept_index import ConceptIndex, related_by_scanning
+
+CHAPTERS = {
+    "dashboards": ["Analytics", "Visualization", "Metrics"],
+    "monitoring": ["metrics", "Alerting", "Analytics"],
+    "workflow": ["Automation", "Collaboration"],
+    "research": ["User Research", "Analytics", "Collaboration", "Metrics"],
+    "ethics": ["Privacy"],
+    "empty": [],
+}
+
+def build(chapters):
+    index = ConceptIndex()
+    for chapter_id, concepts in chapters.items():
+        index.add(chapter_id, concepts)
+    return index
+
+QUERIES = [(concepts, chapter_id) for chapter_id, concepts in CHAPTERS.items()] + \
+    [(["ANALYTICS", "no such concept"], None), ([], None), (["Metrics", "Collaboration"], "research")]
+
+def test_related_matches_scanning():
+    index = build(CHAPTERS)
+    for concepts, exclude_id in QUERIES:
+        expected = related_by_scanning(CHAPTERS, concepts, exclude_id)
+        assert [(chapter_id, count) for chapter_id, count, _ in index.related(concepts, exclude_id)] == expected
+        assert [(chapter_id, count) for chapter_id, count, _ in index.related(concepts, exclude_id, 2)] == expected[:2]
+
+def test_shared_concepts_and_allowed():
+    index = build(CHAPTERS)
+    related = index.related(["Metrics", "Analytics"], allowed={"monitoring", "workflow"})
+    assert related == [("monitoring", 2, ["analytics", "metrics"])]
+
+def test_replacing_and_removing_keep_chapter_order():
+    index = build(CHAPTERS)
+    index.add("dashboards", ["Privacy"])
+    index.remove("monitoring")
+    index.remove("not indexed")
+    index.add("monitoring", ["Privacy"])
+    assert [chapter_id for chapter_id, _, _ in index.related(["privacy"])] == ["dashboards", "ethics", "monitoring"]
+    assert "visualization" not in [index.concepts(1 << concept_id)[0] for concept_id in index.postings]
+    assert len(index) == len(CHAPTERS)
@@ -0,0 +1,139 @@
+import sys
+
+import book_server
+import server
+from content_store import ContentLRU, TextStore
+
+def counting_loader(texts):
+    loads = []
+
+    def load(key):
+        loads.append(key)
+        return texts[key]
+
+    return load, loads
+
+def test_lru_stays_within_its_byte_budget_and_reloads_evicted_bodies(sample_texts):
+    load, loads = counting_loader(sample_texts)
+    budget = 2 * max(sys.getsizeof(text) for text in sample_texts.values())
+    cache = ContentLRU(load, budget)
+    for key in list(sample_texts) * 2:
+        assert cache.get(key) == sample_texts[key]
+        assert cache.current_bytes <= budget
+        assert cache.current_bytes == sum(sys.getsizeof(text) for text in cache._entries.values())
+    assert 2 <= len(cache) < len(sample_texts)
+    # A cyclic scan larger than the cache misses every time
+    assert loads == list(sample_texts) * 2
+    assert cache.hits == 0
+
+def test_lru_evicts_the_least_recently_used_body(sample_texts):
+    load, loads = counting_loader(sample_texts)
+    cache = ContentLRU(load, sys.getsizeof(sample_texts["research"]) + sys.getsizeof(sample_texts["ethics"]))
+    cache.get("research")
+    cache.get("ethics")
+    cache.get("research")  # Now "ethics" is the least recently used
+    cache.get("workflow")
+    assert "research" in cache._entries and "ethics" not in cache._entries
+    loads.clear()
+    assert cache.get("ethics") == sample_texts["ethics"]
+    assert loads == ["ethics"]
+
+def test_lru_never_keeps_a_body_larger_than_the_budget(sample_texts):
+    load, loads = counting_loader(sample_texts)
+    cache = ContentLRU(load, sys.getsizeof(sample_texts["dashboards"]) - 1)
+    assert cache.get("dashboards") == sample_texts["dashboards"]
+    assert cache.get("dashboards") == sample_texts["dashboards"]
+    assert loads == ["dashboards", "dashboards"] and len(cache) == 0 and cache.current_bytes == 0
+
+def test_lru_invalidate(sample_texts):
+    load, loads = counting_loader(sample_texts)
+    cache = ContentLRU(load, 10 ** 6)
+    for key in sample_texts:
+        cache.get(key)
+    cache.invalidate("research")
+    cache.get("research")
+    assert loads.count("research") == 2
+    cache.invalidate()
+    assert len(cache) == 0 and cache.current_bytes == 0
+
+def test_lazy_chapter_bodies_reload_from_the_archive(export_dir, monkeypatch):
+    monkeypatch.setattr(book_server, "get_data_directory", lambda: export_dir)
+    book_server.build_chapter_index()
+    bodies = {chapter_id: book_server.get_chapter_text(chapter_id) for chapter_id in book_server.chapter_cache}
+
+    budget = max(sys.getsizeof(body) for body in bodies.values())
+    monkeypatch.setattr(book_server, "CONTENT_CACHE_BYTES", budget)
+    monkeypatch.setattr(book_server, "content_lru", ContentLRU(book_server.load_chapter_body, budget))
+    book_server.build_chapter_index()
+    assert all('content' not in chapter for chapter in book_server.chapter_cache.values())
+    for _ in range(2):
+        for chapter_id, body in bodies.items():
+            assert book_server.get_chapter_text(chapter_id) == body
+            assert book_server.content_lru.current_bytes <= budget
+    assert book_server.content_lru.misses > len(bodies)
+
+def scan_counts(texts, needle):
+    return {key: text.lower().count(needle) for key, text in texts.items() if needle in text.lower()}
+
+NEEDLES = ["design", "café", "naïve", "a", "dashboard d", "trends.user", "research workflow", "zzz"]
+
+def test_text_store_round_trips_bodies(tmp_path, sample_texts):
+    store = TextStore.build(tmp_path / "texts.bin", sample_texts)
+    try:
+        assert all(key in store for key in sample_texts)
+        for key, text in sample_texts.items():
+            assert store.get(key) == text
+            assert store.get_lower(key) == text.lower()
+        reopened = TextStore(tmp_path / "texts.bin")
+        assert {key: reopened.get(key) for key in sample_texts} == sample_texts
+        reopened.close()
+    finally:
+        store.close()
+
+def test_text_store_counts_match_a_plain_scan(tmp_path, sample_texts):
+    store = TextStore.build(tmp_path / "texts.bin", sample_texts)
+    try:
+        for needle in NEEDLES:
+            # Matches never span two bodies ("trends." ends one, "user" starts the next)
+            assert store.count_occurrences(needle) == scan_counts(sample_texts, needle), needle
+        assert store.count_occurrences("") == {}
+
+        store.discard("workflow")
+        store.discard("missing")
+        assert "workflow" not in store
+        del sample_texts["workflow"]
+        for needle in NEEDLES:
+            assert store.count_occurrences(needle) == scan_counts(sample_texts, needle), needle
+    finally:
+        store.close()
+
+def test_text_store_stays_consistent_through_article_updates(export_dir, monkeypatch):
+    monkeypatch.setattr(server, "TEXT_STORE_ENABLED", True)
+    monkeypatch.setattr(server, "get_data_directory", lambda: export_dir)
+    server.build_article_index()
+    assert server.text_store is not None
+    bodies = {article_id: server.extract_article_content(html_file)['content']
+              for html_file in export_dir.glob("*/*.html") for article_id in [html_file.parent.name]}
+    assert {article_id: server.get_article_text(article_id) for article_id in server.article_cache} == bodies
+
+    edited = export_dir / "Code-Heavy-0d1e2f"
+    (edited / "Code-Heavy-0d1e2f.html").write_text(
+        '<html><head><title>Code Heavy</title></head><body><p>The code is gone; the design stays.</p></body></html>',
+        encoding='utf-8')
+    deleted = export_dir / "Old-Style-Post-7a8b9c"
+    for html_file in deleted.iterdir():
+        html_file.unlink()
+    deleted.rmdir()
+    added = export_dir / "New-Post-aaa111"
+    added.mkdir()
+    (added / "New-Post-aaa111.html").write_text(
+        '<html><head><title>New Post</title></head><body><p>Design the café dashboard.</p></body></html>',
+        encoding='utf-8')
+    server.apply_article_updates(*server.extract_article_updates([edited, deleted, added]))
+
+    bodies = {article_id: server.extract_article_content(html_file)['content']
+              for html_file in export_dir.glob("*/*.html") for article_id in [html_file.parent.name]}
+    assert {article_id: server.get_article_text(article_id) for article_id in server.article_cache} == bodies
+    for needle in ["the", "code", "café", "design", "dashboard"]:
+        content_counts, _ = server.count_substring_matches(needle)
+        assert {key: count for key, count in content_counts.items() if count} == scan_counts(bodies, needle)
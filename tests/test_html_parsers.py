@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from html_parsers import compare_backends, parse_with_bs4, PARSER_BACKENDS
+from ingest import PARSE_PROFILES
+
+def html_files(export_dir):
+    return sorted(export_dir.glob("*/*.html"))
+
+@pytest.mark.parametrize("backend,mode", [("html.parser", "targeted"), ("lxml", "full"), ("lxml", "targeted")])
+def test_backends_match_full_html_parser(export_dir, backend, mode):
+    if backend == "lxml":
+        pytest.importorskip("lxml")
+    assert compare_backends(html_files(export_dir), PARSE_PROFILES, backend, mode) == []
+
+def test_lxml_extracts_same_fields_as_html_parser(export_dir):
+    pytest.importorskip("lxml")
+    for html_file in html_files(export_dir):
+        content = html_file.read_text(encoding='utf-8')
+        expected = parse_with_bs4(content, PARSE_PROFILES)
+        actual = PARSER_BACKENDS['lxml'](content, PARSE_PROFILES, 'full')
+        for profile in PARSE_PROFILES:
+            for field in ('title', 'text', 'subtitle', 'description', 'has_description'):
+                assert actual[profile][field] == expected[profile][field], (html_file.name, profile, field)
+
+def test_html_parser_extracts_export_fields(export_dir):
+    content = (export_dir / "Designing-Dashboards-1a2b3c" / "Designing-Dashboards-1a2b3c.html").read_text()
+    parsed = parse_with_bs4(content, PARSE_PROFILES)['book_server']
+    assert parsed['title'] == "Designing Dashboards"
+    assert parsed['subtitle'] == "What a chart should answer & why"
+    assert "conversation" in parsed['text'] and "Monitoring at a glance" in parsed['text']
+
+    content = (export_dir / "Old-Style-Post-7a8b9c" / "Old-Style-Post-7a8b9c.html").read_text()
+    parsed = parse_with_bs4(content, PARSE_PROFILES)['server']
+    assert parsed['title'] == "Old Style Post"
+    assert parsed['has_description'] and parsed['description'] == "A post exported from the old editor"
+
+def test_unknown_backend_setting_falls_back_to_html_parser(export_dir):
+    # The setting is read at import, so check it in a fresh interpreter
+    html_file = html_files(export_dir)[0]
+    script = ("import sys; sys.path.insert(0, sys.argv[1]); from pathlib import Path; from ingest import extract_page; "
+              "print(extract_page(Path(sys.argv[2]), 'server')['title'])")
+    environment = dict(os.environ, MEDIUM_MCP_PARSER="bogus", MEDIUM_MCP_CACHE_DIR=str(export_dir / ".cache"))
+    result = subprocess.run([sys.executable, "-c", script, str(Path(__file__).parent.parent / "src"), str(html_file)],
+                            env=environment, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "Code Heavy"
+    assert "Unknown MEDIUM_MCP_PARSER 'bogus'" in result.stderr
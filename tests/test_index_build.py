@@ -0,0 +1,111 @@
+import asyncio
+import threading
+
+import server
+from ingest import IndexBuild, get_snapshot_path
+
+def empty_corpus_build(data_dir):
+    """An IndexBuild whose loader writes a snapshot like the servers' loaders and finds nothing."""
+    loads = []
+
+    def load(progress):
+        loads.append(1)
+        snapshot_path = get_snapshot_path(data_dir, 'server')
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        snapshot_path.write_text('{}', encoding='utf-8')
+        return {}
+
+    return IndexBuild(load, lambda index: None, lambda: True, lambda: data_dir), loads
+
+def test_empty_corpus_is_not_reloaded(tmp_path):
+    build, loads = empty_corpus_build(tmp_path)
+
+    async def run():
+        await build.start(asyncio.get_running_loop())
+        for _ in range(4):
+            assert await build.ensure(5)
+
+    asyncio.run(run())
+    assert len(loads) == 1
+
+def test_new_article_directory_triggers_rebuild(tmp_path):
+    build, loads = empty_corpus_build(tmp_path)
+
+    async def run():
+        await build.start(asyncio.get_running_loop())
+        (tmp_path / "New-Article-1a2b3c").mkdir()
+        assert await build.ensure(5)
+        assert await build.ensure(5)
+
+    asyncio.run(run())
+    assert len(loads) == 2
+
+def blocking_build(data_dir):
+    """An IndexBuild whose loader reports progress, then waits for release to be set."""
+    release = threading.Event()
+    loads = []
+    installed = []
+
+    def load(progress):
+        loads.append(1)
+        progress(2, 5)
+        assert release.wait(5)
+        return ["index"]
+
+    build = IndexBuild(load, installed.append, lambda: not installed, lambda: data_dir)
+    return build, release, loads, installed
+
+def test_concurrent_callers_share_one_build(tmp_path):
+    build, release, loads, installed = blocking_build(tmp_path)
+
+    async def run():
+        asyncio.get_running_loop().call_later(0.1, release.set)
+        return await asyncio.gather(*(build.ensure(5) for _ in range(4)))
+
+    assert asyncio.run(run()) == [True] * 4
+    assert loads == [1] and installed == [["index"]]
+
+def test_callers_time_out_with_progress_while_the_build_runs(tmp_path):
+    build, release, loads, installed = blocking_build(tmp_path)
+
+    async def run():
+        try:
+            assert not await build.ensure(0.1)
+            assert build.running and not installed
+            assert build.status("articles") == \
+                "The index is still being built (indexing 2/5 articles). Try again in a moment."
+            # A timed-out caller does not cancel the build
+            release.set()
+            assert await build.ensure(5)
+        finally:
+            release.set()
+
+    asyncio.run(run())
+    assert loads == [1] and installed == [["index"]]
+
+def test_tool_call_during_the_build_gets_the_progress_reply(export_dir, monkeypatch):
+    release = threading.Event()
+
+    def slow_load(progress):
+        assert release.wait(5)
+        return server.load_article_index(progress)
+
+    monkeypatch.setattr(server, "get_data_directory", lambda: export_dir)
+    monkeypatch.setattr(server, "article_index", [])
+    monkeypatch.setattr(server, "INDEX_WAIT_SECONDS", 0.1)
+    monkeypatch.setattr(server, "index_build", IndexBuild(slow_load, server.install_article_index,
+                                                          lambda: not server.article_index,
+                                                          lambda: export_dir))
+
+    async def run():
+        try:
+            first = await server.handle_call_tool("list_articles", {})
+            release.set()
+            await server.index_build.wait(5)
+            return first[0].text, (await server.handle_call_tool("list_articles", {}))[0].text
+        finally:
+            release.set()
+
+    during, after = asyncio.run(run())
+    assert during == "The index is still being built (scanning the data directory). Try again in a moment."
+    assert after.startswith("Available Medium Articles (4 of 4 total)")
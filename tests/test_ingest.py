@@ -0,0 +1,89 @@
+import os
+
+import ingest
+from ingest import extract_many, extract_page, is_parse_cached
+
+def export_files(export_dir):
+    return sorted(export_dir.glob("*/*.html"))
+
+def extract(html_file):
+    return extract_page(html_file, 'server')
+
+def test_pool_parses_and_extracts_in_order(export_dir, monkeypatch):
+    monkeypatch.setattr(ingest, "PARALLEL_MIN_FILES", 2)
+    html_files = export_files(export_dir)
+    # The extract function itself never goes to the workers, so it need not be importable
+    parallel = extract_many(html_files, lambda html_file: extract(html_file), workers=2)
+    assert all(is_parse_cached(html_file) for html_file in html_files)
+    assert parallel == [extract(html_file) for html_file in html_files]
+    assert not ingest._preparsed
+
+def test_parse_cache_hits_are_not_sent_to_the_pool(export_dir, monkeypatch):
+    html_files = export_files(export_dir)
+    for html_file in html_files:
+        extract(html_file)
+    monkeypatch.setattr(ingest, "PARALLEL_MIN_FILES", 2)
+    monkeypatch.setattr(ingest, "ProcessPoolExecutor", None)  # Fails if a pool is started
+    progress = []
+    results = extract_many(html_files, extract, workers=2, progress=lambda done, total: progress.append(done))
+    assert [result['title'] for result in results] == [extract(html_file)['title'] for html_file in html_files]
+    assert progress == list(range(1, len(html_files) + 1))
+
+def parse_cache_rows(export_dir):
+    return ingest.get_parse_cache(export_dir).execute("SELECT COUNT(*) FROM parsed").fetchone()[0]
+
+def test_full_build_prunes_parses_of_edited_and_deleted_pages(export_dir):
+    snapshot_path = ingest.get_snapshot_path(export_dir, 'server')
+    html_files = export_files(export_dir)
+    ingest.extract_with_snapshot(html_files, extract, snapshot_path)
+    assert parse_cache_rows(export_dir) == len(html_files)
+
+    for version in range(3):
+        html_files[0].write_text(f"<html><head><title>Draft {version}</title></head><body>v{version}</body></html>")
+        ingest.extract_with_snapshot(html_files, extract, snapshot_path)
+    html_files[1].unlink()
+    html_files = export_files(export_dir)
+    results, _ = ingest.extract_with_snapshot(html_files, extract, snapshot_path)
+    assert results[0]['title'] == "Draft 2"
+    assert parse_cache_rows(export_dir) == len(html_files)
+
+def test_snapshot_reuses_unchanged_pages_and_re_extracts_changed_ones(export_dir):
+    snapshot_path = ingest.get_snapshot_path(export_dir, 'server')
+    extracted = []
+
+    def recording_extract(html_file):
+        extracted.append(html_file.parent.name)
+        return extract(html_file)
+
+    html_files = export_files(export_dir)
+    first, reused = ingest.extract_with_snapshot(html_files, recording_extract, snapshot_path)
+    assert reused == 0 and len(extracted) == len(html_files)
+
+    extracted.clear()
+    second, reused = ingest.extract_with_snapshot(html_files, recording_extract, snapshot_path)
+    assert reused == len(html_files) and extracted == [] and second == first
+
+    edited, deleted, with_images, unchanged = html_files
+    edited.write_text("<html><head><title>Edited</title></head><body>New text</body></html>", encoding='utf-8')
+    os.utime(edited, ns=(1, 1))  # Same-second edits must not depend on mtime resolution
+    for html_file in deleted.parent.iterdir():
+        html_file.unlink()
+    deleted.parent.rmdir()
+    (with_images.parent / 'img').mkdir()
+    (with_images.parent / 'img' / 'figure.png').write_bytes(b'png')
+
+    extracted.clear()
+    html_files = export_files(export_dir)
+    results, reused = ingest.extract_with_snapshot(html_files, recording_extract, snapshot_path)
+    assert sorted(extracted) == sorted([edited.parent.name, with_images.parent.name])
+    assert reused == 1
+    assert [result['title'] for result in results] == ["Edited", first[2]['title'], first[3]['title']]
+    assert results[1]['has_images'] and not first[2]['has_images']
+    assert results[2] == first[3]
+    assert set(ingest.load_snapshot(snapshot_path)) == {str(html_file) for html_file in html_files}
+
+    # Changing an existing img/ directory counts as a change too
+    os.utime(with_images.parent / 'img', ns=(2, 2))
+    extracted.clear()
+    ingest.extract_with_snapshot(html_files, recording_extract, snapshot_path)
+    assert extracted == [with_images.parent.name]
@@ -0,0 +1,92 @@
+import pytest
+
+from name_index import NameIndex, SuffixList, resolve_by_scanning, suggest_by_scanning
+
+TITLES = {
+    "Designing-Dashboards-1a2b3c": "Designing Dashboards",
+    "Monitoring_vs_Analytics-4d5e6f": "Monitoring vs. Analytics",
+    "UX-7a8b9c": "UX",
+    "The-Analytic-Workflow-0d1e2f": "The Analytic Workflow",
+    "Designing-Dashboards-2-3a4b5c": "Designing Dashboards",
+    "Window-Seat-98c38b5e3a3": "Window Seat",
+}
+
+NAMES = ["Designing-Dashboards-1a2b3c", "designing dashboards", "DASHBOARDS", "analytic", "the ux chapter",
+         "vs analytics", "monitoring vs", "monitoring_vs", "window seat notes", "seat-98c", "2 3a4b",
+         "workflow", "ux", "u", "zzzz", "", "  "]
+
+def assert_resolves_like_scanning(index, titles):
+    for name in NAMES + list(titles) + list(titles.values()):
+        assert index.resolve(name) == resolve_by_scanning(titles, name), name
+
+def test_resolve_matches_scanning():
+    assert_resolves_like_scanning(NameIndex(TITLES), TITLES)
+
+def test_updates_match_a_fresh_build():
+    index = NameIndex(TITLES)
+    titles = dict(TITLES)
+    changes = [("UX-7a8b9c", "User Experience"), ("Designing-Dashboards-1a2b3c", None),
+               ("New-Chapter-5e6f7a", "Designing Dashboards"), ("Window-Seat-98c38b5e3a3", "Window Seat"),
+               ("Designing-Dashboards-1a2b3c", "Designing Dashboards Again"), ("Not-Indexed", None)]
+    for chapter_id, title in changes:
+        # Mirror chapter_cache: replaced chapters keep their place, added ones go last
+        if title is None:
+            index.remove(chapter_id)
+            titles.pop(chapter_id, None)
+        else:
+            index.add(chapter_id, title)
+            titles[chapter_id] = title
+        assert_resolves_like_scanning(index, titles)
+    assert index.resolve("designing dashboards") == "Designing-Dashboards-2-3a4b5c"
+
+def test_suffix_list_add_and_remove_keep_suffixes_sorted():
+    strings = {0: "banana", 1: "bandana", 2: "an"}
+    suffixes = SuffixList(strings)
+    suffixes.add(3, "cabana")
+    suffixes.remove(1)
+    suffixes.remove(7)
+    expected = sorted(string[start:] for string in ("banana", "an", "cabana") for start in range(len(string)))
+    assert [suffixes._strings[rank][start:] for rank, start in zip(suffixes._ranks, suffixes._starts)] == expected
+    assert suffixes.first_containing("ana") == 0
+    assert suffixes.first_containing("cab") == 3
+    assert suffixes.first_containing("dan") is None
+
+def misspell(name):
+    """Swap the third and fourth letters of each word longer than four letters."""
+    return ' '.join(word[:2] + word[3] + word[2] + word[4:] if len(word) > 4 else word for word in name.split())
+
+def assert_suggests_like_scanning(index, titles):
+    for name in NAMES + list(titles) + list(titles.values()):
+        for search_name in (name, misspell(name)):
+            suggested = index.suggest(search_name, 3)
+            scanned = suggest_by_scanning(titles, search_name, 3)
+            assert [key for key, _ in suggested] == [key for key, _ in scanned], search_name
+            # The two sums round differently
+            assert [score for _, score in suggested] == pytest.approx([score for _, score in scanned]), search_name
+
+def test_suggestions_match_scanning():
+    assert_suggests_like_scanning(NameIndex(TITLES), TITLES)
+
+def test_suggestions_for_misspelled_names():
+    index = NameIndex(TITLES)
+    # One edit in each ten-letter word: 1 - 1/10 each, both title words matched
+    assert index.suggest("Desigining Dashbords", 2) == pytest.approx([("Designing-Dashboards-1a2b3c", 0.9),
+                                                                      ("Designing-Dashboards-2-3a4b5c", 0.9)])
+    # "analitic" is also two edits from "analytics"
+    assert [key for key, _ in index.suggest("analitic workflw", 5)] == ["The-Analytic-Workflow-0d1e2f",
+                                                                        "Monitoring_vs_Analytics-4d5e6f"]
+    # Short words tolerate no edits, and nothing is suggested without a close word
+    assert index.suggest("xu", 5) == []
+    assert index.suggest("zzzz", 5) == []
+    assert index.suggest("", 5) == []
+
+def test_suggestions_follow_updates():
+    index = NameIndex(TITLES)
+    titles = dict(TITLES)
+    index.add("UX-7a8b9c", "User Experience Research")
+    titles["UX-7a8b9c"] = "User Experience Research"
+    index.remove("The-Analytic-Workflow-0d1e2f")
+    del titles["The-Analytic-Workflow-0d1e2f"]
+    assert [key for key, _ in index.suggest("experiense", 5)] == ["UX-7a8b9c"]
+    assert [key for key, _ in index.suggest("analitic workflw", 5)] == ["Monitoring_vs_Analytics-4d5e6f"]
+    assert_suggests_like_scanning(index, titles)
@@ -0,0 +1,123 @@
+import pytest
+
+from query_language import parse_query, positive_terms, QueryEvaluator, MetadataIndex, QuerySyntaxError
+from search_index import InvertedIndex, add_to_field_indexes
+
+def test_parse_words_phrases_and_fields():
+    assert parse_query('design "design system" title:metrics') == ('and', [
+        ('match', None, 'design', False),
+        ('match', None, 'design system', True),
+        ('match', 'title', 'metrics', False)])
+    assert parse_query('Status:Finished') == ('match', 'status', 'Finished', False)
+
+def test_parse_precedence():
+    # NOT binds tighter than AND, which binds tighter than OR
+    assert parse_query('a b OR c') == ('or', [('and', [('match', None, 'a', False), ('match', None, 'b', False)]),
+                                              ('match', None, 'c', False)])
+    assert parse_query('a AND NOT b OR c') == parse_query('(a -b) OR c')
+    assert parse_query('a (b OR c)') == ('and', [('match', None, 'a', False),
+                                                 ('or', [('match', None, 'b', False), ('match', None, 'c', False)])])
+    assert parse_query('NOT NOT a') == ('not', ('not', ('match', None, 'a', False)))
+
+def test_lowercase_operators_are_words():
+    assert parse_query('design and or') == ('and', [('match', None, 'design', False),
+                                                    ('match', None, 'and', False),
+                                                    ('match', None, 'or', False)])
+
+def test_parse_ranges():
+    inf = float('inf')
+    assert parse_query('words:>2000') == ('range', 'words', 2001.0, inf)
+    assert parse_query('words:<=500') == ('range', 'words', -inf, 500.0)
+    assert parse_query('words:1000..2000') == ('range', 'words', 1000.0, 2000.0)
+    assert parse_query('words:1500') == ('range', 'words', 1500.0, 1500.0)
+
+@pytest.mark.parametrize('query', ['', '   ', '"unbalanced', '(a OR b', 'a)', 'a OR', 'NOT', 'title:',
+                                   'title:(a)', 'words:lots', 'words:>=1..2'])
+def test_syntax_errors(query):
+    with pytest.raises(QuerySyntaxError):
+        parse_query(query)
+
+def test_positive_terms_skip_negated_and_metadata_matches():
+    assert positive_terms(parse_query('design title:metrics -draft status:finished words:>10')) == \
+        ['design', 'metrics']
+
+RECORDS = {
+    'a': {'title': 'Design Systems', 'subtitle': 'Tokens and components', 'status': 'finished',
+          'design_concepts': ['Design Systems', 'Accessibility'], 'word_count': 1200},
+    'b': {'title': 'Research Notes', 'subtitle': 'Interviews', 'status': 'draft',
+          'design_concepts': ['User Research'], 'word_count': 300},
+    'c': {'title': 'Dashboard Metrics', 'subtitle': 'Design for analytics', 'status': 'finished',
+          'design_concepts': ['Data Visualization'], 'word_count': 2500},
+}
+BODIES = {
+    'a': 'A design system is shared by every team.',
+    'b': 'Interviews shape the system design.',
+    'c': 'Metrics dashboards need a design system too.',
+}
+
+def make_evaluator(records=RECORDS):
+    text_index = InvertedIndex()
+    field_indexes = {'title': InvertedIndex(), 'subtitle': InvertedIndex()}
+    metadata_index = MetadataIndex(['status', 'concept', 'words'])
+    for doc_id, record in records.items():
+        text_index.add(doc_id, record['title'], BODIES[doc_id])
+        add_to_field_indexes(field_indexes, doc_id, record)
+        metadata_index.add(doc_id, record)
+    return QueryEvaluator(text_index, field_indexes, metadata_index, records,
+                          lambda doc_id: (records[doc_id]['title'], BODIES[doc_id]))
+
+def evaluate(query, evaluator=None):
+    return (evaluator or make_evaluator()).evaluate(parse_query(query))
+
+def test_text_terms_and_phrases():
+    assert evaluate('design') == {'a', 'b', 'c'}
+    assert evaluate('"design system"') == {'a', 'c'}
+    assert evaluate('design-system') == {'a', 'c'}
+    assert evaluate('design -metrics') == {'a', 'b'}
+    assert evaluate('interviews OR dashboards') == {'b', 'c'}
+
+def test_text_fields_use_field_postings():
+    assert evaluate('title:design') == {'a'}
+    assert evaluate('subtitle:design') == {'c'}
+    assert evaluate('subtitle:"design for"') == {'c'}
+    assert evaluate('title:"systems design"') == set()
+
+def test_metadata_fields():
+    assert evaluate('status:FINISHED') == {'a', 'c'}
+    assert evaluate('concept:research') == {'b'}
+    assert evaluate('concept:"design sys"') == {'a'}
+    assert evaluate('words:>=1200') == {'a', 'c'}
+    assert evaluate('words:<1200') == {'b'}
+    assert evaluate('words:300..1200') == {'a', 'b'}
+    assert evaluate('design status:finished -concept:visualization') == {'a'}
+
+def test_unknown_field_is_a_query_error():
+    with pytest.raises(QuerySyntaxError, match="Unknown field 'tag:'"):
+        evaluate('tag:design')
+    evaluator = QueryEvaluator(InvertedIndex(), {'title': InvertedIndex()}, MetadataIndex(['words']), {},
+                               lambda doc_id: ('', ''))
+    with pytest.raises(QuerySyntaxError, match='available: title, words'):
+        evaluate('status:finished', evaluator)
+
+def test_metadata_index_follows_updates():
+    records = {doc_id: dict(record) for doc_id, record in RECORDS.items()}
+    evaluator = make_evaluator(records)
+    records['b'] = dict(records['b'], status='finished', design_concepts=['Accessibility'], word_count=2500)
+    evaluator.metadata_index.add('b', records['b'])
+    assert evaluate('status:finished', evaluator) == {'a', 'b', 'c'}
+    assert evaluate('concept:research', evaluator) == set()
+    assert evaluate('concept:accessibility', evaluator) == {'a', 'b'}
+    assert evaluate('words:2500', evaluator) == {'b', 'c'}
+    evaluator.metadata_index.remove('c')
+    evaluator.metadata_index.remove('missing')
+    assert evaluate('words:>1000', evaluator) == {'a', 'b'}
+    assert evaluate('concept:visualization', evaluator) == set()
+
+def test_minus_negates_fields_phrases_and_groups():
+    assert parse_query('a -status:draft') == ('and', [('match', None, 'a', False),
+                                                      ('not', ('match', 'status', 'draft', False))])
+    assert parse_query('-"design system"') == ('not', ('match', None, 'design system', True))
+    assert parse_query('-(a OR b)') == ('not', ('or', [('match', None, 'a', False), ('match', None, 'b', False)]))
+    assert parse_query('user-centred - x') == ('and', [('match', None, 'user-centred', False),
+                                                       ('match', None, '-', False),
+                                                       ('match', None, 'x', False)])
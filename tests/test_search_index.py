@@ -0,0 +1,174 @@
+import base64
+
+import pytest
+
+from search_index import (InvertedIndex, word_snippet, top_scores, score_key, query_fingerprint, encode_cursor,
+                          decode_cursor, CursorError, edit_distance_within, max_edit_distance, SNIPPET_WORDS,
+                          TITLE_WEIGHT)
+
+def test_snippet_highlights_query_words_in_original_case():
+    text = "Dashboards answer questions. A Dashboard chart shows monitoring data."
+    assert word_snippet(text, "dashboard monitoring") == \
+        "Dashboards answer questions. A **Dashboard** chart shows **monitoring** data..."
+
+def test_snippet_picks_the_window_with_most_query_words():
+    filler = ' '.join(f"word{i}" for i in range(100))
+    text = f"design {filler} design research here {filler}"
+    snippet = word_snippet(text, "design research")
+    assert snippet.startswith("...") and snippet.endswith("...")
+    assert "**design** **research**" in snippet
+    assert len(snippet.split()) == SNIPPET_WORDS
+
+def test_snippet_without_matches_is_empty():
+    assert word_snippet("Nothing to see here.", "dashboard") == ""
+    assert word_snippet("", "dashboard") == ""
+
+DOCUMENTS = {
+    "a": ("Design Systems", "A design system is a product. Systems design differs."),
+    "b": ("Research", "Design research and system design; the design system grows."),
+    "c": ("Other", "Nothing in common here except design."),
+}
+
+def build_index():
+    index = InvertedIndex()
+    for doc_id, (title, body) in DOCUMENTS.items():
+        index.add(doc_id, title, body)
+    return index
+
+def test_phrase_counts_consecutive_words_only():
+    index = build_index()
+    assert index.phrase_counts("design system", DOCUMENTS.__getitem__) == {"a": 1, "b": 1}
+    assert index.phrase_counts("system design", DOCUMENTS.__getitem__) == {"b": 1}
+    assert index.phrase_counts("absent words", DOCUMENTS.__getitem__) == {}
+
+def test_phrases_do_not_span_title_and_body():
+    index = InvertedIndex()
+    index.add("t", "Ends with design", "system starts the body")
+    assert index.phrase_counts("design system", lambda doc_id: ("Ends with design", "system starts the body")) == {}
+
+def test_near_counts_minimal_spans_within_window():
+    index = build_index()
+    assert index.near_counts("research grows", 10, DOCUMENTS.__getitem__) == {"b": 1}
+    assert index.near_counts("research grows", 3, DOCUMENTS.__getitem__) == {}
+
+def test_text_is_only_read_for_documents_with_every_word():
+    index = build_index()
+    read = []
+    index.phrase_counts("design research", lambda doc_id: read.append(doc_id) or DOCUMENTS[doc_id])
+    assert read == ["b"]
+
+def test_postings_hold_weighted_frequencies():
+    index = build_index()
+    assert index.postings["design"] == {"a": TITLE_WEIGHT + 2, "b": 3, "c": 1}
+    index.remove("a")
+    assert "systems" not in index.postings
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(3, query_fingerprint("design", "bm25"), (-1.5, "a"), "corrected")
+    assert decode_cursor(cursor, 3, query_fingerprint("design", "bm25")) == ((-1.5, "a"), "corrected")
+
+def test_cursor_from_an_older_index_version_is_rejected():
+    cursor = encode_cursor(3, "f", (0,))
+    with pytest.raises(CursorError, match="index changed"):
+        decode_cursor(cursor, 4, "f")
+
+def test_cursor_for_another_query_is_rejected():
+    cursor = encode_cursor(3, query_fingerprint("design", "bm25"), (0,))
+    with pytest.raises(CursorError, match="different query"):
+        decode_cursor(cursor, 3, query_fingerprint("design", "substring"))
+
+@pytest.mark.parametrize("cursor", ["not base64!", "e30", encode_cursor(1, "f", (0,))[:-3] + "x",
+                                    base64.urlsafe_b64encode(b"[1, 2]").decode()])
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(CursorError):
+        decode_cursor(cursor, 1, "f")
+
+def test_pages_over_tied_scores_cover_every_document_once():
+    scores = {f"doc{i:02d}": float(i % 3) for i in range(20)}
+    pages = []
+    after = None
+    while True:
+        page = top_scores(scores, 3, after)
+        if not page:
+            break
+        pages.extend(page)
+        after = score_key(page[-1])
+    assert pages == sorted(scores.items(), key=score_key)
+
+def bm25_example():
+    # Lengths count title words TITLE_WEIGHT (2) times: x = 2 + 2, y = 3 + 2, z = 2 + 2, so avgdl = 13/3
+    index = InvertedIndex(k1=1.2, b=0.75)
+    index.add("x", "Dashboards", "dashboard design")
+    index.add("y", "Design", "design design research")
+    index.add("z", "Notes", "research notes")
+    return index
+
+def test_bm25_scores_match_a_hand_computed_example():
+    index = bm25_example()
+    # idf(design) = ln(1 + (3 - 2 + 0.5) / (2 + 0.5)) = ln(1.6) = 0.470004
+    # x: f = 1, K = 1.2 * (0.25 + 0.75 * 4 / (13/3)) = 1.130769 -> 0.470004 * 1 * 2.2 / 2.130769
+    # y: f = 2 (title) + 2, K = 1.2 * (0.25 + 0.75 * 5 / (13/3)) = 1.338462 -> 0.470004 * 4 * 2.2 / 5.338462
+    assert index.score("design") == pytest.approx({"x": 0.485275, "y": 0.774761}, abs=1e-6)
+    # idf(notes) = ln(1 + 2.5 / 1.5) = 0.980829; z: f = 2 (title) + 1 -> 0.980829 * 3 * 2.2 / 4.130769
+    assert index.score("notes") == pytest.approx({"z": 1.567135}, abs=1e-6)
+    # Query terms add up: y also gets research (f = 1) at 0.470004 * 2.2 / 2.338462
+    assert index.score("research design") == pytest.approx({"x": 0.485275, "y": 1.216935, "z": 0.485275},
+                                                           abs=1e-6)
+    assert index.score("absent") == {}
+
+def test_bm25_ordering_breaks_ties_by_document_id():
+    index = bm25_example()
+    assert [doc_id for doc_id, _ in index.search("research design")] == ["y", "x", "z"]
+    assert [doc_id for doc_id, _ in index.search("research design", limit=2)] == ["y", "x"]
+    assert index.score("research design", candidates={"x", "z"}) == pytest.approx({"x": 0.485275, "z": 0.485275},
+                                                                                  abs=1e-6)
+    index.remove("y")
+    # With y gone, design is in one of two documents: idf = ln(1 + 1.5 / 1.5), avgdl = 4
+    assert index.score("design") == pytest.approx({"x": 0.693147 * 2.2 / 2.2}, abs=1e-6)
+
+def test_edit_distance_within_limit():
+    assert edit_distance_within("kitten", "sitting", 3) == 3
+    assert edit_distance_within("kitten", "sitting", 2) is None
+    assert edit_distance_within("design", "design", 0) == 0
+    assert edit_distance_within("design", "designers", 2) is None
+    assert edit_distance_within("", "ab", 2) == 2
+
+def test_edit_limit_grows_with_word_length():
+    assert [max_edit_distance(word) for word in ("ux", "chart", "dashboard")] == [0, 1, 2]
+
+def sample_index(texts):
+    index = InvertedIndex()
+    for doc_id, text in texts.items():
+        index.add(doc_id, "", text)
+    return index
+
+def test_trigram_candidates_match_a_full_scan(sample_texts):
+    index = sample_index(sample_texts)
+    for word in ("dashbord", "monitorin", "resaerch", "desing", "worklfow", "analitycs", "cafe", "xyzzy"):
+        limit = max_edit_distance(word)
+        expected = sorted(((term, edit_distance_within(word, term, limit)) for term in index.postings
+                           if edit_distance_within(word, term, limit) is not None),
+                          key=lambda match: (match[1], match[0]))
+        assert index.vocabulary.similar(word, limit) == expected, word
+
+def test_correct_replaces_misspelled_words(sample_texts):
+    index = sample_index(sample_texts)
+    # "dashboard" (1 edit) beats "dashboards" (2 edits)
+    assert index.correct("dashbord") == "dashboard"
+    assert index.correct("Dashbord, monitorng!") == "dashboard, monitoring!"
+    assert index.correct("design resaerch") == "design research"
+
+def test_correct_leaves_words_without_a_close_match(sample_texts):
+    index = sample_index(sample_texts)
+    assert index.correct("dashboard monitoring") == "dashboard monitoring"
+    # Seven letters allow one edit, and "dashboard" is two away
+    assert index.correct("dashbrd") == "dashbrd"
+    # Words under four letters are never corrected
+    assert index.correct("dta") == "dta"
+    assert index.correct("qwertyuiop") == "qwertyuiop"
+
+def test_corrections_follow_removed_documents(sample_texts):
+    index = sample_index(sample_texts)
+    assert index.correct("ethcs") == "ethics"
+    index.remove("ethics")
+    assert index.correct("ethcs") == "ethcs"
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("scipy")
+
+import numpy as np
+
+import book_server
+import semantic_index
+from semantic_index import SemanticIndex
+from term_matrix import TermMatrix
+
+# Two topics; "cars" never says automobile and "autos" never says cars
+TOPIC_TEXTS = {
+    "cars": "cars engine road driving engine",
+    "autos": "automobile engine road driving",
+    "both": "cars automobile engine",
+    "garden": "flower garden soil bloom",
+    "plants": "garden flower plants bloom soil",
+    "seeds": "seeds soil garden plants",
+}
+
+def build(texts, dimensions, monkeypatch):
+    monkeypatch.setattr(semantic_index, "LSA_DIMENSIONS", dimensions)
+    return SemanticIndex.build(TermMatrix(texts))
+
+def test_semantic_search_matches_documents_without_the_query_words(monkeypatch):
+    index = build(TOPIC_TEXTS, 2, monkeypatch)
+    assert "automobile" not in TOPIC_TEXTS["cars"]
+    assert {key for key, _ in index.search("automobile", 10)} == {"cars", "autos", "both"}
+    assert {key for key, _ in index.similar("seeds", 10)} == {"garden", "plants"}
+    assert index.search("unknownword", 10) == []
+
+def test_full_rank_similarity_is_the_tf_idf_cosine(sample_texts, monkeypatch):
+    texts = {key: text for key, text in sample_texts.items() if text}
+    index = build(texts, 100, monkeypatch)
+    weights = index.matrix.weights.toarray()
+    unit = weights / np.linalg.norm(weights, axis=1, keepdims=True)
+    for row, key in enumerate(index.keys):
+        cosines = unit.dot(unit[row])
+        expected = sorted(((other, cosines[i]) for i, other in enumerate(index.keys)
+                           if other != key and cosines[i] >= semantic_index.SEMANTIC_MIN_SIMILARITY),
+                          key=lambda item: (-item[1], item[0]))
+        results = index.similar(key, 10)
+        assert [other for other, _ in results] == [other for other, _ in expected]
+        assert [similarity for _, similarity in results] == pytest.approx([cosine for _, cosine in expected],
+                                                                          abs=1e-5)
+
+def test_search_pages_and_filters(monkeypatch):
+    index = build(TOPIC_TEXTS, 2, monkeypatch)
+    everything = index.search("garden flower", 10)
+    first = index.search("garden flower", 2)
+    rest = index.search("garden flower", 10, after=(-first[-1][1], first[-1][0]))
+    assert first + rest == everything
+    assert [key for key, _ in index.search("garden flower", 10, allowed=["seeds", "cars"])] == ["seeds"]
+
+def test_folded_in_and_removed_documents(monkeypatch):
+    index = build(TOPIC_TEXTS, 2, monkeypatch)
+    index.matrix.update("roses", "flower garden roses")
+    index.update("roses")
+    assert "roses" in index
+    assert "roses" in {key for key, _ in index.search("bloom soil", 10)}
+    index.matrix.remove("plants")
+    index.remove("plants")
+    assert "plants" not in index
+    assert {key for key, _ in index.similar("roses", 10)} == {"garden", "seeds"}
+
+def test_disabled_without_dimensions_or_terms(monkeypatch):
+    assert build(TOPIC_TEXTS, 0, monkeypatch) is None
+    assert SemanticIndex.build(None) is None
+
+def find_related(**arguments):
+    return asyncio.run(book_server.handle_call_tool("find_related_chapters", arguments))[0].text
+
+def test_find_related_chapters_semantic_and_its_fallback_note(export_dir, monkeypatch):
+    monkeypatch.setattr(book_server, "get_data_directory", lambda: export_dir)
+    book_server.build_chapter_index()
+    assert book_server.semantic_index is not None
+    chapter_id = "Designing-Dashboards-1a2b3c"
+
+    text = find_related(theme="chart monitoring question", match="semantic")
+    assert text.startswith("Chapters semantically related to theme 'chart monitoring question':")
+    assert f"ID: {chapter_id}" in text
+
+    text = find_related(chapter_id=chapter_id, match="semantic")
+    assert text.startswith("Chapters related to 'Designing Dashboards':") and "*Note:" not in text
+
+    # A chapter missing from the semantic index is ranked another way, and the reply says which
+    book_server.semantic_index.remove(chapter_id)
+    text = find_related(chapter_id=chapter_id, match="semantic")
+    assert "*Note: This chapter is not in the semantic index yet, so these results are ranked by " \
+           "similar wording instead.*" in text
+    monkeypatch.setattr(book_server, "chapter_similarities", None)
+    text = find_related(chapter_id=chapter_id, match="semantic")
+    assert "ranked by shared design concepts instead.*" in text
+
+    monkeypatch.setattr(book_server, "semantic_index", None)
+    assert find_related(theme="dashboards", match="semantic").startswith(
+        "Error: Semantic matching needs numpy and scipy")
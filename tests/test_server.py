@@ -0,0 +1,77 @@
+import asyncio
+import re
+
+import pytest
+
+import server
+
+def write_article(data_dir, article_id, title, body):
+    article_dir = data_dir / article_id
+    article_dir.mkdir()
+    (article_dir / f"{article_id}.html").write_text(
+        f'<html><head><title>{title}</title></head><body><article class="h-entry">'
+        f'<h1 class="p-name">{title}</h1><section class="e-content"><p>{body}</p></section></article></body></html>',
+        encoding='utf-8')
+
+@pytest.fixture
+def tied_archive(tmp_path, monkeypatch):
+    """Twelve articles that all score the same for 'dashboard', indexed by the server."""
+    for i in range(12):
+        write_article(tmp_path, f"Post-{i:02d}-abc{i:03d}", f"Post {i}", "A dashboard shows the data.")
+    monkeypatch.setattr(server, "get_data_directory", lambda: tmp_path)
+    server.build_article_index()
+    return tmp_path
+
+def call(name, **arguments):
+    return asyncio.run(server.handle_call_tool(name, arguments))[0].text
+
+def next_cursor(text):
+    match = re.search(r'pass cursor "([^"]+)"', text)
+    return match.group(1) if match else None
+
+def page_through(name, **arguments):
+    """IDs listed on every page of a tool's results, following cursors."""
+    ids = []
+    cursor = None
+    while True:
+        text = call(name, **arguments, **({"cursor": cursor} if cursor else {}))
+        assert not text.startswith("Error"), text
+        ids.extend(re.findall(r'\(ID: ([^)]+)\)', text))
+        cursor = next_cursor(text)
+        if cursor is None:
+            return ids
+
+@pytest.mark.parametrize("ranking", ["substring", "bm25"])
+def test_search_pages_over_tied_scores_are_stable(tied_archive, ranking):
+    ids = page_through("search_articles", query="dashboard", ranking=ranking, limit=5)
+    # Substring ranking breaks ties by index order, BM25 by ID
+    assert ids == (list(server.article_cache) if ranking == "substring" else sorted(server.article_cache))
+
+def test_list_articles_pages(tied_archive):
+    ids = page_through("list_articles", limit=5)
+    assert ids == [entry['id'] for entry in server.article_index]
+    assert len(ids) == 12
+
+def test_cursor_is_rejected_after_an_index_change(tied_archive):
+    text = call("search_articles", query="dashboard", limit=5)
+    cursor = next_cursor(text)
+    write_article(tied_archive, "New-Post-fff000", "New Post", "Another dashboard.")
+    server.apply_article_updates(*server.extract_article_updates([tied_archive / "New-Post-fff000"]))
+    assert "index changed" in call("search_articles", query="dashboard", limit=5, cursor=cursor)
+
+def test_cursor_is_rejected_for_a_different_query(tied_archive):
+    cursor = next_cursor(call("search_articles", query="dashboard", limit=5))
+    assert "different query" in call("search_articles", query="dashboard", ranking="bm25", limit=5, cursor=cursor)
+    assert "different query" in call("list_articles", limit=5, cursor=cursor)
+
+def test_tampered_cursor_is_rejected(tied_archive):
+    cursor = next_cursor(call("list_articles", limit=5))
+    assert call("list_articles", limit=5, cursor=cursor[:-2]).startswith("Error")
+    assert call("search_articles", query="dashboard", limit=5, cursor="garbage").startswith("Error")
+
+def test_misspelled_search_shows_corrected_results(tied_archive):
+    text = call("search_articles", query="dashbord", ranking="bm25", limit=20)
+    assert text.startswith("No articles matched 'dashbord'; showing results for 'dashboard'.")
+    assert text.count("(ID: ") == 12
+    assert call("search_articles", query="dashbord", ranking="bm25", fuzzy=False).startswith(
+        "Found 0 articles matching 'dashbord'")
@@ -0,0 +1,86 @@
+import pytest
+
+pytest.importorskip("scipy")
+
+import numpy as np
+
+from similarity_matrix import SimilarityMatrix
+from term_matrix import TermMatrix
+
+def recomputed(matrix, key, limit):
+    """The ranking of similar(), by multiplying the key's row with every row."""
+    scores = matrix.weights.dot(matrix.weights[matrix.rows([key])[0]].T).toarray().ravel()
+    ranked = sorted((-score, row) for row, score in enumerate(scores) if score > 0 and matrix.keys[row] != key)
+    return [(matrix.keys[row], -score) for score, row in ranked[:limit]]
+
+def assert_same_ranking(found, expected):
+    assert [key for key, _ in found] == [key for key, _ in expected]
+    assert np.allclose([score for _, score in found], [score for _, score in expected], rtol=0, atol=1e-5)
+
+def assert_matches_recomputed(similarities):
+    """Every live pair equals the product of the current term matrix rows."""
+    weights = similarities.matrix.weights
+    slots = np.array([similarities._slots[key] for key in similarities.matrix.keys], dtype=np.int64)
+    assert similarities.keys == similarities.matrix.keys
+    assert np.allclose(similarities.values[np.ix_(slots, slots)], weights.dot(weights.T).toarray(), rtol=0, atol=1e-6)
+
+def apply_updates(similarities, texts):
+    """Edit, add and remove documents, re-editing rows after later changes to other rows."""
+    keys = list(texts)
+    changes = [(keys[0], texts[keys[0]] + " " + texts[keys[2]]), ("added-document", texts[keys[3]]),
+               (keys[1], None), (keys[4], "entirely unseen vocabulary words here"),
+               # Shifts the document frequencies of a few terms only
+               ("short-document", "design research notes"),
+               (keys[0], texts[keys[5]])] + [(f"added-{i}", texts[keys[i % len(keys)]]) for i in range(20)]
+    for key, text in changes:
+        if text is None:
+            similarities.matrix.remove(key)
+            similarities.remove(key)
+        else:
+            similarities.matrix.update(key, text)
+            similarities.update(key)
+
+def test_similar_matches_recomputed(sample_texts):
+    matrix = TermMatrix(sample_texts)
+    similarities = SimilarityMatrix(matrix)
+    for key in sample_texts:
+        assert_same_ranking(similarities.similar(key, 3), recomputed(matrix, key, 3))
+    assert similarities.similar("empty", 10) == []
+
+def test_allowed_restricts_candidates(sample_texts):
+    similarities = SimilarityMatrix(TermMatrix(sample_texts))
+    allowed = ["research", "ethics", "not indexed"]
+    assert [key for key, _ in similarities.similar("workflow", 10, allowed)] == \
+        [key for key, _ in similarities.similar("workflow", 10) if key in allowed]
+
+def test_updates_match_recomputed(sample_texts):
+    similarities = SimilarityMatrix(TermMatrix(sample_texts))
+    apply_updates(similarities, sample_texts)
+    assert_matches_recomputed(similarities)
+    assert "monitoring" not in similarities
+    for key in ("dashboards", "added-document", "short-document"):
+        assert_same_ranking(similarities.similar(key, 5), recomputed(similarities.matrix, key, 5))
+    assert all(key != "monitoring" for key, _ in similarities.similar("dashboards", 100))
+
+def test_updates_grow_without_moving_documents(sample_texts):
+    similarities = SimilarityMatrix(TermMatrix(sample_texts))
+    slots = dict(similarities._slots)
+    apply_updates(similarities, sample_texts)
+    assert len(similarities.values) > len(sample_texts)
+    assert all(similarities._slots[key] == slot for key, slot in slots.items() if key in similarities)
+
+def test_saved_matrix_maps_back_copy_on_write(sample_texts, tmp_path):
+    cache_path = tmp_path / "similarities.npz"
+    built = SimilarityMatrix(TermMatrix(sample_texts), cache_path)
+    mapped = SimilarityMatrix(TermMatrix(sample_texts), cache_path)
+    assert isinstance(mapped.values, np.memmap)
+    assert np.array_equal(mapped.values, built.values)
+    apply_updates(mapped, sample_texts)
+    assert_matches_recomputed(mapped)
+    assert np.array_equal(SimilarityMatrix(TermMatrix(sample_texts), cache_path).values, built.values)
+
+def test_build_skips_large_corpora(sample_texts, monkeypatch):
+    import similarity_matrix
+    monkeypatch.setattr(similarity_matrix, "SIMILARITY_MAX_DOCUMENTS", len(sample_texts) - 1)
+    assert SimilarityMatrix.build(TermMatrix(sample_texts)) is None
+    assert SimilarityMatrix.build(None) is None
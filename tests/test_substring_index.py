@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from substring_index import SubstringIndex
+
+@pytest.mark.parametrize("query", ["design", "a", "aa", "ing ", "café", "Research", "data was", "zzzq", "s. "])
+def test_counts_match_str_count(sample_texts, query):
+    index = SubstringIndex(sample_texts)
+    expected = {key: text.lower().count(query.lower()) for key, text in sample_texts.items()}
+    assert index.count(query) == {key: total for key, total in expected.items() if total}
+
+def test_overlapping_occurrences_count_like_str_count():
+    texts = {"a": "aaaa aaa", "b": "abababa"}
+    index = SubstringIndex(texts)
+    assert index.count("aa") == {"a": 3}
+    assert index.count("aba") == {"b": 2}
+
+def test_saved_suffix_array_is_reused(sample_texts, tmp_path):
+    cache_path = tmp_path / "suffixes.npz"
+    built = SubstringIndex(sample_texts, cache_path)
+    loaded = SubstringIndex(sample_texts, cache_path)
+    assert (loaded._suffixes == built._suffixes).all()
+    assert loaded.count("design") == built.count("design")
@@ -0,0 +1,70 @@
+import re
+
+import pytest
+
+pytest.importorskip("scipy")
+
+import numpy as np
+
+from term_matrix import TermMatrix
+
+def word_sets(texts):
+    return {key: set(re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())) for key, text in texts.items()}
+
+def test_document_frequencies_match_word_sets(sample_texts):
+    matrix = TermMatrix(sample_texts)
+    expected = {}
+    for words in word_sets(sample_texts).values():
+        for word in words:
+            expected[word] = expected.get(word, 0) + 1
+    assert matrix.document_frequencies(list(sample_texts)) == expected
+
+def test_overlaps_match_word_sets(sample_texts):
+    matrix = TermMatrix(sample_texts)
+    keys = ["dashboards", "monitoring", "workflow", "café"]
+    sets = word_sets({key: sample_texts[key] for key in keys})
+    common, pairs = matrix.overlaps(keys)
+    assert set(common) == set.intersection(*sets.values())
+    assert [(i, j, shared) for i, j, shared, _ in pairs] == \
+        [(i, j, len(sets[a] & sets[b])) for i, a in enumerate(keys) for j, b in enumerate(keys) if i < j]
+
+def test_rows_are_unit_tfidf(sample_texts):
+    matrix = TermMatrix(sample_texts)
+    norms = np.sqrt(np.asarray(matrix.weights.multiply(matrix.weights).sum(axis=1)).ravel())
+    assert np.allclose(norms[[matrix.rows([key])[0] for key in sample_texts if sample_texts[key]]], 1, atol=1e-6)
+
+def test_updates_keep_other_rows_and_build_idf(sample_texts):
+    matrix = TermMatrix(sample_texts)
+    idf = matrix.idf.copy()
+    before = {key: matrix.weights[matrix.rows([key])[0]].toarray() for key in ("research", "ethics")}
+    matrix.update("dashboards", "dashboards dashboards brandnewterm")
+    matrix.update("added", "design design research")
+    matrix.remove("monitoring")
+    assert matrix.keys == [key for key in sample_texts if key != "monitoring"] + ["added"]
+    assert np.array_equal(matrix.idf[:len(idf)], idf)
+    for key, row in before.items():
+        assert np.array_equal(matrix.weights[matrix.rows([key])[0], :row.shape[1]].toarray(), row)
+    # An updated row is weighed like the same text in a fresh matrix with the build IDF
+    expected = matrix.vector("dashboards dashboards brandnewterm")
+    assert np.allclose(matrix.weights[matrix.rows(["dashboards"])[0]].toarray().ravel(), expected, atol=1e-6)
+    assert matrix.counts.shape == matrix.weights.shape == (len(matrix.keys), len(matrix.vocabulary))
+
+def test_saved_matrix_maps_back_identically(sample_texts, tmp_path):
+    cache_path = tmp_path / "terms.npz"
+    built = TermMatrix(sample_texts, cache_path)
+    mapped = TermMatrix(sample_texts, cache_path)
+    assert (mapped.weights != built.weights).nnz == 0
+    assert mapped.vocabulary == built.vocabulary
+    assert np.array_equal(mapped.idf, built.idf)
+    # Different texts do not reuse the saved matrix
+    changed = dict(sample_texts, ethics="something else entirely")
+    assert TermMatrix(changed, cache_path).vocabulary != built.vocabulary
+
+def test_term_totals_count_every_occurrence(sample_texts):
+    matrix = TermMatrix(sample_texts)
+    keys = ["monitoring", "workflow", "monitoring"]
+    expected = {}
+    for key in keys:
+        for word in re.findall(r'\b[a-zA-Z]{4,}\b', sample_texts[key].lower()):
+            expected[word] = expected.get(word, 0) + 1
+    assert matrix.term_totals(keys) == expected
@@ -0,0 +1,85 @@
+import os
+import queue
+
+import pytest
+
+import watcher
+from watcher import DataDirectoryWatcher, scan_article_directories
+
+def write_page(data_dir, name, text="<html><body>text</body></html>"):
+    article_dir = data_dir / name
+    article_dir.mkdir(exist_ok=True)
+    (article_dir / f"{name}.html").write_text(text, encoding='utf-8')
+
+def start_watcher(data_dir, mode):
+    changes = queue.Queue()
+    watch = DataDirectoryWatcher(data_dir, lambda paths: changes.put([path.name for path in paths]),
+                                 mode=mode, poll_interval=0.05)
+    assert watch.start()
+    return watch, changes
+
+def test_scan_skips_hidden_directories_and_other_files(tmp_path):
+    write_page(tmp_path, "Post-1a2b3c")
+    write_page(tmp_path, ".index_cache")
+    (tmp_path / "notes.txt").write_text("not an article")
+    (tmp_path / "Post-1a2b3c" / "notes.txt").write_text("ignored")
+    signatures = scan_article_directories(tmp_path)
+    assert list(signatures) == ["Post-1a2b3c"]
+    assert [entry[0] for entry in signatures["Post-1a2b3c"]] == ["Post-1a2b3c.html"]
+
+def test_polling_reports_added_edited_and_deleted_articles(tmp_path):
+    write_page(tmp_path, "Post-1a2b3c")
+    watch, changes = start_watcher(tmp_path, "poll")
+    try:
+        write_page(tmp_path, ".index_cache")
+        write_page(tmp_path, "New-4d5e6f")
+        assert changes.get(timeout=5) == ["New-4d5e6f"]
+
+        write_page(tmp_path, "Post-1a2b3c", "<html><body>edited text</body></html>")
+        assert changes.get(timeout=5) == ["Post-1a2b3c"]
+
+        (tmp_path / "New-4d5e6f" / "New-4d5e6f.html").unlink()
+        (tmp_path / "New-4d5e6f").rmdir()
+        assert changes.get(timeout=5) == ["New-4d5e6f"]
+        assert changes.empty()
+    finally:
+        watch.stop()
+
+def test_watching_disabled_or_missing_directory(tmp_path):
+    assert not DataDirectoryWatcher(tmp_path, print, mode="0").start()
+    assert not DataDirectoryWatcher(tmp_path / "missing", print, mode="poll").start()
+
+def inotify_watcher(data_dir):
+    watch = DataDirectoryWatcher(data_dir, print, mode="auto")
+    fd = watch._init_inotify() if os.uname().sysname == "Linux" else None
+    if fd is None:
+        pytest.skip("inotify is not available")
+    return watch, fd
+
+def test_inotify_debounces_writes_to_one_article(tmp_path, monkeypatch):
+    inotify_watcher(tmp_path)  # Skips where inotify is unavailable
+    monkeypatch.setattr(watcher, "DEBOUNCE_SECONDS", 0.2)
+    write_page(tmp_path, "Post-1a2b3c")
+    watch, changes = start_watcher(tmp_path, "auto")
+    try:
+        write_page(tmp_path, ".index_cache")
+        for i in range(5):
+            write_page(tmp_path, "Post-1a2b3c", f"<html><body>draft {i}</body></html>")
+            (tmp_path / "Post-1a2b3c" / f"image-{i}.png").write_bytes(b"png")
+        assert changes.get(timeout=5) == ["Post-1a2b3c"]
+        with pytest.raises(queue.Empty):
+            changes.get(timeout=0.5)
+    finally:
+        watch.stop()
+
+def test_inotify_queue_overflow_rescans_every_article(tmp_path):
+    write_page(tmp_path, "Post-1a2b3c")
+    watch, fd = inotify_watcher(tmp_path)
+    try:
+        write_page(tmp_path, "Missed-4d5e6f")
+        write_page(tmp_path, ".index_cache")
+        overflow = watcher._EVENT_HEADER.pack(-1, watcher.IN_Q_OVERFLOW, 0, 0)
+        assert watch._parse_events(overflow) == {"Post-1a2b3c", "Missed-4d5e6f"}
+        assert tmp_path / "Missed-4d5e6f" in watch._watches.values()
+    finally:
+        os.close(fd)